@@ -4,12 +4,16 @@ ChimeraScript - DocReader.py
 
 This scripts allow extract text from pdf files and converting the content via Google's
 Text To Speech API to an amp3 audio stream that can be either saved to a file or played/streamed
-upon completion of the conversion. The CLI present two subcommands "export" and "stream".
+while the conversion goes on. The CLI present three subcommands "export", "export-dir" and
+"stream".
 
 Example:
     To save the output audio streams in a file, use::
         $ python3 DocReader.py export mock.pdf
 
+    To convert all the pdf files in a folder (and its subfolders), use::
+        $ python3 DocReader.py export-dir notes/
+
     To play the audio as well with vlc , use::
         $ python3 DocReader.py stream mock.pdf player=vlc
 
@@ -18,21 +22,74 @@ Copyright 2022 Enea Guidi (hmny). All rights reserved.
 This file are distributed under the General Public License v 3.0.
 A copy of abovesaid license can be found in the LICENSE file.
 """
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from os import PathLike, getcwd, system
-from os.path import abspath, basename, exists, isfile, join, splitext
+from errno import ENXIO
+from hashlib import sha256
+from os import O_NONBLOCK, O_WRONLY, PathLike, cpu_count, environ, getcwd, getpid, makedirs, mkfifo
+from os import open as os_open
+from os import remove, replace, scandir, set_blocking, utime, walk
+from os.path import abspath, basename, dirname, exists, expanduser, getmtime, isfile, join
+from os.path import relpath, splitext
+from re import MULTILINE
+from re import compile as re_compile
+from shlex import split as split_args
 from shutil import which
-from tempfile import NamedTemporaryFile
-from typing import Optional
+from subprocess import DEVNULL, PIPE, CalledProcessError, Popen, run
+from tempfile import TemporaryDirectory
+from threading import Lock, get_ident
+from time import monotonic, sleep
+from typing import BinaryIO, Iterable, Iterator, Optional
 
 from fire import Fire
 from genericpath import isdir
 from gtts import gTTS, gTTSError
 from rich.console import Console
-from textract import process as extract_text
+from rich.progress import BarColumn, Progress, TextColumn, TimeElapsedColumn
+
+# Programs used to extract the text of a pdf file page by page and to count its pages
+EXTRACTOR, PAGE_COUNTER = "pdftotext", "pdfinfo"
+# Number of pdftotext processes running at the same time, and pages extracted by each one
+EXTRACT_JOBS, PAGES_PER_JOB = cpu_count() or 1, 8
+# Range of pages selected by the user (e.g. "10-40", "10-", "-40" or "7")
+PAGES_FORMAT = re_compile(r"(\d+)?(-)?(\d+)?")
+# Line of the pdfinfo output with the number of pages of the document
+PAGES_INFO = re_compile(r"^Pages:\s+(\d+)", MULTILINE)
+# Max number of characters of a chunk of text synthesized at once (gTTS splits it in requests)
+CHUNK_CHARS = 1000
+# Max number of characters of the first chunk, kept short so the audio starts as soon as possible
+FIRST_CHUNK_CHARS = 200
+# Number of chunks synthesized ahead of the one being played when streaming
+PREFETCH_CHUNKS = 8
+# Number of chunks synthesized at the same time
+TTS_JOBS = 8
+# Max number of attempts to synthesize a chunk, and delay (in seconds) before the first retry
+TTS_ATTEMPTS, TTS_BACKOFF = 4, 2.0
+# Boundary between two sentences, where the text can be split without breaking the speech
+SENTENCE_END = re_compile(r"(?<=[.!?;:])\s+")
+# Number of pdf files converted at the same time by export-dir
+FILE_JOBS = 4
+# Bitrate (in bits per second) of the mp3 audio produced by gTTS, used to measure its duration
+MP3_BITRATE = 32000
+# Players with a terminal UI, whose stdin is the keyboard: the audio is given through a FIFO
+TUI_PLAYERS = {"nvlc"}
+# Folder in which the converted chunks are cached, and its max size (in bytes)
+CACHE_HOME = environ.get("XDG_CACHE_HOME", expanduser("~/.cache"))
+CACHE_DIR, CACHE_SIZE = join(CACHE_HOME, "ChimeraScript", "DocReader"), 512 * 1024 * 1024
 
 # Rich console instance for pretty printing on the terminal
 console = Console(record=True)
+# Progress bar of the pages converted by export-dir, with the aggregated throughput
+progress = Progress(
+    TextColumn("{task.description}", style="cyan"),
+    BarColumn(),
+    TextColumn("{task.completed:.0f}/{task.total:.0f} pages"),
+    TextColumn("{task.fields[throughput]}"),
+    TimeElapsedColumn(),
+    console=console,
+    transient=True,
+)
 
 
 class FileTypeError(Exception):
@@ -49,17 +106,386 @@ class MissingPlayerError(Exception):
     """
 
 
-def pdf_to_speech(pdf_path: PathLike) -> gTTS:
+class MissingExtractorError(Exception):
+    """
+    Exception raised when pdftotext or pdfinfo (from poppler-utils) are not installed on the
+    machine, without them the text content of the pdf files cannot be extracted.
+    """
+
+
+class AudioCache:
+    """
+    On disk cache of the converted chunks, each one is saved in a file named after the hash of
+    its (normalized) text, language and speed, so the same chunk is never converted twice, even
+    if it comes from another document. When the cache grows over 'max_size' bytes the least
+    recently used chunks are evicted (reading a chunk updates its modification time).
+    """
+
+    def __init__(self, folder: PathLike = CACHE_DIR, max_size: int = CACHE_SIZE):
+        self.folder, self.max_size, self.lock = folder, max_size, Lock()
+        makedirs(folder, exist_ok=True)
+        self.size = sum(entry.stat().st_size for entry in self.entries())
+
+    @staticmethod
+    def key(text: str, lang: str, slow: bool) -> str:
+        """
+        Returns the key of a chunk, the whitespaces are normalized since the same text
+        may be laid out differently (e.g. in another edition of the same document).
+
+        Args:
+            text (str): The text of the chunk
+            lang (str): The language of the text
+            slow (bool): Flag to read the text more slowly
+        """
+        normalized = " ".join(text.split())
+        return sha256(f"{lang}\0{int(slow)}\0{normalized}".encode("utf8")).hexdigest()
+
+    def entries(self) -> list:
+        """Returns the chunks currently in the cache (as os.DirEntry)"""
+        return [entry for entry in scandir(self.folder) if entry.name.endswith(".mp3")]
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Returns the mp3 audio of the given chunk or None if the chunk isn't cached.
+
+        Args:
+            key (str): The key of the chunk
+        """
+        path = join(self.folder, f"{key}.mp3")
+        try:
+            with open(path, "rb") as file:
+                audio = file.read()
+            # Marks the chunk as recently used, so it's evicted last
+            utime(path)
+        except FileNotFoundError:
+            return None
+        return audio
+
+    def put(self, key: str, audio: bytes):
+        """
+        Saves the mp3 audio of a chunk and, if the cache is too big, evicts the least recently
+        used chunks until it's back under 90% of 'max_size' (so it's not done at every put).
+
+        Args:
+            key (str): The key of the chunk
+            audio (bytes): The mp3 audio of the chunk
+        """
+        path = join(self.folder, f"{key}.mp3")
+        # The chunk is written aside and then moved, so a partial file is never read
+        tmp_path = f"{path}.{getpid()}.{get_ident()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(audio)
+        replace(tmp_path, path)
+
+        with self.lock:
+            self.size += len(audio)
+            if self.size <= self.max_size:
+                return
+
+            # Other processes may be using the same cache, so the real size is recomputed
+            entries = sorted(self.entries(), key=lambda entry: entry.stat().st_mtime)
+            self.size = sum(entry.stat().st_size for entry in entries)
+            for entry in entries:
+                if self.size <= self.max_size * 0.9:
+                    break
+                try:
+                    remove(entry.path)
+                except FileNotFoundError:
+                    pass  # Already evicted by someone else
+                self.size -= entry.stat().st_size
+
+
+class Throughput:
+    """
+    Aggregated throughput of the files converted by export-dir, as pages converted and
+    seconds of audio produced per second, shown on the progress bar while the files are
+    converted concurrently (so the counters are updated under a lock).
+    """
+
+    def __init__(self, task: int):
+        self.task, self.pages, self.audio = task, 0, 0.0
+        self.start, self.lock = monotonic(), Lock()
+
+    def add(self, pages: int = 0, audio: float = 0.0):
+        """
+        Adds the pages and the seconds of audio just converted and updates the progress bar.
+
+        Args:
+            pages (int): The number of pages converted
+            audio (float): The seconds of audio produced
+        """
+        with self.lock:
+            self.pages, self.audio = self.pages + pages, self.audio + audio
+            progress.update(self.task, completed=self.pages, throughput=str(self))
+
+    def __str__(self) -> str:
+        elapsed = max(monotonic() - self.start, 1e-3)
+        return f"{self.pages / elapsed:.2f} pages/s, {self.audio / elapsed:.1f} audio-s/s"
+
+
+def count_pages(pdf_path: PathLike) -> int:
+    """
+    Returns the number of pages of a pdf file, as reported by pdfinfo.
+
+    Args:
+        pdf_path (Pathlike): The path to the pdf file
+
+    Raises:
+        CalledProcessError: pdfinfo failed to read the file (e.g. the pdf is damaged)
+    """
+    command = [PAGE_COUNTER, str(pdf_path)]
+    info = run(command, stdout=PIPE, stderr=DEVNULL, check=True).stdout.decode("utf8", "replace")
+    match = PAGES_INFO.search(info)
+    return int(match.group(1)) if match else 0
+
+
+def page_range(pages: Optional[str], count: int) -> range:
+    """
+    Returns the (1-based) pages selected by the user with a range such as "10-40", "10-"
+    (until the end), "-40" (from the beginning) or "7", all the pages if no range is given.
+
+    Args:
+        pages (Optional[str]): The range of pages selected by the user
+        count (int): The number of pages of the document
+
+    Raises:
+        ValueError: The range doesn't respect the format or isn't inside the document
+    """
+    if pages is None:
+        return range(1, count + 1)
+
+    match = PAGES_FORMAT.fullmatch(str(pages).replace(" ", ""))
+    if not match or not (match.group(1) or match.group(3)):
+        raise ValueError(f"{pages} is not a valid range of pages (e.g. 10-40)")
+
+    first, dash, last = match.groups()
+    first = int(first or 1)
+    last = int(last or count) if dash else first
+    if not 1 <= first <= last <= count:
+        raise ValueError(f"{pages} is not a valid range of pages, the document has {count} pages")
+    return range(first, last + 1)
+
+
+def extract_batch(pdf_path: PathLike, first: int, last: int) -> list[str]:
+    """
+    Extracts the text of the pages from 'first' to 'last' (included) of a pdf file. pdftotext
+    decodes only the requested pages, so each batch is independent from the others.
+
+    Args:
+        pdf_path (Pathlike): The path to the pdf file
+        first (int): The first page to extract (1-based)
+        last (int): The last page to extract (1-based)
+
+    Raises:
+        CalledProcessError: pdftotext failed to read the file (e.g. the pdf is damaged)
+    """
+    command = [EXTRACTOR, "-enc", "UTF-8", "-f", str(first), "-l", str(last), str(pdf_path), "-"]
+    text = run(command, stdout=PIPE, stderr=DEVNULL, check=True).stdout.decode("utf8", "replace")
+    # pdftotext ends each page with a form feed character
+    return text.split("\f")[: last - first + 1]
+
+
+def extract_pages(pdf_path: PathLike, pages: range, jobs: int = EXTRACT_JOBS) -> Iterator[str]:
+    """
+    Extracts the text content of the given pages of a pdf file lazily, a page at a time.
+    The pages are split in batches of PAGES_PER_JOB extracted by 'jobs' pdftotext processes
+    running in parallel, and yielded in order. At most 2 * 'jobs' batches are extracted ahead
+    of the caller, so only the pages that are about to be used are kept in memory.
+
+    Args:
+        pdf_path (Pathlike): The path to the pdf file
+        pages (range): The (1-based) pages to extract
+        jobs (int): The number of pdftotext processes running at the same time
+
+    Raises:
+        CalledProcessError: pdftotext failed to read the file (e.g. the pdf is damaged)
+    """
+    batches = [pages[i:i + PAGES_PER_JOB] for i in range(0, len(pages), PAGES_PER_JOB)]
+
+    # The threads only wait for the pdftotext processes, that do the work on their own cores
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()
+        try:
+            for batch in batches:
+                pending.append(pool.submit(extract_batch, pdf_path, batch[0], batch[-1]))
+                if len(pending) >= 2 * jobs:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            # If the extraction stops early, the batches not started yet are dropped
+            for future in pending:
+                future.cancel()
+
+
+def split_text(text: str, size: int = CHUNK_CHARS) -> list[str]:
+    """
+    Splits a text in chunks of (at most) 'size' characters, each one made of whole sentences.
+    Only the sentences longer than 'size' are split, at the last whitespace that fits.
+
+    Args:
+        text (str): The text to be split
+        size (int): The max number of characters of a chunk
+    """
+    chunks, current = [], ""
+
+    for sentence in SENTENCE_END.split(text.strip()):
+        # Sentences too long for a chunk by themselves are split word by word
+        while len(sentence) > size:
+            if current:
+                chunks.append(current)
+                current = ""
+            cut = sentence.rfind(" ", 0, size)
+            cut = cut if cut > 0 else size
+            chunks.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+
+        if current and len(current) + 1 + len(sentence) > size:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+
+    return [chunk for chunk in chunks + [current] if chunk.strip()]
+
+
+def split_pages(
+    pages: Iterable[str], size: int = CHUNK_CHARS, first_size: int = FIRST_CHUNK_CHARS
+) -> Iterator[str]:
+    """
+    Splits the text of a sequence of pages in chunks, the same way split_text does, but
+    lazily: a page is read only once the chunks of the previous ones have been consumed.
+    The sentence left unfinished at the end of a page is carried over to the next one,
+    while the first chunk is (at most) 'first_size' long, so that it's converted quickly.
+
+    Args:
+        pages (Iterable[str]): The text of each page, in order
+        size (int): The max number of characters of a chunk
+        first_size (int): The max number of characters of the first chunk
+    """
+    carry, first = "", True
+
+    for page in pages:
+        text = f"{carry} {page}".strip()
+        # The text after the last sentence end waits for the rest of the sentence
+        boundaries = list(SENTENCE_END.finditer(text))
+        cut = boundaries[-1].end() if boundaries else 0
+        cut = cut if len(text) - cut <= size else len(text)
+        text, carry = text[:cut], text[cut:]
+
+        for chunk in split_text(text, size):
+            if first:
+                yield from split_text(chunk, first_size)
+                first = False
+            else:
+                yield chunk
+
+    if carry.strip():
+        yield from split_text(carry, first_size if first else size)
+
+
+def synthesize_chunk(
+    text: str, lang: str = "en", slow: bool = False, cache: Optional[AudioCache] = None
+) -> bytes:
+    """
+    Converts a chunk of text to mp3 audio via Google's Text To Speech API, unless it's found
+    in the cache. Since each chunk is independent, a failed one is retried (with an exponential
+    backoff) by itself instead of restarting the whole conversion.
+
+    Args:
+        text (str): The text to be converted
+        lang (str): The language of the text
+        slow (bool): Flag to read the text more slowly
+        cache (Optional[AudioCache]): The cache of the chunks already converted
+
+    Raises:
+        gTTSError: The chunk couldn't be converted even after TTS_ATTEMPTS attempts
+    """
+    if cache is not None:
+        key = AudioCache.key(text, lang, slow)
+        audio = cache.get(key)
+        if audio is None:
+            audio = synthesize_chunk(text, lang, slow)
+            cache.put(key, audio)
+        return audio
+
+    for attempt in range(1, TTS_ATTEMPTS):
+        try:
+            return b"".join(gTTS(text=text, lang=lang, slow=slow).stream())
+        except gTTSError:
+            sleep(TTS_BACKOFF * 2 ** (attempt - 1))
+    # The error of the last attempt is raised to the caller
+    return b"".join(gTTS(text=text, lang=lang, slow=slow).stream())
+
+
+def synthesize(
+    chunks: Iterable[str],
+    lang: str = "en",
+    slow: bool = False,
+    jobs: int = TTS_JOBS,
+    prefetch: Optional[int] = None,
+    cache: Optional[AudioCache] = None,
+) -> Iterator[bytes]:
+    """
+    Converts chunks of text to an mp3 audio stream, the chunks are synthesized concurrently by
+    a pool of 'jobs' workers and the mp3 frames of each one are yielded in order, so they can
+    be just concatenated. At most 'prefetch' chunks (2 * 'jobs' by default) are pending at any
+    time, that keeps the memory bounded even for very long texts. The chunks are read lazily.
+
+    Args:
+        chunks (Iterable[str]): The text to be converted, already split in chunks
+        lang (str): The language of the text
+        slow (bool): Flag to read the text more slowly
+        jobs (int): The number of chunks synthesized at the same time
+        prefetch (Optional[int]): The max number of chunks converted ahead of the consumer
+        cache (Optional[AudioCache]): The cache of the chunks already converted
+
+    Raises:
+        gTTSError: A chunk couldn't be converted even after being retried
+    """
+    prefetch = max(prefetch or 2 * jobs, 1)
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()
+        try:
+            for chunk in chunks:
+                pending.append(pool.submit(synthesize_chunk, chunk, lang, slow, cache))
+                if len(pending) >= prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # If the conversion stops early, the chunks not started yet are dropped
+            for future in pending:
+                future.cancel()
+
+
+def pdf_to_speech(
+    pdf_path: PathLike,
+    jobs: int = TTS_JOBS,
+    prefetch: Optional[int] = None,
+    cache: Optional[AudioCache] = None,
+    pages: Optional[str] = None,
+    page_count: Optional[int] = None,
+) -> Iterator[bytes]:
     """
     Convert the textual content of a pdf file to an audio mp3 stream via Google's
-    Text To Speech API. Once the setup is completed returns the audio object.
+    Text To Speech API. Once the setup is completed returns the audio stream, whose
+    pages are extracted and converted (concurrently) while it's consumed.
 
     Args:
         pdf_path (Pathlike): The path to the pdf file to convert in speech
+        jobs (int): The number of chunks of text converted at the same time
+        prefetch (Optional[int]): The max number of chunks converted ahead of the consumer
+        cache (Optional[AudioCache]): The cache of the chunks already converted
+        pages (Optional[str]): The range of pages to convert (e.g. "10-40"), None for all
+        page_count (Optional[int]): The number of pages of the pdf file, counted if None
 
     Raises:
         FileNotFoundError: The given path doesn't exist or point to a directory
         FileTypeError: The given path doesn't points to a .pdf file
+        MissingExtractorError: pdftotext or pdfinfo are not available on the machine
+        ValueError: The range of pages is not valid
     """
     # Retrieves the absolute file and file extension for argument checking
     pdf_abspath = abspath(pdf_path)
@@ -70,14 +496,108 @@ def pdf_to_speech(pdf_path: PathLike) -> gTTS:
     elif file_ext != ".pdf":
         raise FileTypeError("The given file is not a PDF")
 
-    # Extracts the text content from the pdf file
-    text_content = str(extract_text(pdf_abspath), "utf8")
+    for program in (EXTRACTOR, PAGE_COUNTER):
+        if which(program) is None:
+            raise MissingExtractorError(f"{program} is not installed or available on your machine")
+
+    # Extracts the text content of the selected pages, one page at a time
+    if page_count is None:
+        page_count = count_pages(pdf_abspath)
+    selected = page_range(pages, page_count)
+    chunks = split_pages(extract_pages(pdf_abspath, selected))
     # Converts the text to audio stream with Google's Text to Speech API
-    audio = gTTS(text=text_content, lang="en", slow=False)
-    return audio
+    return synthesize(chunks, lang="en", slow=False, jobs=jobs, prefetch=prefetch, cache=cache)
+
+
+def save_audio(audio: Iterator[bytes], mp3_path: PathLike):
+    """
+    Writes an mp3 audio stream in the given file, chunk after chunk as they're converted.
+
+    Args:
+        audio (Iterator[bytes]): The mp3 audio stream
+        mp3_path (Pathlike): The output file path
+    """
+    with open(mp3_path, "wb") as mp3_file:
+        for frames in audio:
+            mp3_file.write(frames)
+
+
+def open_fifo(fifo_path: PathLike, player: Popen) -> BinaryIO:
+    """
+    Opens the write end of a FIFO once the player has opened the read one. Opening it
+    in non-blocking mode avoids waiting forever if the player exits without reading it.
 
+    Args:
+        fifo_path (Pathlike): The path to the FIFO
+        player (Popen): The player process that reads the FIFO
+
+    Raises:
+        BrokenPipeError: The player has exited before opening the FIFO
+    """
+    while player.poll() is None:
+        try:
+            fd = os_open(fifo_path, O_WRONLY | O_NONBLOCK)
+        except OSError as error:
+            # ENXIO means that nobody has opened the FIFO for reading yet
+            if error.errno != ENXIO:
+                raise
+            sleep(0.1)
+            continue
+        # Once opened, writes have to block while the player is busy
+        set_blocking(fd, True)
+        return open(fd, "wb")
+
+    raise BrokenPipeError(f"The player exited with code {player.returncode}")
 
-def export(pdf_path: PathLike, mp3_path: Optional[PathLike] = None) -> None:
+
+def play_audio(
+    audio: Iterator[bytes], player: str, player_flags: str, fifo: Optional[bool] = None
+) -> None:
+    """
+    Plays an mp3 audio stream while it's being converted, writing each chunk to the
+    player as soon as it's ready, either through its stdin or through a FIFO (for the
+    players that cannot read from stdin or, like nvlc, read the keyboard from it).
+    Closing the player stops the conversion.
+
+    Args:
+        audio (Iterator[bytes]): The mp3 audio stream
+        player (str): The name of the program the user would like to play the audio
+        player_flags (str): A string list of flag to be forwarded to the chosen player
+        fifo (Optional[bool]): Flag to give the audio through a FIFO instead of stdin,
+            if None a FIFO is used only for the players with a terminal UI
+    """
+    if fifo is None:
+        fifo = basename(player) in TUI_PLAYERS
+
+    with TemporaryDirectory() as tmp_dir:
+        # Most players read the audio from stdin when given "-" instead of a file
+        source = join(tmp_dir, "audio.mp3") if fifo else "-"
+        if fifo:
+            mkfifo(source)
+
+        command = [player, source, *split_args(player_flags)]
+        process = Popen(command, stdin=None if fifo else PIPE)
+
+        try:
+            with open_fifo(source, process) if fifo else process.stdin as sink:
+                for frames in audio:
+                    sink.write(frames)
+                    sink.flush()
+        except BrokenPipeError:
+            console.print("[yellow]The player has been closed, stopping the conversion[/yellow]")
+        finally:
+            # Stops the conversion of the chunks not yet played (if any)
+            audio.close()
+            process.wait()
+
+
+def export(
+    pdf_path: PathLike,
+    mp3_path: Optional[PathLike] = None,
+    jobs: int = TTS_JOBS,
+    cache: bool = True,
+    pages: Optional[str] = None,
+) -> None:
     """
     Converts the given pdf file to audio and then subsequently saves the incoming audio
     streams in the desired output file (.mp3 audio)
@@ -85,6 +605,9 @@ def export(pdf_path: PathLike, mp3_path: Optional[PathLike] = None) -> None:
     Args:
         pdf_path (Pathlike): The path to the pdf file to convert in audio
         mp3_path (Optional[Pathlike]): The output file path, optional arguments
+        jobs (int): The number of chunks of text converted at the same time
+        cache (bool): Flag to reuse (and save) the chunks converted in the previous runs
+        pages (Optional[str]): The range of pages to convert (e.g. "10-40"), None for all
     """
     # If an output path is not provided the file is saved in the current working
     # directory and named as the input file
@@ -99,47 +622,172 @@ def export(pdf_path: PathLike, mp3_path: Optional[PathLike] = None) -> None:
 
     try:
         # Converts the PDF content to audio/speech and writes it to the output file
-        audio = pdf_to_speech(pdf_path)
+        audio = pdf_to_speech(pdf_path, jobs, cache=AudioCache() if cache else None, pages=pages)
         # Saving the converted audio in a mp3 file
-        audio.save(abspath(mp3_path))
+        save_audio(audio, abspath(mp3_path))
     except gTTSError:
         console.print("[yellow]Text to Speech conversion terminated by the server[/yellow]")
 
 
-def stream(pdf_path: PathLike, player: str = "nvlc", player_flags: str = "") -> None:
+def convert_file(
+    pdf_path: PathLike,
+    mp3_path: PathLike,
+    jobs: int,
+    cache: Optional[AudioCache],
+    stats: Throughput,
+    page_count: Optional[int] = None,
+):
     """
-    Converts the given pdf file to audio and then subsequently saves the incoming streams in
-    a temporary file and once completed start reproducing it with the desired player.
+    Converts a pdf file to audio for export-dir. The audio is written in a '.part' file that's
+    renamed only once completed, so an interrupted conversion is never mistaken for a done one.
+
+    Args:
+        pdf_path (Pathlike): The path to the pdf file to convert in audio
+        mp3_path (Pathlike): The output file path
+        jobs (int): The number of chunks of text converted at the same time
+        cache (Optional[AudioCache]): The cache of the chunks already converted
+        stats (Throughput): The aggregated throughput to update
+        page_count (Optional[int]): The number of pages of the pdf file, counted if None
+    """
+    makedirs(dirname(mp3_path), exist_ok=True)
+    part_path = f"{mp3_path}.part"
+    pages = count_pages(pdf_path) if page_count is None else page_count
+
+    try:
+        with open(part_path, "wb") as mp3_file:
+            for frames in pdf_to_speech(pdf_path, jobs, cache=cache, page_count=pages):
+                mp3_file.write(frames)
+                stats.add(audio=len(frames) * 8 / MP3_BITRATE)
+        replace(part_path, mp3_path)
+    finally:
+        if exists(part_path):
+            remove(part_path)
+
+    stats.add(pages=pages)
+    console.print(f"[green]Converted {pdf_path} ({pages} pages)[/green]")
+
+
+def export_dir(
+    folder: PathLike,
+    out: Optional[PathLike] = None,
+    jobs: int = TTS_JOBS,
+    files: int = FILE_JOBS,
+    cache: bool = True,
+) -> None:
+    """
+    Converts all the pdf files in a folder (and its subfolders) to audio, each mp3 file is saved
+    next to its pdf or, if 'out' is given, at the same relative path inside 'out'. The pdf files
+    whose mp3 file is newer are skipped, the others are converted 'files' at a time, sharing
+    the 'jobs' synthesis workers, while the aggregated throughput is reported.
+
+    Args:
+        folder (Pathlike): The folder with the pdf files to convert in audio
+        out (Optional[Pathlike]): The output folder, the input one if not given
+        jobs (int): The number of chunks of text converted at the same time (among all files)
+        files (int): The number of pdf files converted at the same time
+        cache (bool): Flag to reuse (and save) the chunks converted in the previous runs
+
+    Raises:
+        NotADirectoryError: The given path doesn't exist or isn't a directory
+    """
+    folder_abspath = abspath(folder)
+    out_abspath = abspath(out) if out is not None else folder_abspath
+
+    if not isdir(folder_abspath):
+        raise NotADirectoryError(f"{folder_abspath} is not a directory or does not exist")
+
+    # Looks for the pdf files whose mp3 file is missing or older than the pdf itself
+    pending = []
+    for root, _, filenames in walk(folder_abspath):
+        for filename in sorted(name for name in filenames if name.endswith(".pdf")):
+            pdf_path = join(root, filename)
+            rel_path, _ = splitext(relpath(pdf_path, folder_abspath))
+            mp3_path = join(out_abspath, f"{rel_path}.mp3")
+            if not exists(mp3_path) or getmtime(mp3_path) < getmtime(pdf_path):
+                pending.append((pdf_path, mp3_path))
+
+    if not pending:
+        console.print(f"[green]{folder} is already up to date![/green]")
+        return
+
+    audio_cache, files = AudioCache() if cache else None, min(max(files, 1), len(pending))
+    # The synthesis workers are split among the files converted at the same time
+    file_jobs = max(jobs // files, 1)
+    # The pages are counted once, for the progress bar and then for the conversion itself
+    page_counts = {}
+    for pdf_path, _ in pending:
+        try:
+            page_counts[pdf_path] = count_pages(pdf_path)
+        except CalledProcessError:
+            pass  # Damaged file, the error will be reported once its conversion fails
+
+    with progress, ThreadPoolExecutor(max_workers=files) as pool:
+        description, total_pages = f"Converting {len(pending)} files", sum(page_counts.values())
+        stats = Throughput(progress.add_task(description, total=total_pages, throughput=""))
+        futures = {
+            pool.submit(
+                convert_file, pdf_path, mp3_path, file_jobs, audio_cache, stats,
+                page_counts.get(pdf_path)
+            ): pdf_path
+            for pdf_path, mp3_path in pending
+        }
+        for future in as_completed(futures):
+            # A failure affects only the current file, the others are converted anyway
+            try:
+                future.result()
+            except Exception as error:  # pylint: disable=broad-except
+                console.print(f"[red]Failed to convert {futures[future]}: {error}[/red]")
+
+    summary = f"{stats.pages} pages, {stats.audio:.0f}s of audio ({stats})"
+    console.print(f"[green]Converted {summary}[/green]")
+
+
+def stream(
+    pdf_path: PathLike,
+    player: str = "nvlc",
+    player_flags: str = "",
+    jobs: int = TTS_JOBS,
+    prefetch: int = PREFETCH_CHUNKS,
+    fifo: Optional[bool] = None,
+    cache: bool = True,
+    pages: Optional[str] = None,
+) -> None:
+    """
+    Converts the given pdf file to audio and plays it with the desired player while the
+    conversion goes on, pages are extracted and converted only a few chunks ahead of the
+    one being played, so the audio starts within seconds regardless of the document size.
 
     Args:
         pdf_path (Pathlike): The path to the pdf file to convert in audio
         player (str): The name of the program the user would like to play the audio
         player_flags (str): A string list of flag to be forwarded to the chosen player
+        jobs (int): The number of chunks of text converted at the same time
+        prefetch (int): The max number of chunks converted ahead of the one being played
+        fifo (Optional[bool]): Flag to give the audio through a FIFO instead of stdin,
+            if None a FIFO is used only for the players with a terminal UI (e.g. nvlc)
+        cache (bool): Flag to reuse (and save) the chunks converted in the previous runs
+        pages (Optional[str]): The range of pages to convert (e.g. "10-40"), None for all
 
     Raises:
         MissingPlayerError: The desired player is not available or could not be found
     """
-    # Initialize a temp file in which the mp3 content will be written
-    tmp_file = NamedTemporaryFile("w", delete=True)
-
-    try:
-        # Writes the stream into the file as they come from gTTS
-        audio = pdf_to_speech(pdf_path)
-        audio.save(join("/tmp", tmp_file.name))
-    except gTTSError:
-        console.print("[yellow]Text to Speech conversion terminated by the server[/yellow]")
+    # Checks the pdf file, nothing is converted until the player asks for the audio
+    audio = pdf_to_speech(pdf_path, jobs, prefetch, AudioCache() if cache else None, pages)
 
     if which(player) is None:
         raise MissingPlayerError(f"{player} is not installed or available on your machine")
 
-    # Once completed, nvlc (the TUI version of VLC) is started, giving a user the audio
-    # reproduction as well as a minimal UI to play, pause, skip and so on...
-    system(f"{player} {join('/tmp', tmp_file.name)} {player_flags}")
+    try:
+        # nvlc (the TUI version of VLC) is started right away, giving a user the audio
+        # reproduction as well as a minimal UI to play, pause, skip and so on...
+        play_audio(audio, player, player_flags, fifo)
+    except gTTSError:
+        console.print("[yellow]Text to Speech conversion terminated by the server[/yellow]")
 
 
 if __name__ == "__main__":
     try:
-        Fire({"stream": stream, "export": export})
+        Fire({"stream": stream, "export": export, "export-dir": export_dir})
     except KeyboardInterrupt:
         console.print("[yellow]Interrupt received, closing now...[/yellow]")
     except Exception:
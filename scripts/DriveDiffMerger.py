@@ -9,31 +9,83 @@ By default the remote file is assumed to be the newer one and will have priority
 one, so in case of conflict the remote versin will overwrite the local one.
 
 Example:
-    To only pull from Google Drive, use::
-        $ python3 DriveDiffMerger.py pull ~/GoogleDrive
+    To only pull from Google Drive, use (the "sync" subcommand can be omitted)::
+        $ python3 DriveDiffMerger.py sync ~/GoogleDrive
 
     To only push from local to Google Drive, use::
-        $ python3 DriveDiffMerger.py push ~/GoogleDrive
+        $ python3 DriveDiffMerger.py sync ~/GoogleDrive --nopull --push
 
     To both pull and then push, use::
-        $ python3 DriveDiffMerger.py sync ~/GoogleDrive
+        $ python3 DriveDiffMerger.py sync ~/GoogleDrive --push
+
+    To sync only what changed since the last run (state kept in a sidecar database), use::
+        $ python3 DriveDiffMerger.py sync ~/GoogleDrive --push --incremental
+
+    To transfer up to 8 files at the same time, use::
+        $ python3 DriveDiffMerger.py sync ~/GoogleDrive --jobs=8
+
+    To skip the transfer of files with a newer mtime but the same content, use::
+        $ python3 DriveDiffMerger.py sync ~/GoogleDrive --push --checksum
 
+    To transfer files bigger than 32 MiB in resumable chunks of such size, use::
+        $ python3 DriveDiffMerger.py sync ~/GoogleDrive --chunk_size=32
+
+    To only plan a sync (nothing is changed) and review it before applying it, use::
+        $ python3 DriveDiffMerger.py plan ~/GoogleDrive --push --output=plan.json
+        $ python3 DriveDiffMerger.py apply plan.json
+
+    To keep pushing the local changes as they happen (Linux only), use::
+        $ python3 DriveDiffMerger.py watch ~/GoogleDrive
+
+    To exclude files bigger than 100 MiB and videos (on top of the .driveignore globs), use::
+        $ python3 DriveDiffMerger.py sync ~/GoogleDrive --max_size=100 --exclude_mime="video/*"
 
 Copyright 2022 Enea Guidi (hmny). All rights reserved.
 This file are distributed under the General Public License v 3.0.
 A copy of abovesaid license can be found in the LICENSE file.
 """
+from concurrent.futures import ThreadPoolExecutor
+from ctypes import CDLL, get_errno
+from ctypes.util import find_library
+from dataclasses import dataclass, field
 from datetime import datetime
-from os import PathLike, listdir, mkdir, utime
-from os.path import abspath, basename, exists, getmtime, isdir, isfile, join
+from fnmatch import fnmatch
+from hashlib import md5
+from json import dumps, loads
+from math import ceil
+from mimetypes import guess_type
+from os import (
+    PathLike, close, fsdecode, listdir, makedirs, read, remove, replace, scandir, sep, stat,
+    strerror, utime
+)
+from os.path import (
+    abspath, basename, dirname, exists, getmtime, getsize, isdir, isfile, join, lexists, normpath,
+    relpath
+)
+from queue import Empty, Queue
+from random import uniform
+from re import Pattern, compile as re_compile, escape
+from select import select
+from sqlite3 import Connection, Row, connect
+from struct import calcsize, unpack_from
+from sys import argv, stdout
+from threading import Lock, Thread
+from time import monotonic, sleep
+from typing import NamedTuple, Optional, Union
 
 from fire import Fire
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest, MediaFileUpload
+from httplib2 import Http, HttpLib2Error
 from pydrive.auth import GoogleAuth
 from pydrive.drive import GoogleDrive, GoogleDriveFile
+from pydrive.files import ApiRequestError
 from rich.console import Console
 
 # datetime.strptime format for ISO strings
 ISO_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+# Google Drive stores the mtime of a file with millisecond precision
+MTIME_PRECISION = 0.001
 # Mimetype assigned to Google Drive folders
 GD_FOLDER_MIMETYPE = 'application/vnd.google-apps.folder'
 # Mimetype assigned to Google Drive links/shortcuts
@@ -43,6 +95,235 @@ GD_GAPPS_MIMETYPE = [
     "application/vnd.google-apps.sheet",
     "application/vnd.google-apps.presentation",
 ]
+# Max number of items returned by a single 'files.list' page (upper bound allowed by the API)
+GD_PAGE_SIZE = 1000
+# Max number of parent folders OR-ed together in a single 'files.list' query
+GD_QUERY_PARENTS = 40
+# Field mask for 'files.list', only the metadata needed by the sync logic is requested
+GD_INDEX_FIELDS = "nextPageToken,items(id,title,mimeType,parents(id,isRoot),modifiedDate," \
+    "md5Checksum,fileSize,downloadUrl)"
+# Field mask for 'changes.list', changed files carry the same metadata of the remote index
+GD_CHANGES_FIELDS = "nextPageToken,newStartPageToken,items(fileId,deleted,file(id,title," \
+    "mimeType,parents(id,isRoot),modifiedDate,md5Checksum,fileSize,downloadUrl,labels/trashed))"
+# Default number of threads listing the local directories (mostly waiting on I/O)
+SCAN_JOBS = 8
+# Default number of concurrent transfer workers
+TRANSFER_JOBS = 4
+# Max number of attempts for a single transfer and the base delay (in seconds) between them
+TRANSFER_ATTEMPTS, TRANSFER_BACKOFF = 5, 1.0
+# Reasons given by Drive alongside a 403 status when the request quota is exceeded
+GD_RATE_LIMIT_REASONS = ["rateLimitExceeded", "userRateLimitExceeded"]
+# Endpoint serving the content of a file, used for the entries loaded from a saved plan
+GD_MEDIA_URL = "https://www.googleapis.com/drive/v2/files/{}?alt=media"
+# Remote metadata saved along with each entry of a plan, enough to apply it without a rescan
+GD_PLAN_FIELDS = ("title", "mimeType", "modifiedDate", "md5Checksum", "fileSize")
+# Max number of operations grouped in a single batch request (limit set by Google Drive)
+GD_BATCH_SIZE = 100
+# Files bigger than this are transferred in chunks (resumable uploads and ranged downloads)
+CHUNK_SIZE = 8 * 1024 * 1024
+# Name of the sidecar database (placed in the synced folder) storing the last sync state
+STATE_DB_NAME = ".drivediffmerger.sqlite3"
+# Name of the file (placed in the synced folder) listing the paths excluded from the sync
+IGNORE_FILE_NAME = ".driveignore"
+# Suffix of the partial files written by ranged downloads, renamed once completed
+PART_SUFFIX = ".drivediffmerger-part"
+# Seconds without events on a path before it's pushed by the watch mode (coalesces bursts)
+WATCH_DEBOUNCE = 2.0
+# Max number of paths pushed together by the watch mode, so that latency stays low
+WATCH_BATCH_SIZE = 64
+# Inotify event flags (from <sys/inotify.h>) and the subset listened by the watch mode
+IN_ATTRIB, IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO = 0x4, 0x8, 0x40, 0x80
+IN_CREATE, IN_DELETE, IN_Q_OVERFLOW, IN_IGNORED = 0x100, 0x200, 0x4000, 0x8000
+IN_ISDIR, IN_CLOEXEC = 0x40000000, 0x80000
+IN_WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+# Layout of the fixed part of 'struct inotify_event', followed by 'len' bytes of name
+IN_EVENT_FORMAT = "iIII"
+# Size of the blocks read from a local file when computing its MD5 checksum
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# In memory snapshot of a remote tree, maps a parent folder id to its children by title,
+# so that each child can be resolved with the (parent_id, title) pair and no API calls
+RemoteIndex = dict[str, dict[str, GoogleDriveFile]]
+# Changed remote entries mapped by their path (relative to the root), with their parent id
+RemoteChanges = dict[str, tuple[GoogleDriveFile, str]]
+
+
+class LocalEntry(NamedTuple):
+    """A single entry of a local tree, as collected by 'local_scan' (a single stat each)"""
+    path: str  # The full path of the file or directory
+    size: int  # The size in bytes (meaningless for directories)
+    mtime_ns: int  # The last modification time, in nanoseconds
+    is_dir: bool  # The entry is a directory, otherwise is a regular file
+    inode: int  # Changes when the file is replaced by another one (e.g. renamed over it)
+    device: int  # The device of the inode, the pair identifies a directory reached by symlinks
+
+
+# Local entries mapped by their full path, so that a counterpart can be found with no syscalls
+LocalTree = dict[str, LocalEntry]
+
+
+@dataclass
+class Transfer:
+    """A single file transfer decided by the sync logic, later executed by 'run_transfers'"""
+    action: str  # Either "download", "upload", "touch" (mtime only), "mkdir" or "skip" (dry run)
+    l_path: PathLike  # The local file, source of an upload or destination of a download
+    r_entry: GoogleDriveFile  # The remote file, destination of an upload or source of a download
+    parent_id: Optional[str]  # The id of the remote parent of 'r_entry' (None if not created yet)
+    # Either "missing", "newer", "hash-mismatch", "same-content", "up-to-date" or "excluded"
+    reason: str
+
+
+class Inotify:
+    """Minimal binding of the Linux inotify API through the C library (no extra dependency)"""
+
+    def __init__(self):
+        self.libc = CDLL(find_library("c"), use_errno=True)
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError("inotify isn't available, the watch mode is supported only on Linux")
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(get_errno(), strerror(get_errno()))
+        self.paths = {}  # Maps each watch descriptor to the directory it refers to
+
+    def add(self, l_dir: PathLike) -> None:
+        """
+        Starts watching the local directory 'l_dir' (not recursively)
+
+        Args:
+            l_dir (PathLike): The directory to be watched
+        """
+        wd = self.libc.inotify_add_watch(self.fd, str(l_dir).encode(), IN_WATCH_MASK)
+        if wd < 0:
+            raise OSError(get_errno(), strerror(get_errno()), l_dir)
+        self.paths[wd] = l_dir  # Watching again the same dir (e.g. once moved) returns its wd
+
+    def remove(self, l_dir: PathLike) -> None:
+        """
+        Stops watching the local directory 'l_dir' and all of its subdirectories
+
+        Args:
+            l_dir (PathLike): The directory no longer to be watched
+        """
+        for wd, path in list(self.paths.items()):
+            if is_within(path, l_dir):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.paths[wd]
+
+    def read(self, timeout: Optional[float] = None) -> list[tuple[PathLike, int]]:
+        """
+        Waits for the next events, without using any CPU while idle, and returns them as pairs
+        of (path, mask). An empty list is returned if the timeout expires first.
+
+        Args:
+            timeout (Optional[float]): Max seconds to wait for, None to wait indefinitely
+        """
+        if len(select([self.fd], [], [], timeout)[0]) == 0:
+            return []
+
+        buffer, offset, events = read(self.fd, 64 * 1024), 0, []
+        while offset < len(buffer):
+            wd, mask, _, length = unpack_from(IN_EVENT_FORMAT, buffer, offset)
+            offset += calcsize(IN_EVENT_FORMAT)
+            name = fsdecode(buffer[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            # The kernel drops the watch of a deleted directory by itself
+            if mask & IN_IGNORED:
+                self.paths.pop(wd, None)
+            elif mask & IN_Q_OVERFLOW:
+                events.append(("", mask))
+            elif wd in self.paths:
+                events.append((join(self.paths[wd], name) if name else self.paths[wd], mask))
+        return events
+
+    def close(self) -> None:
+        """Releases the inotify instance along with all of its watches"""
+        close(self.fd)
+
+
+@dataclass
+class Filters:
+    """The exclusion rules of a synced tree, compiled once and then checked against each entry"""
+    l_root: PathLike  # The local root dir, the rules are matched against paths relative to it
+    # The .driveignore rules in order, each one as (regex, is negated, matches directories only)
+    rules: list[tuple[Pattern, bool, bool]] = field(default_factory=list)
+    max_size: Optional[int] = None  # Files bigger than this (in bytes) are excluded
+    mimetypes: tuple[str, ...] = ()  # Globs of the excluded mimetypes (e.g. "video/*")
+    # The paths excluded so far on either side, so that their counterpart is skipped as well
+    excluded: set[str] = field(default_factory=set)
+
+    def excludes(
+        self, path: str, is_dir: bool, size: int = 0, mimetype: Optional[str] = None
+    ) -> bool:
+        """
+        Checks if an entry is excluded from the sync, its ancestors are assumed not to be.
+        As in .gitignore files, the last matching rule wins and negated rules re-include.
+        The size and mimetype are checked first and can't be overridden by a negated rule.
+
+        Args:
+            path (str): The path relative to the synced root, with '/' as separator
+            is_dir (bool): The entry is a directory
+            size (int): The size of the file (in bytes)
+            mimetype (Optional[str]): The mimetype of the file, if known
+        """
+        if not is_dir and self.max_size is not None and size > self.max_size:
+            is_excluded = True
+        elif not is_dir and mimetype is not None and \
+                any(fnmatch(mimetype, mime_glob) for mime_glob in self.mimetypes):
+            is_excluded = True
+        else:
+            is_excluded = False
+            for regex, is_negated, dir_only in self.rules:
+                if (is_dir or not dir_only) and regex.fullmatch(path) is not None:
+                    is_excluded = not is_negated
+
+        # The size and mimetype of the two sides may differ, the pair is excluded as a whole
+        if is_excluded:
+            self.excluded.add(path)
+        return is_excluded
+
+    def excludes_local(self, l_path: PathLike, is_dir: bool, size: int = 0) -> bool:
+        """
+        Checks if a local entry is excluded from the sync, see 'excludes'
+
+        Args:
+            l_path (PathLike): The full path of the local entry
+            is_dir (bool): The entry is a directory
+            size (int): The size of the file (in bytes)
+        """
+        path = relpath(l_path, self.l_root).replace(sep, "/")
+        return self.excludes(path, is_dir, size, None if is_dir else guess_type(l_path)[0])
+
+    def excludes_remote(self, path: str, r_entry: GoogleDriveFile) -> bool:
+        """
+        Checks if a remote entry is excluded from the sync, see 'excludes'
+
+        Args:
+            path (str): The path of 'r_entry' relative to the synced root
+            r_entry (GoogleDriveFile): The remote entry, with its size and mimetype
+        """
+        size = int(r_entry.get("fileSize", 0))
+        return self.excludes(path.replace(sep, "/"), gd_isdir(r_entry), size, r_entry["mimeType"])
+
+    def excludes_counterpart(self, l_path: PathLike) -> bool:
+        """
+        Checks if the counterpart of a local entry has been excluded on the other side (e.g.
+        the remote copy is too big but the local one isn't), then the entry is skipped too
+
+        Args:
+            l_path (PathLike): The full path of the local entry
+        """
+        return relpath(l_path, self.l_root).replace(sep, "/") in self.excluded
+
+    def excludes_parent(self, path: str) -> bool:
+        """
+        Checks if any of the ancestor directories of an entry is excluded from the sync
+
+        Args:
+            path (str): The path relative to the synced root
+        """
+        parts = path.replace(sep, "/").split("/")[:-1]
+        return any(self.excludes("/".join(parts[:i + 1]), True) for i in range(len(parts)))
+
 
 # Rich console instance for pretty printing on the terminal
 console = Console(record=True)
@@ -104,7 +385,144 @@ def gd_getmtime(entry: GoogleDriveFile) -> float:
     return datetime.strptime(entry["modifiedDate"], ISO_FORMAT).timestamp()
 
 
-def gd_join(parent: GoogleDriveFile, name: str) -> GoogleDriveFile:
+def is_sidecar(entry_name: str) -> bool:
+    """
+    Checks if the local entry is one of the files written by this script (the sync state
+    database or a partial download), such files are never synchronized.
+
+    Args:
+        entry_name (str): The name (not the path) of the local entry
+    """
+    return entry_name.startswith(STATE_DB_NAME) or entry_name.endswith(PART_SUFFIX)
+
+
+def is_within(l_path: PathLike, l_dir: PathLike) -> bool:
+    """
+    Checks if the local 'l_path' is the directory 'l_dir' itself or is inside of it
+
+    Args:
+        l_path (PathLike): The local path to be checked
+        l_dir (PathLike): The local directory
+    """
+    return l_path == l_dir or l_path.startswith(f"{l_dir}{sep}")
+
+
+def gd_authorize() -> None:
+    """
+    Makes sure the Google Drive proxy is authenticated and its API service has been built.
+    PyDrive does this lazily, but it's needed upfront whenever the raw API service is used.
+    """
+    if gdrive.auth.access_token_expired:
+        gdrive.auth.LocalWebserverAuth()
+    if gdrive.auth.service is None:
+        gdrive.auth.Authorize()
+
+
+def gd_changes_token() -> str:
+    """
+    Returns the page token pointing to the current head of the Google Drive changes feed,
+    every change happening after this call will be returned by 'gd_changes' with such token.
+    """
+    gd_authorize()
+    request = gdrive.auth.service.changes().getStartPageToken()
+    return request.execute(http=gdrive.auth.Get_Http_Object())["startPageToken"]
+
+
+def gd_changes(token: str) -> tuple[list[dict], str]:
+    """
+    Fetches all the changes happened on Google Drive since 'token' was issued. Each change
+    is returned as a dict with the 'id' of the file, a 'deleted' flag and the changed 'file'
+    itself (None if deleted). The new token, to be used for the following call, is returned too.
+
+    Args:
+        token (str): The page token returned by 'gd_changes_token' or a previous call
+    """
+    gd_authorize()
+    changes, http = [], gdrive.auth.Get_Http_Object()
+
+    while True:
+        query = {"maxResults": GD_PAGE_SIZE, "includeDeleted": True, "fields": GD_CHANGES_FIELDS}
+        response = gdrive.auth.service.changes().list(pageToken=token, **query).execute(http=http)
+
+        for change in response.get("items", []):
+            metadata = change.get("file")
+            # Trashed files are handled as deleted ones, the sync logic doesn't look at the bin
+            is_deleted = change.get("deleted", False) or metadata is None or \
+                metadata.get("labels", {}).get("trashed", False)
+            r_entry = None if is_deleted else GoogleDriveFile(gdrive.auth, metadata, uploaded=True)
+            changes.append({"id": change["fileId"], "deleted": is_deleted, "file": r_entry})
+
+        # The last page doesn't have a following one but gives the token for the next sync
+        if "newStartPageToken" in response:
+            return changes, response["newStartPageToken"]
+        token = response["nextPageToken"]
+
+
+def is_newer(mtime: float, other: float) -> bool:
+    """
+    Compares two mtimes (in UNIX timestamp format) with the precision used by Google Drive,
+    so that the precision lost by a local mtime once uploaded isn't mistaken for a change
+
+    Args:
+        mtime (float): The timestamp that should be the newer one
+        other (float): The timestamp to be compared with
+    """
+    return mtime - other > MTIME_PRECISION
+
+
+def gd_index(r_root: GoogleDriveFile, filters: Optional[Filters] = None) -> RemoteIndex:
+    """
+    Builds a snapshot of the whole remote tree under 'r_root' with as few requests as possible.
+    The tree is visited one level at a time and all the folders of the same level are listed
+    together with large paginated queries, each of them returning only the needed fields.
+    The excluded entries are left out, so the excluded folders are never listed.
+
+    Args:
+        r_root (GoogleDriveFile): The remote root directory to be indexed
+        filters (Optional[Filters]): The exclusion rules of the synced tree
+
+    Raises:
+        NotADirectoryError: The given 'r_root' argument isn't a folder
+    """
+    if not gd_isdir(r_root):
+        raise NotADirectoryError(f"{r_root['title']} isn't a Google Drive Direcotry")
+
+    index, frontier, paths = {r_root["id"]: {}}, [r_root["id"]], {r_root["id"]: ""}
+
+    while len(frontier) != 0:
+        # Takes a slice of the current level, the query size has an upper bound
+        chunk, frontier = frontier[:GD_QUERY_PARENTS], frontier[GD_QUERY_PARENTS:]
+        parents_query = " or ".join(f"'{parent_id}' in parents" for parent_id in chunk)
+        query = {
+            "q": f"({parents_query}) and trashed=false",
+            "maxResults": GD_PAGE_SIZE,
+            "fields": GD_INDEX_FIELDS,
+        }
+
+        # Iterating over the list object fetches one page at a time until exhaustion
+        for page in gdrive.ListFile(query):
+            for r_entry in page:
+                for parent in r_entry["parents"]:
+                    # The 'root' alias is never returned, the real id of the root is used instead
+                    parent_id = "root" if parent.get("isRoot") and "root" in chunk else parent["id"]
+                    if parent_id not in chunk:
+                        continue
+                    path = f"{paths[parent_id]}/{r_entry['title']}".lstrip("/")
+                    if filters is not None and filters.excludes_remote(path, r_entry):
+                        continue
+                    index[parent_id][r_entry["title"]] = r_entry
+
+                    # Subfolders are indexed as well, they'll be listed with the next level
+                    if gd_isdir(r_entry) and r_entry["id"] not in index:
+                        index[r_entry["id"]], paths[r_entry["id"]] = {}, path
+                        frontier.append(r_entry["id"])
+
+    return index
+
+
+def gd_join(
+    parent: GoogleDriveFile, name: str, index: Optional[RemoteIndex] = None
+) -> GoogleDriveFile:
     """
     Returns the GoogleDriveEntity with the provided parent as well as
     the provided name/title. If no matching candidate is found then a new
@@ -113,6 +531,7 @@ def gd_join(parent: GoogleDriveFile, name: str) -> GoogleDriveFile:
     Args:
         parent (GoogleDriveFile): The remote parent directory
         name (str): The child GoogleDriveFile name
+        index (Optional[RemoteIndex]): A remote snapshot, if given no query is made
 
     Raises:
         NotADirectoryError: The given 'parent' argument isn't a folder
@@ -120,9 +539,13 @@ def gd_join(parent: GoogleDriveFile, name: str) -> GoogleDriveFile:
     if not gd_isdir(parent):
         raise NotADirectoryError(f"{parent['title']} isn't a Google Drive Direcotry")
 
-    # Creates and execute the query, then converts it to a Python list
-    query = {"q": f"'{parent['id']}' in parents and title='{name}' and trashed=false"}
-    match_list = gdrive.ListFile(query).GetList()
+    # Resolves the child from the remote snapshot, otherwise queries Google Drive directly
+    if index is not None:
+        match = index.get(parent["id"], {}).get(name)
+        match_list = [match] if match is not None else []
+    else:
+        query = {"q": f"'{parent['id']}' in parents and title='{name}' and trashed=false"}
+        match_list = gdrive.ListFile(query).GetList()
 
     # Match found, the given child already exist
     if len(match_list) != 0:
@@ -133,18 +556,24 @@ def gd_join(parent: GoogleDriveFile, name: str) -> GoogleDriveFile:
         return gdrive.CreateFile(query)
 
 
-def gd_listdir(gd_dir: GoogleDriveFile) -> list[GoogleDriveFile]:
+def gd_listdir(
+    gd_dir: GoogleDriveFile, index: Optional[RemoteIndex] = None
+) -> list[GoogleDriveFile]:
     """
     Returns the list of all the items in the current 'gd_dir' direcctory
 
     Args:
         gd_dir (GoogleDriveFile): The remote directory for which we want its content
+        index (Optional[RemoteIndex]): A remote snapshot, if given no query is made
 
     Raises:
         NotADirectoryError: The given 'gd_dir' argument isn't a folder
     """
     if not gd_isdir(gd_dir):
         raise NotADirectoryError(f"{gd_dir} isn't a Google Drive Direcotry")
+    # Lists the children from the remote snapshot (the folder may be newer than the snapshot)
+    if index is not None:
+        return list(index.get(gd_dir["id"], {}).values())
     # Creates and execute the query, then converts it to a Python list
     query = {"q": f"'{gd_dir['id']}' in parents and trashed=false"}
     return gdrive.ListFile(query).GetList()
@@ -162,77 +591,888 @@ def gd_mkdir(gd_dir: GoogleDriveFile) -> None:
     gd_dir.Upload()
 
 
-def gd_download(entry: GoogleDriveFile, dest: PathLike) -> None:
+def gd_batch(requests: list[HttpRequest]) -> list[tuple[Optional[dict], Optional[Exception]]]:
+    """
+    Executes the given (not yet executed) API requests grouped in batch requests of up to
+    GD_BATCH_SIZE operations, so that N operations cost N/100 HTTP round trips instead of N.
+    The operations that failed for rate limiting or transient errors are retried in a new
+    batch with exponential backoff. Returns the (response, error) pair of each operation, in
+    the same order of 'requests', so that the caller can handle the partial failures.
+
+    Args:
+        requests (list[HttpRequest]): The API requests to be executed
+    """
+    results, pending = [(None, None)] * len(requests), list(range(len(requests)))
+
+    def callback(request_id: str, response: Optional[dict], error: Optional[Exception]):
+        results[int(request_id)] = (response, error)
+
+    for attempt in range(TRANSFER_ATTEMPTS):
+        for start in range(0, len(pending), GD_BATCH_SIZE):
+            chunk = pending[start:start + GD_BATCH_SIZE]
+            batch = gdrive.auth.service.new_batch_http_request(callback=callback)
+            for op_index in chunk:
+                batch.add(requests[op_index], request_id=str(op_index))
+            try:
+                batch.execute()
+            except Exception as error:  # pylint: disable=broad-except
+                # The whole batch has been refused, so each one of its operations has failed
+                for op_index in chunk:
+                    results[op_index] = (None, error)
+
+        # Only the operations that failed for a transient reason are worth another attempt
+        pending = [i for i in pending if results[i][1] is not None and gd_retryable(results[i][1])]
+        if len(pending) == 0 or attempt == TRANSFER_ATTEMPTS - 1:
+            break
+        sleep(TRANSFER_BACKOFF * 2**attempt + uniform(0, TRANSFER_BACKOFF))
+
+    return results
+
+
+def gd_mkdirs(gd_dirs: list[GoogleDriveFile]) -> list[Optional[Exception]]:
+    """
+    Batched counterpart of 'gd_mkdir', creates all the given folders with a few batch requests.
+    The folders must not depend on each other (e.g. all on the same level of the tree), since
+    the id of a parent is known only once it has been created. Returns the error of each
+    folder (None if created), in the same order of 'gd_dirs'.
+
+    Args:
+        gd_dirs (list[GoogleDriveFile]): The partial or complete remote folders to be created
+    """
+    if len(gd_dirs) == 0:
+        return []
+
+    gd_authorize()
+    requests = []
+    for gd_dir in gd_dirs:
+        gd_dir["mimeType"] = GD_FOLDER_MIMETYPE
+        requests.append(gdrive.auth.service.files().insert(body=gd_dir.GetChanges()))
+
+    errors = []
+    for gd_dir, (response, error) in zip(gd_dirs, gd_batch(requests)):
+        if error is None:  # Same as PyDrive 'Upload()', the object is aligned with the remote one
+            gd_dir.uploaded = True
+            gd_dir.UpdateMetadata(response)
+        errors.append(error)
+    return errors
+
+
+def gd_patch(entries: list[GoogleDriveFile]) -> list[Optional[Exception]]:
+    """
+    Saves the metadata-only changes (e.g. title, parents, modifiedDate) of the given remote
+    entries with a few batch requests, their content is left untouched. Returns the error of
+    each entry (None if updated), in the same order of 'entries'.
+
+    Args:
+        entries (list[GoogleDriveFile]): The already uploaded remote entries to be updated
+    """
+    if len(entries) == 0:
+        return []
+
+    gd_authorize()
+    requests = []
+    for entry in entries:
+        param = {"fileId": entry["id"], "body": entry.GetChanges()}
+        # Without the flag Drive would ignore the given modifiedDate
+        if "modifiedDate" in param["body"]:
+            param["setModifiedDate"] = True
+        requests.append(gdrive.auth.service.files().patch(**param))
+
+    errors = []
+    for entry, (response, error) in zip(entries, gd_batch(requests)):
+        if error is None:
+            entry.UpdateMetadata(response)
+        errors.append(error)
+    return errors
+
+
+def gd_download(
+    entry: GoogleDriveFile,
+    dest: PathLike,
+    http: Optional[Http] = None,
+    chunk_size: int = CHUNK_SIZE
+) -> None:
     """
     Downloads the content of the provided Google Drive file 'entry' to the local 'dest' path
 
     Args:
         entry (GoogleDriveFile): The remote file/entry to be downloaded
         dest (str): The full destination path (with filename and extension)
+        http (Optional[Http]): An authorized HTTP client, required when used by multiple threads
+        chunk_size (int): Files bigger than this (in bytes) are downloaded in chunks
 
     Raises:
         FleNotFoundError: The provided 'entry' is not a downloadable file
+        HttpError: Google Drive has refused to serve the file content
     """
     if not gd_isfile(entry):
         raise FileNotFoundError(f"{entry['title']} is not a Google Drive file")
-    # Downloads the file at the provided destination path (full path with filename as well)
-    entry.GetContentFile(dest)
+    if http is None:
+        gd_authorize()
+        http = gdrive.auth.Get_Http_Object()
+
+    # Large files are streamed to disk, so that a network error doesn't restart them from zero
+    if int(entry.get("fileSize", 0)) > chunk_size:
+        gd_download_ranged(entry, dest, http, chunk_size)
+    else:  # Downloads the file at the provided destination path (full path with filename as well)
+        response, content = http.request(entry["downloadUrl"])
+        if response.status != 200:
+            raise HttpError(response, content, uri=entry["downloadUrl"])
+        with open(dest, "wb") as l_file:
+            l_file.write(content)
     # Changes the file atime & mtime to reflect the one of the remote entry
     utime(dest, (gd_getmtime(entry), gd_getmtime(entry)))
 
 
-def gd_upload(entry: PathLike, dest: GoogleDriveFile) -> None:
+def gd_download_ranged(entry: GoogleDriveFile, dest: PathLike, http: Http, chunk_size: int) -> None:
+    """
+    Downloads a large Google Drive file with HTTP Range requests of 'chunk_size' bytes, each
+    one appended to a partial file next to 'dest'. If such file already exist (an interrupted
+    download of the same remote version) the download resumes from its last byte, while the
+    partial files of the previous remote versions are removed. Once completed, the partial
+    file is atomically renamed to 'dest'.
+
+    Args:
+        entry (GoogleDriveFile): The remote file/entry to be downloaded
+        dest (str): The full destination path (with filename and extension)
+        http (Http): An authorized HTTP client
+        chunk_size (int): The size (in bytes) of each requested range
+
+    Raises:
+        HttpError: Google Drive has refused to serve the file content
+        IOError: The downloaded file size doesn't match the remote one
+    """
+    size, url = int(entry["fileSize"]), entry["downloadUrl"]
+    # The checksum tags the partial file, the one of a previous remote version is never resumed
+    part_path = f"{dest}.{entry.get('md5Checksum', '')[:8]}{PART_SUFFIX}"
+    # Being sidecars, the stale partial files would otherwise pile up unseen
+    stale = re_compile(rf"{escape(basename(dest))}\.[0-9a-f]{{0,8}}{escape(PART_SUFFIX)}")
+    for entry_name in listdir(dirname(abspath(dest))):
+        if stale.fullmatch(entry_name) and entry_name != basename(part_path):
+            remove(join(dirname(abspath(dest)), entry_name))
+
+    with open(part_path, "ab") as part_file:
+        offset = part_file.tell()  # Opened in append mode, so this is the size already written
+        # A partial file bigger than the remote one can't be resumed (the range isn't valid)
+        if offset > size:
+            part_file.truncate(0)
+            offset = part_file.seek(0)
+        while offset < size:
+            last_byte = min(offset + chunk_size, size) - 1
+            headers = {"Range": f"bytes={offset}-{last_byte}"}
+            response, content = http.request(url, headers=headers)
+            if response.status not in (200, 206):
+                raise HttpError(response, content, uri=url)
+            # The range has been ignored and the whole content returned instead
+            if response.status == 200:
+                part_file.truncate(0)
+                part_file.seek(0)
+            part_file.write(content)
+            offset = part_file.tell()
+
+    if getsize(part_path) != size:
+        raise IOError(f"{entry['title']} size mismatch ({getsize(part_path)} of {size} bytes)")
+    replace(part_path, dest)
+
+
+def gd_upload(
+    entry: PathLike,
+    dest: GoogleDriveFile,
+    http: Optional[Http] = None,
+    chunk_size: int = CHUNK_SIZE
+) -> None:
     """
     Uploads the content of the provided 'dest' argument to the remote GoogleDriveFile 'entry'
 
     Args:
         entry (PathLike): The local file to be uplaoded (its content)
         dest (GoogleDriveFile): The remote file in which such content must be written
+        http (Optional[Http]): An authorized HTTP client, required when used by multiple threads
+        chunk_size (int): Files bigger than this (in bytes) are uploaded in chunks
 
     Raises:
         FleNotFoundError: The provided 'entry' is not an uploadable file
     """
     if not isfile(entry):
         raise FileNotFoundError(f"{entry['title']} is not a local file")
-    # Uploads and overwrites the 'dest' content
-    dest.SetContentFile(entry)
     # Updates also the mtime of the remote resource to match the local one
     dest["modifiedDate"] = datetime.fromtimestamp(getmtime(entry)).strftime(ISO_FORMAT)
-    # Saves the changes permanently
-    dest.Upload()
 
+    # Large files are uploaded in chunks, so that a network error doesn't restart them from zero
+    if getsize(entry) > chunk_size:
+        gd_upload_resumable(entry, dest, http, chunk_size)
+        return
+
+    # Uploads and overwrites the 'dest' content
+    dest.SetContentFile(entry)
+    # On update Drive would otherwise replace 'modifiedDate' with "now" (insert keeps it as is)
+    param = {"setModifiedDate": True} if gd_exists(dest) or dest.get("id") is not None else {}
+    # PyDrive uses the given HTTP client only if there's one (or creates one for each request)
+    param = param if http is None else {**param, "http": http}
+
+    try:  # Saves the changes permanently
+        dest.Upload(param=param)
+    finally:  # PyDrive leaves the content file open after the upload
+        dest.content.close()
 
-def pull_from_drive(l_root: PathLike, r_root: GoogleDriveFile) -> None:
+
+def gd_upload_resumable(
+    entry: PathLike, dest: GoogleDriveFile, http: Optional[Http], chunk_size: int
+) -> None:
     """
-    Pulls all the new or changed files remotely to the local filesystem counterpart location.
+    Uploads a large local file with the Google Drive resumable upload protocol, 'chunk_size'
+    bytes at a time. When a chunk fails for a transient error the upload is resumed from the
+    last byte received by Drive, instead of starting over. The metadata changes of 'dest'
+    (title, parents, modifiedDate, ...) are saved along with the content.
+
+    Args:
+        entry (PathLike): The local file to be uplaoded (its content)
+        dest (GoogleDriveFile): The remote file in which such content must be written
+        http (Optional[Http]): An authorized HTTP client, required when used by multiple threads
+        chunk_size (int): The size (in bytes) of each chunk, a multiple of 256 KiB
+    """
+    gd_authorize()
+    http = gdrive.auth.Get_Http_Object() if http is None else http
+
+    mimetype = dest.get("mimeType") or guess_type(entry)[0] or "application/octet-stream"
+    media = MediaFileUpload(entry, mimetype=mimetype, chunksize=chunk_size, resumable=True)
+    # Same logic of PyDrive 'Upload()', an existing file is updated otherwise a new one is created
+    if gd_exists(dest) or dest.get("id") is not None:
+        request = gdrive.auth.service.files().update(
+            fileId=dest["id"], body=dest.GetChanges(), media_body=media, setModifiedDate=True
+        )
+    else:
+        request = gdrive.auth.service.files().insert(body=dest.GetChanges(), media_body=media)
+
+    response, failures = None, 0
+    try:
+        while response is None:
+            try:  # The response is returned only once the last chunk has been received
+                _, response = request.next_chunk(http=http)
+                failures = 0
+            except Exception as error:  # pylint: disable=broad-except
+                failures += 1
+                if not gd_retryable(error) or failures == TRANSFER_ATTEMPTS:
+                    raise
+                # The next call asks Drive how many bytes it has, then continues from there
+                sleep(TRANSFER_BACKOFF * 2**failures + uniform(0, TRANSFER_BACKOFF))
+    finally:  # MediaFileUpload keeps the local file open
+        media.stream().close()
+
+    # Aligns the local GoogleDriveFile object with the remote resource
+    dest.uploaded = True
+    dest.UpdateMetadata(response)
+
+
+def gd_retryable(error: Exception) -> bool:
+    """
+    Determines if a failed request can be retried later, that's the case for network errors,
+    server side errors and the rate limiting applied by Google Drive.
+
+    Args:
+        error (Exception): The error raised by the failed request
+    """
+    # PyDrive wraps the errors of the API client in its own exception
+    if isinstance(error, ApiRequestError) and len(error.args) != 0:
+        error = error.args[0]
+
+    if isinstance(error, HttpError):
+        status, content = error.resp.status, str(error.content)
+        is_rate_limited = status == 403 and any(r in content for r in GD_RATE_LIMIT_REASONS)
+        return status >= 500 or status == 429 or is_rate_limited
+    return isinstance(error, (ConnectionError, TimeoutError, HttpLib2Error))
+
+
+def run_transfers(
+    plan: list[Transfer], jobs: int = TRANSFER_JOBS, chunk_size: int = CHUNK_SIZE
+) -> list[Transfer]:
+    """
+    Executes the planned transfers with a pool of 'jobs' workers draining a shared queue,
+    except for the mtime updates ("touch") that are batched together. Each worker has its own
+    authorized HTTP client (httplib2 isn't thread safe) and retries with exponential backoff
+    the transfers that failed for rate limiting or transient errors.
+    Returns the transfers completed successfully, the failed ones are reported and skipped.
+
+    Args:
+        plan (list[Transfer]): The transfers to be executed, in any order
+        jobs (int): The number of concurrent workers
+        chunk_size (int): Files bigger than this (in bytes) are transferred in chunks
+    """
+    if len(plan) == 0:
+        return []
+
+    # Authenticates upfront, otherwise each worker would start its own OAuth flow
+    gd_authorize()
+    queue, completed, lock = Queue(), [], Lock()
+
+    # The mtime updates are metadata-only, so they're sent together in a few batch requests
+    touches = [transfer for transfer in plan if transfer.action == "touch"]
+    for transfer in touches:
+        console.log(f"Updating mtime of '{transfer.l_path}' on Google Drive")
+        l_mtime = datetime.fromtimestamp(getmtime(transfer.l_path)).strftime(ISO_FORMAT)
+        transfer.r_entry["modifiedDate"] = l_mtime
+    for transfer, error in zip(touches, gd_patch([transfer.r_entry for transfer in touches])):
+        if error is None:
+            completed.append(transfer)
+        else:
+            console.print(f"[red]Failed to transfer '{transfer.l_path}': {error}[/red]")
+
+    # Everything else has content to be moved, that's up to the workers
+    plan = [transfer for transfer in plan if transfer.action != "touch"]
+    for transfer in plan:
+        queue.put(transfer)
+
+    def worker():
+        http = gdrive.auth.Get_Http_Object()
+        while True:
+            try:  # The queue is filled upfront, so once empty the worker can stop
+                transfer = queue.get_nowait()
+            except Empty:
+                return
+            for attempt in range(TRANSFER_ATTEMPTS):
+                try:
+                    if transfer.action == "download":
+                        console.log(f"Pulling '{transfer.l_path}' from Google Drive")
+                        gd_download(transfer.r_entry, transfer.l_path, http, chunk_size)
+                    else:
+                        console.log(f"Pushing '{transfer.l_path}' to Google Drive")
+                        gd_upload(transfer.l_path, transfer.r_entry, http, chunk_size)
+                    with lock:
+                        completed.append(transfer)
+                    break
+                except Exception as error:  # pylint: disable=broad-except
+                    if not gd_retryable(error) or attempt == TRANSFER_ATTEMPTS - 1:
+                        console.print(f"[red]Failed to transfer '{transfer.l_path}': {error}[/red]")
+                        break
+                    # Exponential backoff with some jitter, so workers don't retry in lockstep
+                    sleep(TRANSFER_BACKOFF * 2**attempt + uniform(0, TRANSFER_BACKOFF))
+
+    # Spawns the workers and waits until the queue has been drained
+    workers = [Thread(target=worker, daemon=True) for _ in range(min(jobs, len(plan)))]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    return completed
+
+
+def state_open(l_root: PathLike) -> Connection:
+    """
+    Opens (and creates if needed) the sidecar database that keeps track of the state of
+    each synchronized path at the end of the last run, as well as the changes feed token.
+
+    Args:
+        l_root (PathLike): The local root dir, the database is stored inside of it
+    """
+    state = connect(join(l_root, STATE_DB_NAME))
+    state.row_factory = Row
+    state.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS entries (
+            path TEXT PRIMARY KEY, file_id TEXT NOT NULL, parent_id TEXT NOT NULL,
+            mime_type TEXT NOT NULL, md5 TEXT, size INTEGER NOT NULL, r_mtime TEXT NOT NULL,
+            l_mtime_ns INTEGER NOT NULL, l_inode INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS tokens (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS hashes (
+            inode INTEGER PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
+            md5 TEXT NOT NULL
+        );
+        """
+    )
+    return state
+
+
+def hash_record(hashes: Connection, l_path: PathLike, checksum: str) -> None:
+    """
+    Caches the MD5 checksum of a local file, it stays valid as long as the file keeps
+    the same inode, size and mtime. Any older checksum of the same inode is replaced.
+
+    Args:
+        hashes (Connection): The database containing the checksum cache
+        l_path (PathLike): The local file
+        checksum (str): The MD5 checksum of the current 'l_path' content
+    """
+    l_stat = stat(l_path)
+    hashes.execute(
+        "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)",
+        (l_stat.st_ino, l_stat.st_size, l_stat.st_mtime_ns, checksum)
+    )
+
+
+def local_md5(l_path: PathLike, hashes: Connection) -> str:
+    """
+    Returns the MD5 checksum of a local file, the file is read only if its (inode, size, mtime)
+    has changed since the last time its checksum has been computed.
+
+    Args:
+        l_path (PathLike): The local file
+        hashes (Connection): The database containing the checksum cache
+    """
+    l_stat = stat(l_path)
+    query = "SELECT md5 FROM hashes WHERE inode = ? AND size = ? AND mtime_ns = ?"
+    cached = hashes.execute(query, (l_stat.st_ino, l_stat.st_size, l_stat.st_mtime_ns)).fetchone()
+    if cached is not None:
+        return cached[0]
+
+    checksum = md5()
+    with open(l_path, "rb") as l_file:
+        for block in iter(lambda: l_file.read(HASH_BLOCK_SIZE), b""):
+            checksum.update(block)
+    hash_record(hashes, l_path, checksum.hexdigest())
+    return checksum.hexdigest()
+
+
+def same_content(l_path: PathLike, r_entry: GoogleDriveFile, hashes: Connection) -> bool:
+    """
+    Determines if a local file and its remote counterpart have the same content. The size is
+    compared first, then the MD5 checksum given by Drive against the (cached) local one.
+
+    Args:
+        l_path (PathLike): The local file
+        r_entry (GoogleDriveFile): The remote file
+        hashes (Connection): The database containing the checksum cache
+    """
+    # Google Apps files and freshly created entries don't have any checksum
+    if r_entry.get("md5Checksum") is None or int(r_entry.get("fileSize", -1)) != getsize(l_path):
+        return False
+    return local_md5(l_path, hashes) == r_entry["md5Checksum"]
+
+
+def local_touch(l_path: PathLike, r_entry: GoogleDriveFile, hashes: Connection) -> None:
+    """
+    Updates the mtime of the local file 'l_path' to match the one of the remote 'r_entry',
+    to be used when both have the same content already. The cached checksum is carried over.
+
+    Args:
+        l_path (PathLike): The local file whose mtime has to be updated
+        r_entry (GoogleDriveFile): The remote file from which the mtime is taken
+        hashes (Connection): The database containing the checksum cache
+    """
+    console.log(f"Updating mtime of '{l_path}' from Google Drive")
+    checksum = local_md5(l_path, hashes)
+    utime(l_path, (gd_getmtime(r_entry), gd_getmtime(r_entry)))
+    hash_record(hashes, l_path, checksum)
+
+
+def state_record(
+    state: Connection, l_root: PathLike, l_path: PathLike, r_entry: GoogleDriveFile, parent_id: str
+) -> None:
+    """
+    Records that the local 'l_path' and the remote 'r_entry' are in sync. Both the remote
+    metadata and the local stat are saved, so that a later change on either side can be spotted.
+
+    Args:
+        state (Connection): The sync state database
+        l_root (PathLike): The local root dir, stored paths are relative to it
+        l_path (PathLike): The local file or directory
+        r_entry (GoogleDriveFile): The remote counterpart of 'l_path'
+        parent_id (str): The id of the remote parent of 'r_entry'
+    """
+    l_stat = stat(l_path)
+    state.execute(
+        "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", (
+            relpath(l_path, l_root), r_entry["id"], parent_id, r_entry["mimeType"],
+            r_entry.get("md5Checksum"), int(r_entry.get("fileSize", 0)), r_entry["modifiedDate"],
+            l_stat.st_mtime_ns, l_stat.st_ino
+        )
+    )
+
+
+def state_forget(state: Connection, path: str) -> None:
+    """
+    Removes from the sync state the given relative path and, if a directory, all its content
+
+    Args:
+        state (Connection): The sync state database
+        path (str): The path, relative to the local root, to be removed
+    """
+    subtree = join(path, "")  # All the paths below 'path' have this as prefix
+    query = "DELETE FROM entries WHERE path = ? OR substr(path, 1, ?) = ?"
+    state.execute(query, (path, len(subtree), subtree))
+
+
+def state_entry(row: Row) -> GoogleDriveFile:
+    """
+    Rebuilds the remote entry recorded in a sync state row, without any request to Drive.
+    The entry can be compared and uploaded over, but not downloaded: it lacks the download URL
+    (and being marked as uploaded, it won't be fetched), so missing files use a fresh entry.
+
+    Args:
+        row (Row): The 'entries' row, as returned by the sync state database
+    """
+    metadata = {
+        "id": row["file_id"], "title": basename(row["path"]), "mimeType": row["mime_type"],
+        "md5Checksum": row["md5"], "fileSize": str(row["size"]), "modifiedDate": row["r_mtime"],
+        "parents": [{"id": row["parent_id"]}],
+    }
+    return GoogleDriveFile(gdrive.auth, metadata, uploaded=True)
+
+
+def state_rebuild(
+    state: Connection,
+    l_root: PathLike,
+    r_root: GoogleDriveFile,
+    filters: Optional[Filters] = None
+) -> None:
+    """
+    Records as in sync every path that exist both locally and on Google Drive, this is done
+    right after a full pull/push, when the two trees are known to be aligned.
+
+    Args:
+        state (Connection): The sync state database
+        l_root (PathLike): The local root dir
+        r_root (GoogleDriveFile): The remote counterpart of 'l_root'
+        filters (Optional[Filters]): The exclusion rules, the excluded entries aren't recorded
+    """
+    index, stack = gd_index(r_root, filters), [(l_root, r_root)]
+    state.execute("DELETE FROM entries")
+
+    while len(stack) != 0:
+        l_dir, r_dir = stack.pop()
+        for r_entry in gd_listdir(r_dir, index):
+            l_child = join(l_dir, r_entry["title"])  # Interpolates the local counterpart path
+            # Only the entries that are present on both sides are in sync
+            if gd_isdir(r_entry) and isdir(l_child):
+                state_record(state, l_root, l_child, r_entry, r_dir["id"])
+                stack.append((l_child, r_entry))
+            elif gd_isfile(r_entry) and isfile(l_child):
+                state_record(state, l_root, l_child, r_entry, r_dir["id"])
+
+
+def ignore_compile(pattern: str) -> Optional[tuple[Pattern, bool, bool]]:
+    """
+    Compiles a .gitignore style pattern to a regex matching the paths relative to the synced
+    root. Are supported comments, negations ('!'), directory only (trailing '/') and anchored
+    (containing a '/') patterns, as well as the '*', '?', '[...]' and '**' wildcards.
+    Returns None for blank lines and comments.
+
+    Args:
+        pattern (str): A single line of the .driveignore file
+    """
+    pattern = pattern.strip()
+    if pattern == "" or pattern.startswith("#"):
+        return None
+
+    is_negated, pattern = pattern.startswith("!"), pattern.removeprefix("!")
+    dir_only, pattern = pattern.endswith("/"), pattern.rstrip("/")
+    # A pattern without any slash matches at any depth, otherwise from the root only
+    prefix, pattern = ("" if "/" in pattern else "(?:.*/)?"), pattern.lstrip("/")
+
+    regex, i = "", 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex, i = regex + "(?:.*/)?", i + 3
+        elif pattern.startswith("**", i):
+            regex, i = regex + ".*", i + 2
+        elif pattern[i] == "*":
+            regex, i = regex + "[^/]*", i + 1
+        elif pattern[i] == "?":
+            regex, i = regex + "[^/]", i + 1
+        elif pattern[i] == "[" and "]" in pattern[i + 1:]:
+            end = pattern.index("]", i + 1)
+            charset = pattern[i + 1:end]
+            # Same as for fnmatch, a leading '!' negates the set
+            charset = f"^{charset[1:]}" if charset.startswith("!") else charset
+            regex, i = regex + f"[{charset}]", end + 1
+        else:
+            regex, i = regex + escape(pattern[i]), i + 1
+
+    return re_compile(prefix + regex), is_negated, dir_only
+
+
+def filters_load(
+    l_root: PathLike,
+    max_size: Optional[float] = None,
+    exclude_mime: Union[str, tuple[str, ...]] = ()
+) -> Filters:
+    """
+    Loads the exclusion rules of a synced tree, from its .driveignore file (if any) and from
+    the options given by the user. Everything is compiled once, here.
+
+    Args:
+        l_root (PathLike): The local root dir, in which the .driveignore file is looked for
+        max_size (Optional[float]): Files bigger than this (in MiB) are excluded
+        exclude_mime (Union[str, tuple[str, ...]]): Globs of the excluded mimetypes
+    """
+    rules, ignore_path = [], join(l_root, IGNORE_FILE_NAME)
+    if isfile(ignore_path):
+        with open(ignore_path, "r", encoding="utf-8") as ignore_file:
+            rules = [rule for rule in map(ignore_compile, ignore_file) if rule is not None]
+
+    # Fire parses a single value as a string and multiple ones as a tuple
+    mimetypes = (exclude_mime, ) if isinstance(exclude_mime, str) else tuple(exclude_mime)
+    max_bytes = None if max_size is None else int(float(max_size) * 1024**2)
+    return Filters(l_root, rules, max_bytes, mimetypes)
+
+
+def local_scandir(l_dir: PathLike, filters: Optional[Filters] = None) -> list[LocalEntry]:
+    """
+    Lists the local directory 'l_dir' with a single 'scandir', the type of each entry comes
+    from the listing itself and its stat is made only once. Symlinks are followed (as 'isdir'
+    and 'listdir' do), the sidecars of this script and the excluded entries are skipped.
+
+    Args:
+        l_dir (PathLike): The local directory to be listed
+        filters (Optional[Filters]): The exclusion rules of the synced tree
+    """
+    entries = []
+    try:
+        with scandir(l_dir) as dir_entries:
+            for dir_entry in dir_entries:
+                is_dir = dir_entry.is_dir()
+                if is_sidecar(dir_entry.name) or not (is_dir or dir_entry.is_file()):
+                    continue
+                try:
+                    l_stat = dir_entry.stat()
+                except FileNotFoundError:  # Removed in the meantime
+                    continue
+                if filters is not None and \
+                        filters.excludes_local(dir_entry.path, is_dir, l_stat.st_size):
+                    continue
+                entries.append(
+                    LocalEntry(
+                        dir_entry.path, l_stat.st_size, l_stat.st_mtime_ns, is_dir, l_stat.st_ino,
+                        l_stat.st_dev
+                    )
+                )
+    except OSError as error:
+        console.print(f"[red]Failed to scan '{l_dir}': {error}[/red]")
+    return entries
+
+
+def local_scan(
+    l_root: PathLike, jobs: int = SCAN_JOBS, filters: Optional[Filters] = None
+) -> list[LocalEntry]:
+    """
+    Scans the whole local tree under 'l_root' level by level, the directories of each level
+    are listed concurrently by 'jobs' threads, which is what makes the difference on network
+    or FUSE mounts. Returns a flat list in which each directory comes before its content.
+    The excluded directories are never descended into, neither are the symlinks to one of
+    their own ancestors (that would be scanned forever), which are left out of the list.
+
+    Args:
+        l_root (PathLike): The local root dir to be scanned (not included in the result)
+        jobs (int): The number of directories listed at the same time
+        filters (Optional[Filters]): The exclusion rules of the synced tree
+    """
+    l_stat = stat(l_root)
+    # Each directory of the level comes with the (device, inode) pairs of its ancestors
+    tree, level = [], [(l_root, frozenset([(l_stat.st_dev, l_stat.st_ino)]))]
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while len(level) != 0:
+            listings = pool.map(lambda l_dir: local_scandir(l_dir[0], filters), level)
+            next_level = []
+            for (_, ancestors), listing in zip(level, listings):
+                for entry in listing:
+                    if entry.is_dir and (entry.device, entry.inode) in ancestors:
+                        continue  # A symlink to an ancestor, a cycle
+                    tree.append(entry)
+                    if entry.is_dir:
+                        next_level.append((entry.path, ancestors | {(entry.device, entry.inode)}))
+            level = next_level
+    return tree
+
+
+def transfer_reason(is_existing: bool, hashes: Optional[Connection]) -> str:
+    """
+    Returns why a file has to be transferred: its counterpart is "missing", or it's "newer"
+    than its counterpart and, if a checksum cache is given, their content differs as well.
+
+    Args:
+        is_existing (bool): The counterpart of the file exists
+        hashes (Optional[Connection]): The checksum cache, if the content has been compared
+    """
+    if not is_existing:
+        return "missing"
+    return "newer" if hashes is None else "hash-mismatch"
+
+
+def plan_pull(
+    l_root: PathLike,
+    r_root: GoogleDriveFile,
+    index: RemoteIndex,
+    hashes: Optional[Connection] = None,
+    dry_run: bool = False,
+    local: Optional[LocalTree] = None,
+    filters: Optional[Filters] = None
+) -> list[Transfer]:
+    """
+    Plans the download of all the new or changed files remotely to the local filesystem.
     A file is determined to be newer based on its last_modified timestamp, the bigger the newer.
+    The missing local directories are created right away, since it's cheap to do so.
+    If a checksum cache is given, newer files with the same content only get their mtime fixed.
+    With 'dry_run' nothing is changed, the "mkdir", "touch" and "skip" entries are planned too.
 
     Args:
         l_root (PathLike): The local root dir from which start pulling
         r_root (GoogleDriveFile): The remote root from whic start pulling
+        index (RemoteIndex): The remote snapshot of 'r_root'
+        hashes (Optional[Connection]): The checksum cache, enables the content comparison
+        dry_run (bool): Only plans the changes, without applying any of them
+        local (Optional[LocalTree]): The local snapshot, scanned from 'l_root' if not given
+        filters (Optional[Filters]): The exclusion rules used when scanning 'l_root'
     """
+    plan = []
+    # The local tree is scanned only once, then each counterpart is found without any syscall
+    if local is None:
+        local = {entry.path: entry for entry in local_scan(l_root, filters=filters)}
     # Gets a list of remote children from the given parent
-    remote_childrens = {r_entry["title"]: r_entry for r_entry in gd_listdir(r_root)}
+    remote_childrens = {r_entry["title"]: r_entry for r_entry in gd_listdir(r_root, index)}
 
     for entry_name, r_child in remote_childrens.items():
         l_child = join(l_root, entry_name)  # Interpolates the local counterpart path
+        l_entry = local.get(l_child)
 
         # If the 'r_child' is a direcotry then is recursively pulled
         if gd_isdir(r_child):
-            mkdir(l_child) if not exists(l_child) else None  # pylint: disable=expression-not-assigned
-            pull_from_drive(l_child, r_child)
+            if l_entry is None and dry_run:
+                plan.append(Transfer("mkdir", l_child, r_child, r_root["id"], "missing"))
+            elif l_entry is None:
+                makedirs(l_child, exist_ok=True)
+            plan.extend(plan_pull(l_child, r_child, index, hashes, dry_run, local, filters))
 
         # Skips the current iteration if 'r_child' isn't a file
         if not gd_isfile(r_child):
             continue
 
+        # A local file that exists but hasn't been scanned has been excluded (e.g. it's grown
+        # too big), it must not be mistaken for a missing one and overwritten by the remote copy
+        if l_entry is None and lexists(l_child):
+            if dry_run:
+                plan.append(Transfer("skip", l_child, r_child, r_root["id"], "excluded"))
+            continue
+
         # If the 'r_child' is newer or the local one doesn't exist then we pull from Drive
-        if not (exists(l_child)) or gd_getmtime(r_child) > getmtime(l_child):
-            console.log(f"Pulling '{l_child}' from Google Drive")
-            gd_download(r_child, l_child)
+        if l_entry is None or is_newer(gd_getmtime(r_child), l_entry.mtime_ns / 1e9):
+            if hashes is not None and l_entry is not None and \
+                    same_content(l_child, r_child, hashes):
+                if dry_run:
+                    plan.append(Transfer("touch", l_child, r_child, r_root["id"], "same-content"))
+                else:
+                    local_touch(l_child, r_child, hashes)
+            else:
+                reason = transfer_reason(l_entry is not None, hashes)
+                plan.append(Transfer("download", l_child, r_child, r_root["id"], reason))
+        elif dry_run:
+            plan.append(Transfer("skip", l_child, r_child, r_root["id"], "up-to-date"))
+
+    return plan
+
+
+def plan_push(
+    l_root: PathLike,
+    r_root: GoogleDriveFile,
+    index: RemoteIndex,
+    hashes: Optional[Connection] = None,
+    dry_run: bool = False,
+    filters: Optional[Filters] = None
+) -> list[Transfer]:
+    """
+    Plans the upload of all the new or changed files locally to the remote Goole Drive location.
+    A file is determined to be newer based on its last_modified timestamp, the bigger the newer.
+    The local tree is visited level by level and the missing remote folders of each level are
+    created right away in batch requests, since their id is needed by their children.
+    If a checksum cache is given, newer files with the same content only get their mtime fixed.
+    With 'dry_run' nothing is changed, the "mkdir" and "skip" entries are planned too.
 
+    Args:
+        l_root (PathLike): The local root dir from which start pulling
+        r_root (GoogleDriveFile): The remote root from whic start pulling
+        index (RemoteIndex): The remote snapshot of 'r_root'
+        hashes (Optional[Connection]): The checksum cache, enables the content comparison
+        dry_run (bool): Only plans the changes, without applying any of them
+        filters (Optional[Filters]): The exclusion rules used when scanning 'l_root'
+    """
+    plan, level, children = [], [(normpath(l_root), r_root)], {}
+    # The local tree is scanned upfront, then its entries are grouped by parent directory
+    for l_entry in local_scan(normpath(l_root), filters=filters):
+        children.setdefault(dirname(l_entry.path), []).append(l_entry)
+
+    while len(level) != 0:
+        next_level = []
+        for l_dir, r_dir in level:
+            for l_entry in children.get(l_dir, []):
+                # Interpolates the counterpart paths, nothing exists in a folder not created yet
+                l_child, entry_name = l_entry.path, basename(l_entry.path)
+                r_child = gd_join(r_dir, entry_name, index) if gd_exists(r_dir) else \
+                    gdrive.CreateFile({"title": entry_name})
+
+                # The remote copy isn't in the index since it's excluded, it's not missing
+                if not gd_exists(r_child) and filters is not None and \
+                        filters.excludes_counterpart(l_child):
+                    if dry_run:
+                        plan.append(Transfer("skip", l_child, r_child, r_dir.get("id"), "excluded"))
+                    continue
+
+                # If the 'l_child' is a direcotry then is pushed along with the next level
+                if l_entry.is_dir:
+                    next_level.append((l_child, r_child, r_dir.get("id")))
+                    continue
+
+                # If the 'l_child' is newer or the remote one doesn't exist then we push to Drive
+                l_mtime = l_entry.mtime_ns / 1e9
+                if not (gd_exists(r_child)) or is_newer(l_mtime, gd_getmtime(r_child)):
+                    is_same = hashes is not None and gd_exists(r_child) and \
+                        same_content(l_child, r_child, hashes)
+                    reason = transfer_reason(gd_exists(r_child), hashes)
+                    action, reason = ("touch", "same-content") if is_same else ("upload", reason)
+                    plan.append(Transfer(action, l_child, r_child, r_dir.get("id"), reason))
+                elif dry_run:
+                    plan.append(Transfer("skip", l_child, r_child, r_dir.get("id"), "up-to-date"))
+
+        # The missing folders of the next level are created together, the failed ones are skipped
+        missing = [folder for folder in next_level if not gd_exists(folder[1])]
+        if dry_run:
+            plan.extend(Transfer("mkdir", *folder, "missing") for folder in missing)
+            level = [(l_dir, r_dir) for l_dir, r_dir, _ in next_level]
+            continue
+        for (l_dir, r_dir, _), error in zip(missing, gd_mkdirs([r_dir for _, r_dir, _ in missing])):
+            if error is not None:
+                console.print(f"[red]Failed to create '{l_dir}' on Google Drive: {error}[/red]")
+        level = [(l_dir, r_dir) for l_dir, r_dir, _ in next_level if gd_exists(r_dir)]
+
+    return plan
+
+
+def pull_from_drive(
+    l_root: PathLike,
+    r_root: GoogleDriveFile,
+    index: Optional[RemoteIndex] = None,
+    jobs: int = TRANSFER_JOBS,
+    hashes: Optional[Connection] = None,
+    chunk_size: int = CHUNK_SIZE,
+    filters: Optional[Filters] = None
+) -> None:
+    """
+    Pulls all the new or changed files remotely to the local filesystem counterpart location.
+    A file is determined to be newer based on its last_modified timestamp, the bigger the newer.
 
-def push_to_drive(l_root: PathLike, r_root: GoogleDriveFile) -> None:
+    Args:
+        l_root (PathLike): The local root dir from which start pulling
+        r_root (GoogleDriveFile): The remote root from whic start pulling
+        index (Optional[RemoteIndex]): The remote snapshot, built from 'r_root' if not given
+        jobs (int): The number of concurrent downloads
+        hashes (Optional[Connection]): The checksum cache, enables the content comparison
+        chunk_size (int): Files bigger than this (in bytes) are transferred in chunks
+        filters (Optional[Filters]): The exclusion rules, the excluded entries are never synced
+    """
+    # The remote tree is fetched only once, then the planning is done offline
+    index = gd_index(r_root, filters) if index is None else index
+    plan = plan_pull(l_root, r_root, index, hashes, filters=filters)
+    run_transfers(plan, jobs, chunk_size)
+
+
+def push_to_drive(
+    l_root: PathLike,
+    r_root: GoogleDriveFile,
+    index: Optional[RemoteIndex] = None,
+    jobs: int = TRANSFER_JOBS,
+    hashes: Optional[Connection] = None,
+    chunk_size: int = CHUNK_SIZE,
+    filters: Optional[Filters] = None
+) -> None:
     """
     Push all the new or changed files locally to the remote Goole Drive counterpart location.
     A file is determined to be newer based on its last_modified timestamp, the bigger the newer.
@@ -240,30 +1480,551 @@ def push_to_drive(l_root: PathLike, r_root: GoogleDriveFile) -> None:
     Args:
         l_root (PathLike): The local root dir from which start pulling
         r_root (GoogleDriveFile): The remote root from whic start pulling
+        index (Optional[RemoteIndex]): The remote snapshot, built from 'r_root' if not given
+        jobs (int): The number of concurrent uploads
+        hashes (Optional[Connection]): The checksum cache, enables the content comparison
+        chunk_size (int): Files bigger than this (in bytes) are transferred in chunks
+        filters (Optional[Filters]): The exclusion rules, the excluded entries are never synced
+    """
+    # The remote tree is fetched only once, then the planning is done offline
+    index = gd_index(r_root, filters) if index is None else index
+    plan = plan_push(l_root, r_root, index, hashes, filters=filters)
+    run_transfers(plan, jobs, chunk_size)
+
+
+def remote_deltas(
+    state: Connection, changes: list[dict], r_root: GoogleDriveFile, filters: Optional[Filters]
+) -> tuple[RemoteChanges, dict[str, str], dict[str, Row]]:
+    """
+    Applies the remote deletions to the sync state and places the changed remote entries in
+    the tree by their parent, if known. Returns the changed entries by relative path, the
+    remote folders under 'r_root' mapped to their relative path and the recorded rows.
+
+    Args:
+        state (Connection): The sync state database
+        changes (list[dict]): The changes reported by the Drive changes feed
+        r_root (GoogleDriveFile): The remote root dir
+        filters (Optional[Filters]): The exclusion rules, the excluded entries are skipped
+    """
+    # Deleted remote entries are no longer tracked (deletion is never propagated locally)
+    for file_id in {change["id"] for change in changes if change["deleted"]}:
+        query = "SELECT path FROM entries WHERE file_id = ?"
+        for row in state.execute(query, (file_id, )).fetchall():
+            state_forget(state, row["path"])
+
+    recorded = {row["path"]: row for row in state.execute("SELECT * FROM entries")}
+    # Maps the remote folders known to be under 'r_root' to their relative path
+    folder_paths = {
+        row["file_id"]: path
+        for path, row in recorded.items() if row["mime_type"] == GD_FOLDER_MIMETYPE
+    }
+    folder_paths[r_root["id"]] = ""
+
+    remote_changed, moved = remote_place(changes, folder_paths, filters)
+    for r_dir, old_path in moved:
+        remote_moved(state, r_dir, old_path, recorded, remote_changed, folder_paths, filters)
+    return remote_changed, folder_paths, recorded
+
+
+def remote_place(
+    changes: list[dict], folder_paths: dict[str, str], filters: Optional[Filters]
+) -> tuple[RemoteChanges, list[tuple[GoogleDriveFile, Optional[str]]]]:
     """
-    # Gets a list of local children from the given parent
-    local_childrens = {basename(l_entry): join(l_root, l_entry) for l_entry in listdir(l_root)}
+    Places the changed remote entries in the tree by their parent, the ones outside the
+    root (or whose parent is unknown) are skipped. Returns the changed entries by relative
+    path and the folders whose path has changed, along with their old path (if any).
 
-    for entry_name, l_child in local_childrens.items():
-        # Interpolates the local counterpart path
-        r_child = gd_join(r_root, entry_name)
+    Args:
+        changes (list[dict]): The changes reported by the Drive changes feed
+        folder_paths (dict[str, str]): The remote folders by relative path, updated in place
+        filters (Optional[Filters]): The exclusion rules, the excluded entries are skipped
+    """
+    # A new folder may be listed after its own children, so it's repeated until no progress
+    remote_changed, pending = {}, [change["file"] for change in changes if not change["deleted"]]
+    moved = []  # The folders whose path has changed (or new to 'r_root'), with the old path
+    while len(pending) != 0:
+        unresolved = []
+        for r_entry in pending:
+            parent_ids = [parent["id"] for parent in r_entry.get("parents", [])]
+            parent_id = next((p_id for p_id in parent_ids if p_id in folder_paths), None)
+            # Changes outside 'r_root' (or not yet placed) are skipped
+            if parent_id is None:
+                unresolved.append(r_entry)
+                continue
+            path = join(folder_paths[parent_id], r_entry["title"])
+            # The folders recorded before being excluded are still known, hence the parent check
+            if filters is not None and (filters.excludes_parent(path) or \
+                    filters.excludes_remote(path, r_entry)):
+                continue
+            remote_changed[path] = (r_entry, parent_id)
+            if gd_isdir(r_entry):
+                if folder_paths.get(r_entry["id"]) != path:
+                    moved.append((r_entry, folder_paths.get(r_entry["id"])))
+                folder_paths[r_entry["id"]] = path
+        if len(unresolved) == len(pending):
+            break
+        pending = unresolved
+    return remote_changed, moved
+
+
+def remote_moved(
+    state: Connection,
+    r_dir: GoogleDriveFile,
+    old_path: Optional[str],
+    recorded: dict[str, Row],
+    remote_changed: RemoteChanges,
+    folder_paths: dict[str, str],
+    filters: Optional[Filters]
+) -> None:
+    """
+    A renamed or moved folder is reported alone, without its unchanged content, so its
+    subtree is indexed again and placed under the new path (as a full sync would do),
+    while its old path is forgotten.
 
-        # If the 'l_child' is a direcotry then is recursively pushed
-        if isdir(l_child):
-            gd_mkdir(r_child) if not gd_exists(r_child) else None  # pylint: disable=expression-not-assigned
-            push_to_drive(l_child, r_child)
+    Args:
+        state (Connection): The sync state database
+        r_dir (GoogleDriveFile): The remote folder renamed or moved
+        old_path (Optional[str]): The recorded path of 'r_dir', None if new to 'r_root'
+        recorded (dict[str, Row]): The recorded rows by relative path, updated in place
+        remote_changed (RemoteChanges): The changed remote entries, updated in place
+        folder_paths (dict[str, str]): The remote folders by relative path, updated in place
+        filters (Optional[Filters]): The exclusion rules, the excluded entries are skipped
+    """
+    if old_path is not None:
+        state_forget(state, old_path)
+        old_subtree = join(old_path, "")
+        for path in [path for path in recorded if path.startswith(old_subtree)]:
+            del recorded[path]
+        recorded.pop(old_path, None)
+
+    sub_index, stack = gd_index(r_dir), [(r_dir["id"], folder_paths[r_dir["id"]])]
+    while len(stack) != 0:
+        dir_id, dir_path = stack.pop()
+        for r_child in sub_index.get(dir_id, {}).values():
+            path = join(dir_path, r_child["title"])
+            if filters is not None and filters.excludes_remote(path, r_child):
+                continue
+            # The changes feed has the freshest metadata, if the child is reported too
+            remote_changed.setdefault(path, (r_child, dir_id))
+            if gd_isdir(r_child):
+                folder_paths[r_child["id"]] = path
+                stack.append((r_child["id"], path))
+
+
+def local_deltas(
+    l_root: PathLike,
+    recorded: dict[str, Row],
+    remote_changed: RemoteChanges,
+    filters: Optional[Filters]
+) -> list[str]:
+    """
+    Returns the relative paths whose stat differs from the recorded one (or not recorded at
+    all). The recorded files missing locally are added to 'remote_changed' instead, so that
+    they're pulled again, as a full pull would do.
 
-        # Skips the current iteration if 'l_child' isn't a file
-        if not isfile(l_child):
+    Args:
+        l_root (PathLike): The local root dir
+        recorded (dict[str, Row]): The recorded rows by relative path
+        remote_changed (RemoteChanges): The changed remote entries, updated in place
+        filters (Optional[Filters]): The exclusion rules, the excluded entries are skipped
+    """
+    local_changed, local_seen = [], set()
+    for l_entry in local_scan(l_root, filters=filters):
+        path = relpath(l_entry.path, l_root)
+        row = recorded.get(path)
+        local_seen.add(path)
+        if row is None or row["l_mtime_ns"] != l_entry.mtime_ns or \
+                row["l_inode"] != l_entry.inode or \
+                (not l_entry.is_dir and row["size"] != l_entry.size):
+            local_changed.append(path)
+
+    for path in set(recorded) - local_seen:
+        row = recorded[path]
+        # Entries recorded before being excluded are simply missing from the local scan
+        if filters is not None and (filters.excludes_parent(path) or \
+                filters.excludes_remote(path, state_entry(row))):
             continue
+        if path not in remote_changed and row["mime_type"] != GD_FOLDER_MIMETYPE:
+            remote_changed[path] = (gdrive.CreateFile({"id": row["file_id"]}), row["parent_id"])
+    return local_changed
+
+
+def pull_changes(
+    l_root: PathLike,
+    state: Connection,
+    remote_changed: RemoteChanges,
+    jobs: int,
+    hashes: Optional[Connection],
+    chunk_size: int,
+    filters: Optional[Filters]
+) -> None:
+    """
+    Pulls the changed remote entries, recording in the sync state each pair once aligned.
 
-        # If the 'r_child' is newer or the local one doesn't exist then we pull from Drive
-        if not (gd_exists(r_child)) or getmtime(l_child) > gd_getmtime(r_child):
-            console.log(f"Pushing '{l_child}' to Google Drive")
-            gd_upload(l_child, r_child)
+    Args:
+        l_root (PathLike): The local root dir
+        state (Connection): The sync state database
+        remote_changed (RemoteChanges): The changed remote entries by relative path
+        jobs (int): The number of concurrent transfers
+        hashes (Optional[Connection]): The checksum cache, enables the content comparison
+        chunk_size (int): Files bigger than this (in bytes) are transferred in chunks
+        filters (Optional[Filters]): The exclusion rules, the excluded entries are skipped
+    """
+    plan = []
+    # Sorting ensures that parent folders are handled before their children
+    for path, (r_entry, parent_id) in sorted(remote_changed.items()):
+        l_child = join(l_root, path)
+        if gd_isdir(r_entry):
+            makedirs(l_child, exist_ok=True)
+            state_record(state, l_root, l_child, r_entry, parent_id)
+            continue
+        if not gd_isfile(r_entry):
+            continue
+        # The local copy may be excluded even if the remote one isn't, the pair is skipped
+        if filters is not None and exists(l_child) and \
+                filters.excludes_local(l_child, False, getsize(l_child)):
+            continue
+        if not exists(l_child) or is_newer(gd_getmtime(r_entry), getmtime(l_child)):
+            is_same = hashes is not None and exists(l_child) and \
+                same_content(l_child, r_entry, hashes)
+            if is_same:
+                local_touch(l_child, r_entry, hashes)
+                state_record(state, l_root, l_child, r_entry, parent_id)
+            else:
+                makedirs(dirname(l_child), exist_ok=True)
+                reason = transfer_reason(exists(l_child), hashes)
+                plan.append(Transfer("download", l_child, r_entry, parent_id, reason))
+        # Records the pair only if aligned, a newer local file still has to be pushed
+        elif not is_newer(getmtime(l_child), gd_getmtime(r_entry)):
+            state_record(state, l_root, l_child, r_entry, parent_id)
+
+    # Once downloaded, the local file is aligned with its remote counterpart
+    for transfer in run_transfers(plan, jobs, chunk_size):
+        state_record(state, l_root, transfer.l_path, transfer.r_entry, transfer.parent_id)
+
+
+def push_counterpart(
+    l_root: PathLike,
+    path: str,
+    parent_id: str,
+    remote_changed: RemoteChanges,
+    recorded: dict[str, Row],
+    filters: Optional[Filters]
+) -> Optional[GoogleDriveFile]:
+    """
+    Returns the freshest known remote counterpart of a changed local path, otherwise a new
+    remote entry to be created. None if the remote copy is missing since it's excluded.
 
+    Args:
+        l_root (PathLike): The local root dir
+        path (str): The changed local path, relative to 'l_root'
+        parent_id (str): The id of the remote parent folder
+        remote_changed (RemoteChanges): The changed remote entries by relative path
+        recorded (dict[str, Row]): The recorded rows by relative path
+        filters (Optional[Filters]): The exclusion rules, the excluded entries are skipped
+    """
+    if path in remote_changed:
+        return remote_changed[path][0]
+    if path in recorded:
+        return state_entry(recorded[path])
+    if filters is not None and filters.excludes_counterpart(join(l_root, path)):
+        return None
+    parents = [{"id": parent_id, "kind": "drive#fileLink"}]
+    return gdrive.CreateFile({'title': basename(path), 'parents': parents})
+
+
+def push_folders(
+    l_root: PathLike, state: Connection, folders: list[tuple[str, GoogleDriveFile, str]]
+) -> dict[str, str]:
+    """
+    Creates in batch the remote folders that don't exist yet and records all of them in the
+    sync state. Returns the id of each folder (the failed ones excluded) by relative path.
+
+    Args:
+        l_root (PathLike): The local root dir
+        state (Connection): The sync state database
+        folders (list[tuple]): The relative path, remote entry and parent id of each folder
+    """
+    folder_ids = {}
+    new_dirs = [r_dir for _, r_dir, _ in folders if not gd_exists(r_dir)]
+    errors = dict(zip(map(id, new_dirs), gd_mkdirs(new_dirs)))
+    for path, r_dir, parent_id in folders:
+        error = errors.get(id(r_dir))
+        if error is not None:
+            console.print(f"[red]Failed to create '{path}' on Google Drive: {error}[/red]")
+            continue
+        folder_ids[path] = r_dir["id"]
+        state_record(state, l_root, join(l_root, path), r_dir, parent_id)
+    return folder_ids
+
+
+def push_changes(
+    l_root: PathLike,
+    state: Connection,
+    local_changed: list[str],
+    remote_changed: RemoteChanges,
+    folder_paths: dict[str, str],
+    recorded: dict[str, Row],
+    jobs: int,
+    hashes: Optional[Connection],
+    chunk_size: int,
+    filters: Optional[Filters]
+) -> None:
+    """
+    Pushes the changed local paths level by level, the missing folders of each level are
+    created in batch requests. Each pair is recorded in the sync state once aligned.
+
+    Args:
+        l_root (PathLike): The local root dir
+        state (Connection): The sync state database
+        local_changed (list[str]): The changed local paths, relative to 'l_root'
+        remote_changed (RemoteChanges): The changed remote entries by relative path
+        folder_paths (dict[str, str]): The remote folders mapped to their relative path
+        recorded (dict[str, Row]): The recorded rows by relative path
+        jobs (int): The number of concurrent transfers
+        hashes (Optional[Connection]): The checksum cache, enables the content comparison
+        chunk_size (int): Files bigger than this (in bytes) are transferred in chunks
+        filters (Optional[Filters]): The exclusion rules, the excluded entries are skipped
+    """
+    plan, folder_ids = [], {path: folder_id for folder_id, path in folder_paths.items()}
+    # Grouped by depth, so that the missing folders of each level are created in batch
+    levels = {}
+    for path in local_changed:
+        levels.setdefault(path.count(sep), []).append(path)
+
+    for depth in sorted(levels):
+        missing = []
+        for path in sorted(levels[depth]):
+            l_child, parent_id = join(l_root, path), folder_ids.get(dirname(path))
+            if parent_id is None:  # The parent folder couldn't be created on Drive
+                continue
+            r_child = push_counterpart(l_root, path, parent_id, remote_changed, recorded, filters)
+            if r_child is None:  # The remote copy has been excluded, it's not missing
+                continue
+            if isdir(l_child):
+                missing.append((path, r_child, parent_id))
+                continue
+            if not gd_exists(r_child) or is_newer(getmtime(l_child), gd_getmtime(r_child)):
+                is_same = hashes is not None and gd_exists(r_child) and \
+                    same_content(l_child, r_child, hashes)
+                reason = transfer_reason(gd_exists(r_child), hashes)
+                action, reason = ("touch", "same-content") if is_same else ("upload", reason)
+                plan.append(Transfer(action, l_child, r_child, parent_id, reason))
+            # Records the pair only if aligned, a newer remote file still has to be pulled
+            elif not is_newer(gd_getmtime(r_child), getmtime(l_child)):
+                state_record(state, l_root, l_child, r_child, parent_id)
+
+        folder_ids.update(push_folders(l_root, state, missing))
+
+    # Once uploaded (or touched), the remote file is aligned with its local counterpart
+    for transfer in run_transfers(plan, jobs, chunk_size):
+        state_record(state, l_root, transfer.l_path, transfer.r_entry, transfer.parent_id)
+
+
+def sync_changes(
+    l_root: PathLike,
+    r_root: GoogleDriveFile,
+    state: Connection,
+    pull: bool,
+    push: bool,
+    jobs: int = TRANSFER_JOBS,
+    checksum: bool = False,
+    chunk_size: int = CHUNK_SIZE,
+    filters: Optional[Filters] = None
+) -> None:
+    """
+    Incremental counterpart of 'pull_from_drive' and 'push_to_drive'. Only the remote entries
+    reported by the Drive changes feed and the local paths whose stat differs from the one
+    recorded in the sync state are compared, everything else is known to be already in sync.
+    On the first run (no changes token yet) a full pull/push is done to seed the state.
+
+    Args:
+        l_root (PathLike): The local root dir to be synchronized
+        r_root (GoogleDriveFile): The remote counterpart of 'l_root'
+        state (Connection): The sync state database of 'l_root'
+        pull (bool): Enables the pull of new files/changes from Google Drive
+        push (bool): Enables the push of new files/changes to Google Drive
+        jobs (int): The number of concurrent transfers
+        checksum (bool): Compares the content of newer files, to avoid needless transfers
+        chunk_size (int): Files bigger than this (in bytes) are transferred in chunks
+        filters (Optional[Filters]): The exclusion rules, the excluded entries are never synced
+    """
+    token = state.execute("SELECT value FROM tokens WHERE name = 'changes'").fetchone()
+    hashes = state if checksum else None  # The checksum cache is kept in the same database
+
+    if token is None:
+        # The token is taken beforehand, so that changes made during the full sync aren't lost
+        new_token, remote_index = gd_changes_token(), gd_index(r_root, filters)
+        if pull:
+            pull_from_drive(l_root, r_root, remote_index, jobs, hashes, chunk_size, filters)
+        if push:
+            push_to_drive(l_root, r_root, remote_index, jobs, hashes, chunk_size, filters)
+        state_rebuild(state, l_root, r_root, filters)
+        state.execute("INSERT OR REPLACE INTO tokens VALUES ('changes', ?)", (new_token, ))
+        return
+
+    changes, new_token = gd_changes(token["value"])
+    remote_changed, folder_paths, recorded = remote_deltas(state, changes, r_root, filters)
+    local_changed = local_deltas(l_root, recorded, remote_changed, filters)
+
+    if pull:
+        pull_changes(l_root, state, remote_changed, jobs, hashes, chunk_size, filters)
+    if push:
+        push_changes(
+            l_root, state, local_changed, remote_changed, folder_paths, recorded, jobs, hashes,
+            chunk_size, filters
+        )
+
+    # Without pull, the remote changes are kept in the feed so that a later pull can see them
+    if pull:
+        state.execute("INSERT OR REPLACE INTO tokens VALUES ('changes', ?)", (new_token, ))
+
+
+def plan_record(transfer: Transfer, target: str) -> dict:
+    """
+    Serializes a planned transfer into a JSON compatible record, with the remote metadata
+    needed to apply it later on without scanning neither the local nor the remote tree.
+
+    Args:
+        transfer (Transfer): The planned transfer
+        target (str): The side changed by the transfer, either "local" (pull) or "remote" (push)
+    """
+    r_entry = transfer.r_entry
+    if transfer.action == "upload":
+        size = getsize(transfer.l_path)
+    elif transfer.action in ("download", "skip"):
+        size = int(r_entry.get("fileSize", 0))
+    else:  # Folders and mtime updates don't move any content
+        size = 0
+
+    return {
+        "action": transfer.action, "reason": transfer.reason, "target": target,
+        "path": transfer.l_path, "size": size, "file_id": r_entry.get("id"),
+        "parent_id": transfer.parent_id,
+        "remote": {field: r_entry[field] for field in GD_PLAN_FIELDS if field in r_entry},
+    }
+
+
+def plan_load(record: dict) -> Transfer:
+    """
+    Rebuilds the transfer saved in a plan record, without any request to Drive. If the remote
+    entry doesn't exist yet, its parents are left to be filled in by the caller.
+
+    Args:
+        record (dict): The plan record, as returned by 'plan_record'
+    """
+    metadata = {"title": basename(record["path"]), **record["remote"]}
+    if record["file_id"] is None:
+        r_entry = gdrive.CreateFile(metadata)
+    else:
+        metadata.update(id=record["file_id"], downloadUrl=GD_MEDIA_URL.format(record["file_id"]))
+        r_entry = GoogleDriveFile(gdrive.auth, metadata, uploaded=True)
+    return Transfer(
+        record["action"], record["path"], r_entry, record["parent_id"], record["reason"]
+    )
+
+
+def plan_estimate(records: list[dict], chunk_size: int = CHUNK_SIZE) -> dict:
+    """
+    Summarizes a plan: number of entries per action, bytes to be moved in each direction and
+    an estimate of the API calls needed to apply it (the remote snapshot isn't accounted).
+
+    Args:
+        records (list[dict]): The plan records, as returned by 'plan_record'
+        chunk_size (int): Files bigger than this (in bytes) are transferred in chunks
+    """
+    summary = {"download": 0, "upload": 0, "mkdir": 0, "touch": 0, "skip": 0}
+    summary.update(download_bytes=0, upload_bytes=0, api_calls=0)
+    batched = {}  # The remote folders (per level) and mtime updates are sent in batch requests
+
+    for record in records:
+        action, size = record["action"], record["size"]
+        summary[action] += 1
+        if action == "download":
+            summary["download_bytes"] += size
+            summary["api_calls"] += ceil(size / chunk_size) if size > chunk_size else 1
+        elif action == "upload":  # The resumable upload session has to be opened first
+            summary["upload_bytes"] += size
+            summary["api_calls"] += 1 + ceil(size / chunk_size) if size > chunk_size else 1
+        elif action in ("mkdir", "touch") and record["target"] == "remote":
+            key = (action, record["path"].count(sep) if action == "mkdir" else 0)
+            batched[key] = batched.get(key, 0) + 1
+
+    summary["api_calls"] += sum(ceil(count / GD_BATCH_SIZE) for count in batched.values())
+    return summary
+
+
+def watch_folder(l_dir: PathLike, folders: dict[str, GoogleDriveFile]) -> GoogleDriveFile:
+    """
+    Returns the remote counterpart of a watched local directory, creating it (and its missing
+    ancestors) if needed. The result is cached in 'folders', seeded with the synced roots.
+
+    Args:
+        l_dir (PathLike): The local directory, inside one of the synced roots
+        folders (dict[str, GoogleDriveFile]): The cache of the already resolved directories
+    """
+    if l_dir not in folders:
+        parent = watch_folder(dirname(l_dir), folders)
+        folder = gd_join(parent, basename(l_dir))
+        if not gd_exists(folder):
+            console.log(f"Creating '{l_dir}' on Google Drive")
+            gd_mkdir(folder)
+        folders[l_dir] = folder
+    return folders[l_dir]
+
+
+def watch_push(
+    l_paths: list[PathLike],
+    folders: dict[str, GoogleDriveFile],
+    jobs: int = TRANSFER_JOBS,
+    chunk_size: int = CHUNK_SIZE
+) -> None:
+    """
+    Pushes a small batch of changed local paths, the folders are created right away while
+    the new or newer files are uploaded by the workers pool. Each remote folder is listed
+    at most once per batch, so that files changed together cost a single query.
+
+    Args:
+        l_paths (list[PathLike]): The changed local paths, parents before their children
+        folders (dict[str, GoogleDriveFile]): The cache of the already resolved directories
+        jobs (int): The number of concurrent uploads
+        chunk_size (int): Files bigger than this (in bytes) are transferred in chunks
+    """
+    plan, listings = [], {}
 
-def main(*paths: list[PathLike], pull: bool = True, push: bool = False) -> None:
+    for l_path in l_paths:
+        # The path could have been removed (or moved away) in the meantime
+        if isdir(l_path):
+            watch_folder(l_path, folders)
+        if not isfile(l_path):
+            continue
+
+        parent = watch_folder(dirname(l_path), folders)
+        if parent["id"] not in listings:
+            listings[parent["id"]] = {r_entry["title"]: r_entry for r_entry in gd_listdir(parent)}
+        r_entry = listings[parent["id"]].get(basename(l_path))
+        if r_entry is None:
+            parents = [{"id": parent["id"], "kind": "drive#fileLink"}]
+            r_entry = gdrive.CreateFile({'title': basename(l_path), 'parents': parents})
+
+        if not gd_exists(r_entry) or is_newer(getmtime(l_path), gd_getmtime(r_entry)):
+            reason = transfer_reason(gd_exists(r_entry), None)
+            plan.append(Transfer("upload", l_path, r_entry, parent["id"], reason))
+
+    run_transfers(plan, jobs, chunk_size)
+
+
+def main(
+    *paths: list[PathLike],
+    pull: bool = True,
+    push: bool = False,
+    incremental: bool = False,
+    jobs: int = TRANSFER_JOBS,
+    checksum: bool = False,
+    chunk_size: int = CHUNK_SIZE // 1024**2,
+    max_size: Optional[float] = None,
+    exclude_mime: Union[str, tuple[str, ...]] = ()
+) -> None:
     """
     Script entrypoint and dipsatcher, handles input validation and dispatch to both
     'pull_from_drive' and 'push_to_drive' functions.
@@ -272,7 +2033,15 @@ def main(*paths: list[PathLike], pull: bool = True, push: bool = False) -> None:
         paths (list[PathLike]): The list of local path to push and/or pull
         pull (bool): Enables the pull of new files/changes from Google Drive
         push (bool): Enables the push of new files/changes to Google Drive
+        incremental (bool): Syncs only the changes made since the last (incremental) run
+        jobs (int): The number of concurrent transfers (downloads or uploads)
+        checksum (bool): Compares the content of newer files, only the mtime is fixed if equal
+        chunk_size (int): Files bigger than this (in MiB) are transferred in resumable chunks
+        max_size (Optional[float]): Files bigger than this (in MiB) are excluded from the sync
+        exclude_mime (Union[str, tuple[str, ...]]): Globs of mimetypes excluded from the sync
     """
+    # Drive requires the resumable upload chunks to be a multiple of 256 KiB
+    chunk_size = max(int(chunk_size), 1) * 1024**2
     # Gets a reference to the root of the Google Drive filesystem
     drive_root = gdrive.CreateFile({"id": "root"})
 
@@ -284,16 +2053,294 @@ def main(*paths: list[PathLike], pull: bool = True, push: bool = False) -> None:
 
         # Generates interface compliant argument for both recursive pull and push functions
         local_entry, remote_entry = abspath(argpath), gd_join(drive_root, basename(argpath))
+        filters = filters_load(local_entry, max_size, exclude_mime)
+
+        # The incremental sync relies on the state saved by the previous runs
+        if incremental:
+            state = state_open(local_entry)
+            with state:  # Commits the new state only if the sync completes
+                sync_changes(
+                    local_entry, remote_entry, state, pull, push, jobs, checksum, chunk_size,
+                    filters
+                )
+            state.close()
+            continue
+
+        # Takes a snapshot of the remote tree, shared by both pull and push
+        remote_index = gd_index(remote_entry, filters)
+        # The checksum cache is kept in the sidecar database, even without incremental sync
+        hashes = state_open(local_entry) if checksum else None
 
         # Pulls from Drive if the user has provided the flag
-        pull_from_drive(local_entry, remote_entry) if pull else None  # pylint: disable=expression-not-assigned
+        if pull:
+            pull_from_drive(
+                local_entry, remote_entry, remote_index, jobs, hashes, chunk_size, filters
+            )
         # Push to Drive if the user has provided the flag
-        push_to_drive(local_entry, remote_entry) if push else None  # pylint: disable=expression-not-assigned
+        if push:
+            push_to_drive(
+                local_entry, remote_entry, remote_index, jobs, hashes, chunk_size, filters
+            )
+
+        if hashes is not None:
+            hashes.commit()
+            hashes.close()
+
+
+def plan_sync(
+    *paths: list[PathLike],
+    pull: bool = True,
+    push: bool = False,
+    checksum: bool = False,
+    output: str = "-",
+    ndjson: bool = False,
+    chunk_size: int = CHUNK_SIZE // 1024**2,
+    max_size: Optional[float] = None,
+    exclude_mime: Union[str, tuple[str, ...]] = ()
+) -> None:
+    """
+    Dry run of 'main', plans the sync of the given paths without changing anything and
+    writes the plan as JSON (entries and summary) or NDJSON (one entry per line), to be
+    reviewed and later executed with 'apply_plan'.
+
+    Args:
+        paths (list[PathLike]): The list of local path to push and/or pull
+        pull (bool): Plans the pull of new files/changes from Google Drive
+        push (bool): Plans the push of new files/changes to Google Drive
+        checksum (bool): Compares the content of newer files, only the mtime is fixed if equal
+        output (str): The file in which the plan is written, "-" for the standard output
+        ndjson (bool): Writes the plan as NDJSON, instead of a single JSON document
+        chunk_size (int): Files bigger than this (in MiB) are transferred in resumable chunks
+        max_size (Optional[float]): Files bigger than this (in MiB) are excluded from the sync
+        exclude_mime (Union[str, tuple[str, ...]]): Globs of mimetypes excluded from the sync
+    """
+    chunk_size = max(int(chunk_size), 1) * 1024**2
+    # Gets a reference to the root of the Google Drive filesystem
+    drive_root, records = gdrive.CreateFile({"id": "root"}), []
+
+    for argpath in paths:
+        if not exists(argpath):
+            raise FileNotFoundError(f"{argpath} doesn't exists")
+
+        local_entry, remote_entry = abspath(argpath), gd_join(drive_root, basename(argpath))
+        filters = filters_load(local_entry, max_size, exclude_mime)
+        remote_index = gd_index(remote_entry, filters)
+        hashes = state_open(local_entry) if checksum else None
+
+        pulled = plan_pull(
+            local_entry, remote_entry, remote_index, hashes, True, filters=filters
+        ) if pull else []
+        records.extend(plan_record(transfer, "local") for transfer in pulled)
+        if push:
+            # The files already planned by the pull would be reported twice as up to date
+            planned = {transfer.l_path for transfer in pulled}
+            pushed = plan_push(local_entry, remote_entry, remote_index, hashes, True, filters)
+            for transfer in pushed:
+                if transfer.action != "skip" or transfer.l_path not in planned:
+                    records.append(plan_record(transfer, "remote"))
+
+        if hashes is not None:
+            hashes.commit()
+            hashes.close()
+
+    summary = plan_estimate(records, chunk_size)
+    if ndjson:
+        content = "".join(f"{dumps(record)}\n" for record in records)
+    else:
+        content = f"{dumps({'summary': summary, 'entries': records}, indent=2)}\n"
+
+    if output == "-":
+        # The plan is written as is, the rich console would wrap and highlight the JSON
+        stdout.write(content)
+        return
+    with open(output, "w", encoding="utf-8") as plan_file:
+        plan_file.write(content)
+    console.print(f"[yellow]Plan of {len(records)} entries written to {output}[/yellow]")
+    console.print(summary)
+
+
+def apply_plan(
+    plan_path: PathLike, jobs: int = TRANSFER_JOBS, chunk_size: int = CHUNK_SIZE // 1024**2
+) -> None:
+    """
+    Executes a plan written by 'plan_sync' (either JSON or NDJSON) without scanning again
+    neither the local nor the remote tree. The folders are created first (level by level on
+    Google Drive), then the content transfers are handed to the workers pool.
+
+    Args:
+        plan_path (PathLike): The plan to be executed
+        jobs (int): The number of concurrent transfers (downloads or uploads)
+        chunk_size (int): Files bigger than this (in MiB) are transferred in resumable chunks
+    """
+    chunk_size = max(int(chunk_size), 1) * 1024**2
+    with open(plan_path, "r", encoding="utf-8") as plan_file:
+        content = plan_file.read()
+    try:  # A JSON document has the entries under its own key, otherwise is NDJSON
+        records = loads(content)["entries"]
+    except (ValueError, KeyError, TypeError):
+        records = [loads(line) for line in content.splitlines() if line.strip() != ""]
+
+    # Missing local folders (of pulled entries) can be created right away
+    for record in records:
+        if record["action"] == "mkdir" and record["target"] == "local":
+            makedirs(record["path"], exist_ok=True)
+
+    # The remote folders are created level by level, since their id is needed by their children
+    folder_ids, levels = {}, {}
+    for record in records:
+        if record["action"] == "mkdir" and record["target"] == "remote":
+            levels.setdefault(record["path"].count(sep), []).append(record)
+    for depth in sorted(levels):
+        new_dirs = []
+        for record in levels[depth]:
+            parent_id = record["parent_id"] or folder_ids.get(dirname(record["path"]))
+            if parent_id is None:  # The parent folder couldn't be created on Drive
+                continue
+            parents = [{"id": parent_id, "kind": "drive#fileLink"}]
+            gd_dir = gdrive.CreateFile({"title": basename(record["path"]), "parents": parents})
+            new_dirs.append((record["path"], gd_dir))
+        for (l_dir, gd_dir), error in zip(new_dirs, gd_mkdirs([gd_dir for _, gd_dir in new_dirs])):
+            if error is not None:
+                console.print(f"[red]Failed to create '{l_dir}' on Google Drive: {error}[/red]")
+                continue
+            folder_ids[l_dir] = gd_dir["id"]
+
+    plan = []
+    for record in records:
+        if record["action"] in ("mkdir", "skip"):
+            continue
+        transfer = plan_load(record)
+        # Local mtime updates don't need any request, so they're applied right away
+        if transfer.action == "touch" and record["target"] == "local":
+            console.log(f"Updating mtime of '{transfer.l_path}' from Google Drive")
+            utime(transfer.l_path, (gd_getmtime(transfer.r_entry), gd_getmtime(transfer.r_entry)))
+            continue
+        # New remote files are placed in their parent folder, possibly created just above
+        if not gd_exists(transfer.r_entry):
+            transfer.parent_id = transfer.parent_id or folder_ids.get(dirname(transfer.l_path))
+            if transfer.parent_id is None:  # The parent folder couldn't be created on Drive
+                continue
+            transfer.r_entry["parents"] = [{"id": transfer.parent_id, "kind": "drive#fileLink"}]
+        if transfer.action == "download":
+            makedirs(dirname(transfer.l_path), exist_ok=True)
+        plan.append(transfer)
+
+    completed = run_transfers(plan, jobs, chunk_size)
+    console.print(f"[yellow]Applied {len(completed)} of {len(plan)} planned transfers[/yellow]")
+
+
+def watch_paths(
+    *paths: list[PathLike],
+    jobs: int = TRANSFER_JOBS,
+    debounce: float = WATCH_DEBOUNCE,
+    chunk_size: int = CHUNK_SIZE // 1024**2,
+    max_size: Optional[float] = None,
+    exclude_mime: Union[str, tuple[str, ...]] = ()
+) -> None:
+    """
+    Daemon mode (Linux only), pushes the local changes to Google Drive as they happen instead
+    of rescanning the whole tree. After an initial push, the events of each directory are
+    collected through inotify and coalesced per path, a path is pushed once it has been quiet
+    for 'debounce' seconds. Deletions are never propagated, same as for the other modes.
+
+    Args:
+        paths (list[PathLike]): The list of local path to be watched and pushed
+        jobs (int): The number of concurrent uploads
+        debounce (float): Seconds without events on a path before it's pushed
+        chunk_size (int): Files bigger than this (in MiB) are transferred in resumable chunks
+        max_size (Optional[float]): Files bigger than this (in MiB) are excluded from the sync
+        exclude_mime (Union[str, tuple[str, ...]]): Globs of mimetypes excluded from the sync
+    """
+    chunk_size = max(int(chunk_size), 1) * 1024**2
+    # Gets a reference to the root of the Google Drive filesystem
+    drive_root, inotify, roots = gdrive.CreateFile({"id": "root"}), Inotify(), {}
+    root_filters = {}  # The exclusion rules of each watched root
+
+    try:
+        for argpath in paths:
+            if not exists(argpath):
+                raise FileNotFoundError(f"{argpath} doesn't exists")
+
+            console.print(f"[yellow]Synchronization of {argpath} to Google Drive[yellow]")
+            local_entry, remote_entry = abspath(argpath), gd_join(drive_root, basename(argpath))
+            filters = filters_load(local_entry, max_size, exclude_mime)
+            # The changes made while the daemon wasn't running are pushed upfront
+            push_to_drive(
+                local_entry, remote_entry, jobs=jobs, chunk_size=chunk_size, filters=filters
+            )
+            roots[local_entry], root_filters[local_entry] = remote_entry, filters
+            # The excluded directories aren't even watched
+            inotify.add(local_entry)
+            for l_entry in local_scan(local_entry, filters=filters):
+                inotify.add(l_entry.path) if l_entry.is_dir else None  # pylint: disable=expression-not-assigned
+
+        console.print("[yellow]Watching for local changes, press Ctrl+C to stop[/yellow]")
+        folders, pending = dict(roots), {}  # Changed paths, mapped to the time of their last event
+
+        while True:
+            # Sleeps until the next event or until the oldest pending path is due
+            next_due = min(pending.values(), default=None)
+            timeout = None if next_due is None else max(next_due + debounce - monotonic(), 0)
+
+            for l_path, mask in inotify.read(timeout):
+                # Some events have been lost, so only a full push can restore the sync
+                if mask & IN_Q_OVERFLOW:
+                    console.print("[red]Too many local changes, pushing everything again[/red]")
+                    for local_entry, remote_entry in roots.items():
+                        filters = root_filters[local_entry]
+                        push_to_drive(
+                            local_entry, remote_entry, jobs=jobs, chunk_size=chunk_size,
+                            filters=filters
+                        )
+                    pending.clear()
+                    continue
+                if is_sidecar(basename(l_path)):
+                    continue
+
+                # What's gone is no longer to be pushed, its remote counterpart is left as is
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    pending.pop(l_path, None)
+                    if mask & IN_ISDIR:
+                        inotify.remove(l_path)
+                        pending = {p: t for p, t in pending.items() if not is_within(p, l_path)}
+                    continue
+
+                # Same rules of the scans, so the excluded paths are never pushed
+                l_root = next(root for root in roots if is_within(l_path, root))
+                try:
+                    size = 0 if mask & IN_ISDIR else stat(l_path).st_size
+                except FileNotFoundError:  # Already gone, nothing to be pushed
+                    continue
+                if root_filters[l_root].excludes_local(l_path, bool(mask & IN_ISDIR), size):
+                    continue
+
+                # Files created before the watch of a new directory would go unnoticed otherwise
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    inotify.add(l_path)
+                    for l_entry in local_scan(l_path, filters=root_filters[l_root]):
+                        inotify.add(l_entry.path) if l_entry.is_dir else None  # pylint: disable=expression-not-assigned
+                        pending[l_entry.path] = monotonic()
+                pending[l_path] = monotonic()
+
+            # Sorted so that the parent folders are pushed before their children
+            now = monotonic()
+            due = sorted(p for p, t in pending.items() if now - t >= debounce)[:WATCH_BATCH_SIZE]
+            for l_path in due:
+                del pending[l_path]
+            if len(due) != 0:
+                watch_push(due, folders, jobs, chunk_size)
+    finally:
+        inotify.close()
 
 
 if __name__ == "__main__":
     try:
-        Fire(main)
+        commands = {"sync": main, "plan": plan_sync, "apply": apply_plan, "watch": watch_paths}
+        # Without a subcommand the paths are synced, as the CLI did before the subcommands
+        if len(argv) > 1 and argv[1] not in commands and argv[1] not in ("-h", "--help"):
+            Fire(main)
+        else:
+            Fire(commands)
     except KeyboardInterrupt:
         console.print("[yellow]Interrupt received, closing now...[/yellow]")
     except Exception:
@@ -3,8 +3,10 @@
 ChimeraScript - YouTubeScraper.py
 
 This script allows to automate download of videos and whole playlists from YouTube.
-The CLI presents two subcommands: "video" or "playlist" either to download a single video
-or a list of videos from a public playlist.
+The CLI presents four subcommands: "video" or "playlist" either to download a single video
+or a list of videos from a public playlist, "sync" to download only the videos added
+to a playlist since the last run (the ones already downloaded are tracked in a manifest)
+and "batch" to download all the videos and playlists listed in a file (or standard input).
 
 Example:
     To download the YouTube Rewind 2018 video use::
@@ -16,44 +18,1028 @@ Example:
             https://www.youtube.com/watch?v=RAwntanK4wQ&list=PLwgFb6VsUj_lQTpQKDtLXKXElQychT_2j \
             ~/Videos
 
+    To download up to 8 videos of the playlist at the same time use::
+        $ python3 YouTubeScraper.py playlist <playlist_url> ~/Videos --jobs=8
+
+    To download only the videos added to the playlist since the last run use::
+        $ python3 YouTubeScraper.py sync <playlist_url> ~/Videos
+
+    To download all the videos and playlists listed in a file (or piped, omitting the file) use::
+        $ python3 YouTubeScraper.py batch urls.txt ~/Videos
+        $ cat urls.txt | python3 YouTubeScraper.py batch --out=~/Videos
+
+    To download a video in 1080p (muxing video and audio with ffmpeg) or just its audio use::
+        $ python3 YouTubeScraper.py video <video_url> ~/Videos --resolution=1080 --adaptive
+        $ python3 YouTubeScraper.py video <video_url> ~/Music --audio-only
+
 Copyright 2022 Enea Guidi (hmny). All rights reserved.
 This file are distributed under the General Public License v 3.0.
 A copy of abovesaid license can be found in the LICENSE file.
 """
-from datetime import datetime
-from os import PathLike, mkdir
-from os.path import basename, exists, isdir, join
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy, deepcopy
+from dataclasses import dataclass
+from datetime import datetime, time
+from fcntl import ioctl
+from functools import lru_cache
+from hashlib import md5
+from heapq import heappop, heappush
+from itertools import count
+from json import dump, dumps, load
+from math import inf
+from os import O_CREAT, O_WRONLY, PathLike, close, fsync, ftruncate, link, makedirs, mkdir, pwrite
+from os import remove, replace, stat
+from os import open as os_open
+from os.path import basename, dirname, exists, getsize, isdir, isfile, join, samefile, splitext
 from posixpath import abspath
-from urllib.error import URLError
+from random import uniform
+from re import IGNORECASE
+from re import compile as re_compile
+from shutil import copyfile, move, which
+from subprocess import run
+from threading import Condition, Lock, Semaphore, Thread
+from time import monotonic, sleep
+from typing import Callable, Optional, Union
+from urllib.error import HTTPError, URLError
+from urllib.parse import parse_qs, urlparse
 
 from fire import Fire
 from pytube import Playlist
+from pytube import Stream, StreamQuery
 from pytube import YouTube as Video
+from pytube import extract, request
+from pytube.cipher import Cipher
+from pytube.extract import video_id
+from requests import RequestException, Session
+from requests.adapters import HTTPAdapter
 from rich.console import Console
+from rich.progress import (
+    BarColumn,
+    DownloadColumn,
+    Progress,
+    TaskID,
+    TextColumn,
+    TimeRemainingColumn,
+    TransferSpeedColumn,
+)
+
+# Default number of videos of a playlist downloaded at the same time
+PLAYLIST_JOBS = 4
+# Max number of attempts to download a video of a playlist
+RETRY_ATTEMPTS = 5
+# Max number of failed downloads of a playlist, after which no other download is attempted
+ERROR_BUDGET = 25
+# Initial and max delay (in seconds) before retrying a failed download, doubled at each retry
+RETRY_BACKOFF, RETRY_MAX_BACKOFF = 5.0, 300.0
+# Max number of concurrent connections to the same (googlevideo) host
+HOST_JOBS = 8
+# Default number of connections (byte ranges) used to download a single stream
+SEGMENT_JOBS = 4
+# Min size of a byte range, smaller streams are fetched with less connections
+SEGMENT_SIZE = 1024 * 1024
+# Size of the blocks read from the connection and written to the file
+BLOCK_SIZE = 64 * 1024
+# Number of bytes downloaded by a range before recording them on the journal
+JOURNAL_STEP = 8 * 1024 * 1024
+# Suffixes of the partially downloaded files and of their journal
+PART_SUFFIX, JOURNAL_SUFFIX = ".part", ".journal"
+# Name of the manifest of the videos downloaded, saved in each playlist folder
+MANIFEST_NAME = ".manifest.json"
+# Default folder (inside the "out" one) of the store of the videos shared by the playlists
+STORE_NAME = ".store"
+# Request code of the ioctl that clones (reflinks) a file on copy-on-write file systems
+FICLONE = 0x40049409
+# Size of the blocks read from a downloaded file when computing its MD5 checksum
+HASH_BLOCK_SIZE = 1024 * 1024
+# Program used to mux the adaptive (video only and audio only) streams together
+MUXER = "ffmpeg"
+# Headers sent with each request (googlevideo refuses requests without an agent)
+HTTP_HEADERS = {"User-Agent": "Mozilla/5.0", "accept-language": "en-US,en"}
+# Timeout (in seconds) for connecting and for each read of an HTTP request
+HTTP_TIMEOUT = 30
+# Format of a bandwidth limit, e.g. "500K" or "09:00-18:00=500K" (in bytes per second)
+LIMIT_FORMAT = re_compile(
+    r"(?:(\d\d?):(\d\d)-(\d\d?):(\d\d)=)?(\d+(?:\.\d+)?)([KMG]?)B?", IGNORECASE
+)
+# Multipliers of the units of a bandwidth limit
+LIMIT_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+# Number of hosts whose idle connections are kept open, and max connections kept for each
+POOL_HOSTS, POOL_SIZE = 16, 32
+
+# A video to be downloaded in a folder, as the folder and the YouTube id of the video
+Job = tuple[str, str]
 
 # Rich console instance for pretty printing on the terminal
 console = Console(record=True)
+# Per host semaphores, limiting the concurrent connections to each host
+host_slots, host_slots_lock = {}, Lock()
+# Progress bars of the streams being downloaded, with their size and throughput
+progress = Progress(
+    TextColumn("{task.description}", style="cyan"),
+    BarColumn(),
+    DownloadColumn(binary_units=True),
+    TransferSpeedColumn(),
+    TimeRemainingColumn(),
+    console=console,
+    transient=True,
+)
+# HTTP session shared by all the requests of a run (both pytube's and the downloads), that
+# reuses the connections (keep-alive) instead of paying a new TCP+TLS handshake for each one
+session = Session()
+session.headers.update(HTTP_HEADERS)
+session.mount("https://", HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_SIZE))
+
+
+def session_request(
+    url: str,
+    method: Optional[str] = None,
+    headers: Optional[dict] = None,
+    data: Optional[Union[dict, bytes]] = None,
+    timeout: Optional[float] = None,
+):
+    """
+    Replacement of the (urllib based) function used by pytube for all its requests, that sends
+    them through the shared session instead. The response has the same interface (read, info)
+    and the errors are raised as the urllib ones (URLError, HTTPError) handled by pytube.
+
+    Args:
+        url (str): The URL to be requested
+        method (str): The HTTP method, GET (or POST when there's a body) if None
+        headers (dict): The headers added to the default ones
+        data (Union[dict, bytes]): The body of the request, JSON encoded if not bytes
+        timeout (float): The timeout of the request, HTTP_TIMEOUT if None (or not a number)
+
+    Raises:
+        URLError: The request couldn't be completed
+        HTTPError: The server answered with an error status code
+    """
+    if data is not None and not isinstance(data, bytes):
+        data = dumps(data).encode("utf-8")
+    # pytube uses a sentinel object (not a number) as default timeout
+    timeout = timeout if isinstance(timeout, (int, float)) else HTTP_TIMEOUT
+    method = method or ("POST" if data else "GET")
+
+    try:
+        res = session.request(method, url, headers=headers, data=data, timeout=timeout, stream=True)
+    except RequestException as error:
+        raise URLError(error) from error
+
+    if res.status_code >= 400:
+        res.close()
+        raise HTTPError(url, res.status_code, res.reason, res.headers, None)
+
+    # The session (unlike urllib) asks for compressed pages, so they're decompressed on read
+    res.raw.decode_content = True
+    return res.raw
+
+
+@lru_cache(maxsize=4)
+def cipher_template(js: str) -> Cipher:
+    """Parses the cipher of a player JS, the same for all the videos resolved in a run"""
+    return Cipher(js)
+
+
+def player_cipher(js: str) -> Cipher:
+    """
+    Replacement of the Cipher constructor used by pytube to decipher the streams of each video.
+    The player JS is parsed only once per run, while the throttling array (that's mutated while
+    deciphering, along with the 'n' parameter cached) is copied for each video.
+
+    Args:
+        js (str): The content of the player JS
+    """
+    template = cipher_template(js)
+    cipher = copy(template)
+    cipher.throttling_array, cipher.calculated_n = deepcopy(template.throttling_array), None
+    return cipher
+
+
+# pytube requests (watch pages, player JS, innertube API, ...) go through the shared session
+# as well, while the player JS (cached by pytube itself) is parsed once instead of per video
+request._execute_request = session_request  # pylint: disable=protected-access
+extract.Cipher = player_cipher
+
+
+def host_slot(url: str) -> Semaphore:
+    """
+    Returns the semaphore of the host serving 'url', shared by all the workers so that no
+    more than HOST_JOBS downloads hit the same host at the same time.
+
+    Args:
+        url (str): The URL to be downloaded
+    """
+    with host_slots_lock:
+        return host_slots.setdefault(urlparse(url).hostname, Semaphore(HOST_JOBS))
+
+
+class TokenBucket:
+    """
+    Token bucket limiting the bandwidth used by all the downloads of a run. Each download
+    reserves the bytes it's about to write and, when the bucket is in debt, waits until the
+    debt is repaid: since the reservations are served in order, the bandwidth is shared
+    fairly among the workers. The rate can change with the time of day (e.g. to leave the
+    bandwidth to the others during working hours), a rate of 0 means no limit.
+    """
+
+    def __init__(self):
+        self.rules: list[tuple[Optional[time], Optional[time], float]] = []
+        self.tokens, self.stamp, self.lock = 0.0, monotonic(), Lock()
+
+    def configure(self, limit: Optional[str]):
+        """
+        Sets the bandwidth limit from a comma separated list of rates (in bytes per second,
+        with an optional K, M or G unit), each one eventually restricted to a time window.
+        The first window including the current time wins, the rate without a window is
+        used outside of all of them (e.g. "09:00-18:00=500K,22:00-06:00=0,2M").
+
+        Args:
+            limit (str): The bandwidth limit, None for no limit
+
+        Raises:
+            ValueError: The limit doesn't respect the format
+        """
+        rules = []
+        for rule in filter(None, str(limit or "").replace(" ", "").split(",")):
+            if not (match := LIMIT_FORMAT.fullmatch(rule)):
+                raise ValueError(f"{rule} is not a valid bandwidth limit (e.g. 09:00-18:00=2M)")
+            h_start, m_start, h_end, m_end, rate, unit = match.groups()
+            rate = float(rate) * LIMIT_UNITS[unit.upper()]
+            if h_start is None:
+                rules.append((None, None, rate))
+            else:
+                rules.append((time(int(h_start), int(m_start)), time(int(h_end), int(m_end)), rate))
+
+        # The windowed rules are checked before the default one, wherever it has been written
+        self.rules = sorted(rules, key=lambda rule: rule[0] is None)
+
+    def rate(self) -> float:
+        """Returns the rate (in bytes per second) for the current time of the day"""
+        now = datetime.now().time()
+        for start, end, rate in self.rules:
+            # A window crossing midnight (e.g. 22:00-06:00) includes the times after its
+            # start or before its end, instead of between them
+            if start is None or (start <= now < end if start <= end else not end <= now < start):
+                return rate or inf
+        return inf
+
+    def consume(self, amount: int):
+        """
+        Reserves 'amount' bytes of bandwidth, waiting (if needed) for the bucket to refill.
+
+        Args:
+            amount (int): The number of bytes about to be downloaded
+        """
+        with self.lock:
+            rate, now = self.rate(), monotonic()
+            if rate == inf:
+                return
+            # The bucket holds at most a second of bandwidth, so the bursts stay short
+            self.tokens = min(self.tokens + (now - self.stamp) * rate, rate) - amount
+            self.stamp, wait = now, -self.tokens / rate
+
+        if wait > 0:
+            sleep(wait)
+
+
+# Bandwidth limit shared by all the downloads of a run (no limit until configured)
+bandwidth = TokenBucket()
+
+
+class Journal:
+    """
+    On disk journal of the byte ranges of a '.part' file already downloaded, so that an
+    interrupted download can be resumed fetching only the missing ranges. The journal is
+    bound to a specific stream (itag and size) and is discarded if the stream changes.
+
+    Args:
+        path (PathLike): The path of the journal file
+        itag (int): The itag of the stream being downloaded
+        size (int): The size in bytes of the stream being downloaded
+    """
+
+    def __init__(self, path: PathLike, itag: int, size: int):
+        self.path, self.itag, self.size = path, itag, size
+        self.done, self.lock = [], Lock()  # Sorted and merged [start, end] ranges
+
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                journal = load(file)
+            if (journal["itag"], journal["size"]) == (itag, size):
+                self.done = [tuple(r) for r in journal["done"]]
+        # A missing, corrupted or stale journal means that the download restarts from zero
+        except (OSError, ValueError, KeyError, TypeError):
+            self.done = []
+
+    def missing(self) -> list[tuple[int, int]]:
+        """Returns the [start, end] byte ranges still to be downloaded"""
+        holes, offset = [], 0
+        for start, end in self.done:
+            if start > offset:
+                holes.append((offset, start - 1))
+            offset = max(offset, end + 1)
+        return holes + [(offset, self.size - 1)] if offset < self.size else holes
+
+    def mark(self, fd: int, start: int, end: int):
+        """
+        Records the range [start, end] as downloaded. The data is flushed to disk before
+        the journal is (atomically) rewritten, so that the journal never gets ahead of it.
+
+        Args:
+            fd (int): The file descriptor of the '.part' file
+            start (int): The offset of the first byte downloaded
+            end (int): The offset of the last byte downloaded (included)
+        """
+        with self.lock:
+            merged = []
+            for r_start, r_end in sorted(self.done + [(start, end)]):
+                if merged and r_start <= merged[-1][1] + 1:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], r_end))
+                else:
+                    merged.append((r_start, r_end))
+            self.done = merged
+
+            fsync(fd)
+            with open(f"{self.path}.tmp", "w", encoding="utf-8") as file:
+                dump({"itag": self.itag, "size": self.size, "done": self.done}, file)
+            replace(f"{self.path}.tmp", self.path)
+
+    def remove(self):
+        """Deletes the journal once the download has been completed"""
+        if exists(self.path):
+            remove(self.path)
+
+
+class Manifest:
+    """
+    On disk manifest of the videos downloaded in a folder, mapping each video id to the file
+    name, itag, size and MD5 checksum of the stream downloaded. It allows to skip the videos
+    already downloaded without resolving their metadata (and streams) from YouTube.
+
+    Args:
+        folder (PathLike): The folder where the videos are downloaded
+    """
+
+    def __init__(self, folder: PathLike):
+        self.folder, self.path = folder, join(folder, MANIFEST_NAME)
+        self.videos, self.lock = {}, Lock()
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                self.videos = load(file)["videos"]
+        # A missing or corrupted manifest just means that every video will be resolved again
+        except (OSError, ValueError, KeyError, TypeError):
+            self.videos = {}
+
+    def has(self, yt_id: str) -> bool:
+        """
+        Checks if a video has already been downloaded, i.e. it's in the manifest and its
+        file is still there with the expected size (the checksum isn't verified, on purpose).
+
+        Args:
+            yt_id (str): The YouTube id of the video
+        """
+        video = self.videos.get(yt_id)
+        path = join(self.folder, video["file"]) if video else None
+        return path is not None and isfile(path) and getsize(path) == video["size"]
+
+    def record(
+        self, yt_id: str, stream: Stream, file_path: PathLike, checksum: Optional[str] = None
+    ):
+        """
+        Adds (or updates) a downloaded video to the manifest and (atomically) saves it.
+
+        Args:
+            yt_id (str): The YouTube id of the video
+            stream (Stream): The pytube stream that has been downloaded
+            file_path (PathLike): The path of the downloaded file
+            checksum (str): The MD5 checksum of the file, computed here if None
+        """
+        checksum = file_md5(file_path) if checksum is None else checksum
+        with self.lock:
+            self.videos[yt_id] = {
+                "file": basename(file_path),
+                "itag": stream.itag,
+                "size": getsize(file_path),
+                "md5": checksum,
+            }
+            self.save()
+
+    def save(self):
+        """Saves (atomically) the manifest, to be called holding the lock"""
+        with open(f"{self.path}.tmp", "w", encoding="utf-8") as file:
+            dump({"videos": self.videos}, file, indent=2)
+        replace(f"{self.path}.tmp", self.path)
+
+
+class Store(Manifest):
+    """
+    Content addressed store of the videos downloaded, shared by many folders (e.g. playlists).
+    Each video is downloaded once in the store, keyed by its id and the itag(s) of its streams,
+    and then linked in all the folders that need it: hard linked if possible, reflinked (on
+    copy-on-write file systems) if the store is on another device. Where neither is supported
+    the stored file is moved to the first folder, so the store never keeps a second copy.
+
+    Args:
+        folder (PathLike): The folder of the store
+    """
+
+    def __init__(self, folder: PathLike):
+        if not exists(folder):
+            makedirs(folder)
+        super().__init__(folder)
+        self.key_locks = {}  # Per key locks, so that a video is never downloaded twice at once
+
+    @staticmethod
+    def stamp(file_path: PathLike) -> list[int]:
+        """Returns the inode, size and mtime of a file, that change along with its content"""
+        file_stat = stat(file_path)
+        return [file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns]
+
+    def has(self, yt_id: str) -> bool:
+        """
+        Checks if a video is in the store with the expected size and MD5 checksum. Unlike
+        the manifest of a folder, the checksum is verified, since a corrupted stored file
+        would be linked in every folder, but the file is read again only if its inode, size
+        or mtime have changed since its checksum was computed.
+
+        Args:
+            yt_id (str): The key of the video in the store
+        """
+        if not super().has(yt_id):
+            return False
+
+        video = self.videos[yt_id]
+        file_path = join(self.folder, video["file"])
+        if video.get("stamp") != self.stamp(file_path):
+            if file_md5(file_path) != video["md5"]:
+                return False
+            with self.lock:
+                video["stamp"] = self.stamp(file_path)
+                self.save()
+        return True
+
+    def record(
+        self, yt_id: str, stream: Stream, file_path: PathLike, checksum: Optional[str] = None
+    ):
+        super().record(yt_id, stream, file_path, checksum)
+        with self.lock:  # The checksum has just been computed from the file
+            self.videos[yt_id]["stamp"] = self.stamp(file_path)
+            self.save()
+
+    def locked(self, key: str) -> Lock:
+        """Returns the lock of 'key', held while downloading and linking it"""
+        with self.lock:
+            return self.key_locks.setdefault(key, Lock())
+
+    def link(self, key: str, file_path: PathLike):
+        """
+        Links the stored file of 'key' to 'file_path', replacing the previous one. If it can't
+        be linked nor reflinked, the stored file is moved to 'file_path' and tracked there (by
+        its absolute path), so the following folders get a copy of it from there.
+
+        Args:
+            key (str): The key of the video in the store
+            file_path (PathLike): The path where the video has to be linked
+
+        Raises:
+            OSError: The file couldn't be linked, reflinked, moved nor copied
+        """
+        stored_path = join(self.folder, self.videos[key]["file"])
+        is_stored = abspath(dirname(stored_path)) == abspath(self.folder)
+        # A file already moved out of the store has to be copied, the other folder needs it too
+        if link_file(stored_path, file_path, allow_copy=not is_stored) or not is_stored:
+            return
+
+        move(stored_path, file_path)
+        with self.lock:
+            self.videos[key]["file"] = abspath(file_path)  # 'join' keeps absolute paths as is
+            self.save()
+
+
+def file_md5(file_path: PathLike) -> str:
+    """Returns the MD5 checksum of a file, read a block at a time"""
+    digest = md5()
+    with open(file_path, "rb") as file:
+        while block := file.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def link_file(src_path: PathLike, dst_path: PathLike, allow_copy: bool = True) -> bool:
+    """
+    Makes 'dst_path' the same file of 'src_path' without copying it, if possible: with a hard
+    link or, when the two paths are on different devices, with a reflink (on copy-on-write
+    file systems). Only as last resort (and if 'allow_copy') the file is copied. The previous
+    'dst_path' (if any) is atomically replaced.
+
+    Args:
+        src_path (PathLike): The path of the file to be linked
+        dst_path (PathLike): The path of the link
+        allow_copy (bool): Flag to copy the file if it can't be linked nor reflinked
+
+    Returns:
+        bool: Whether the two paths share the same data, False if copied (or not done at all)
+
+    Raises:
+        OSError: The file couldn't be linked, reflinked nor copied
+    """
+    if exists(dst_path) and samefile(src_path, dst_path):
+        return True
+
+    part_path = f"{dst_path}{PART_SUFFIX}"
+    if exists(part_path):
+        remove(part_path)
+
+    try:
+        link(src_path, part_path)
+    except OSError:
+        try:
+            # Clones the file (sharing its blocks) on copy-on-write file systems
+            with open(src_path, "rb") as src, open(part_path, "wb") as dst:
+                ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            if exists(part_path):
+                remove(part_path)  # The empty file created for the clone
+            if not allow_copy:
+                return False
+            copyfile(src_path, part_path)
+            replace(part_path, dst_path)
+            return False
+    replace(part_path, dst_path)
+    return True
+
+
+class MissingMuxerError(Exception):
+    """
+    Exception raised when the user asks for adaptive streams, that have to be muxed together
+    after the download, but the muxer (ffmpeg) couldn't be found on the machine.
+    """
+
+
+def stream_resolution(stream: Stream) -> int:
+    """Returns the vertical resolution (e.g. 1080) of a stream, 0 for the audio only ones"""
+    return int(stream.resolution.rstrip("p")) if stream.resolution else 0
+
+
+def stream_bitrate(stream: Stream) -> int:
+    """Returns the audio bitrate (in kbps) of a stream, 0 for the video only ones"""
+    return int(stream.abr.rstrip("kbps")) if stream.abr else 0
+
+
+@dataclass
+class StreamPolicy:
+    """
+    Selection policy of the stream(s) to be downloaded for each video. The best stream that
+    satisfies all the constraints is chosen, favouring (in order) the resolution, the preferred
+    codec, the mp4 container and the progressive streams (that don't need to be muxed).
+    With 'adaptive' the video only streams are considered as well, paired with the best
+    audio only stream in the same container, since YouTube serves progressive streams
+    only up to 720p.
+
+    Args:
+        resolution (int): The max vertical resolution (e.g. 1080), None for no limit
+        codec (str): The preferred codec (e.g. "avc1", "vp9", "av01", "opus", "mp4a")
+        audio_only (bool): Flag to download only the audio of the videos
+        max_size (int): The max size (in MiB) of the stream(s) of a video, None for no limit
+        adaptive (bool): Flag to allow adaptive streams (video and audio muxed locally)
+    """
+
+    resolution: Optional[int] = None
+    codec: Optional[str] = None
+    audio_only: bool = False
+    max_size: Optional[int] = None
+    adaptive: bool = False
+
+    def __post_init__(self):
+        if self.adaptive and not self.audio_only and which(MUXER) is None:
+            raise MissingMuxerError(f"{MUXER} is needed to mux adaptive streams, install it")
+
+    def prefers(self, codec: Optional[str]) -> bool:
+        """Checks if 'codec' is the one preferred by the user (e.g. 'avc1' for 'avc1.64001F')"""
+        return bool(self.codec and codec and codec.startswith(self.codec))
+
+    def select(self, streams: StreamQuery) -> tuple[Stream, ...]:
+        """
+        Filters the streams of a video according to the policy, returning either a single
+        (progressive or audio only) stream or a video only stream and an audio only one.
+
+        Args:
+            streams (StreamQuery): The streams available for the video
+
+        Raises:
+            LookupError: None of the streams satisfies the policy
+        """
+        budget = self.max_size * 1024 * 1024 if self.max_size else None
+        audios = sorted(
+            streams.filter(only_audio=True),
+            key=lambda audio: (self.prefers(audio.audio_codec), stream_bitrate(audio)),
+            reverse=True,
+        )
+
+        if self.audio_only:
+            options = [(audio,) for audio in audios]
+        else:
+            options = [(stream,) for stream in streams.filter(progressive=True)]
+            if self.adaptive:
+                videos = streams.filter(adaptive=True, only_video=True)
+                options += [(v, a) for v in videos for a in audios if a.subtype == v.subtype]
+            # Drops the options above the max resolution, then sorts them from the best one
+            if self.resolution:
+                options = [o for o in options if stream_resolution(o[0]) <= self.resolution]
+            options.sort(
+                key=lambda option: (
+                    stream_resolution(option[0]),
+                    self.prefers(option[0].video_codec),
+                    option[0].subtype == "mp4",
+                    len(option) == 1,
+                    stream_bitrate(option[-1]),
+                ),
+                reverse=True,
+            )
 
+        # The size is checked only when needed, since it may require a request for each stream
+        for option in options:
+            if budget is None or sum(stream.filesize for stream in option) <= budget:
+                return option
+        raise LookupError(f"None of the {len(streams)} streams satisfies the policy {self}")
 
-def download_playlist(playlist_url: str, out: PathLike = ".", overwrite: bool = False):
+
+def mux_streams(video_path: PathLike, audio_path: PathLike, file_path: PathLike):
+    """
+    Muxes a video only and an audio only file in a single one (without re-encoding them).
+    The output is written in a '.part' file, renamed only once complete, while the inputs
+    are removed afterwards.
+
+    Args:
+        video_path (PathLike): The path of the video only file
+        audio_path (PathLike): The path of the audio only file
+        file_path (PathLike): The path of the muxed file
+
+    Raises:
+        CalledProcessError: The muxer failed to mux the two files
+    """
+    part_path = f"{file_path}{PART_SUFFIX}"
+    container = splitext(file_path)[1][1:]  # The format can't be guessed from '.part'
+
+    # '-c copy' just copies the two streams in the new container, so it takes a few seconds
+    command = [MUXER, "-y", "-loglevel", "error", "-i", video_path, "-i", audio_path]
+    command += ["-map", "0:v", "-map", "1:a", "-c", "copy", "-f", container, part_path]
+    run(command, check=True)
+
+    replace(part_path, file_path)
+    remove(video_path)
+    remove(audio_path)
+
+
+class RetryScheduler:
+    """
+    Work queue of the videos to be downloaded, shared by the workers of a playlist. The videos
+    that fail are retried with a jittered exponential backoff and only after the videos never
+    attempted, up to 'attempts' times each. Once the failures of the whole playlist exceed the
+    'budget' the scheduler stops handing out videos, since the network (or YouTube) is likely
+    to be down for all of them (permanent errors, e.g. unavailable videos, don't count).
+
+    Args:
+        attempts (int): The max number of attempts for each video
+        budget (int): The max number of failures allowed for the whole playlist
+    """
+
+    def __init__(self, attempts: int = RETRY_ATTEMPTS, budget: int = ERROR_BUDGET):
+        self.attempts, self.budget = attempts, budget
+        self.fresh, self.delayed = deque(), []  # Videos never attempted and videos to retry
+        self.failed, self.errors, self.running = {}, 0, 0
+        self.cond, self.order = Condition(), count()  # The counter breaks ties in the heap
+        self.closed = False  # Whether new videos could still be added
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether the error budget has been exhausted"""
+        return self.errors >= self.budget
+
+    def put(self, job: Job):
+        """Adds a video to be downloaded (for the first time)"""
+        with self.cond:
+            self.fresh.append((job, 1))
+            self.cond.notify()
+
+    def close(self):
+        """Marks that no other video will be added, so the workers stop once done"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def get(self) -> Optional[tuple[Job, int]]:
+        """
+        Blocks until a video can be downloaded and returns its job and attempt number,
+        or None once there is nothing left to do (or the error budget has been exhausted).
+        """
+        with self.cond:
+            while not self.exhausted:
+                if self.fresh:
+                    self.running += 1
+                    return self.fresh.popleft()
+                if self.delayed and self.delayed[0][0] <= monotonic():
+                    self.running += 1
+                    return heappop(self.delayed)[2:]
+                if self.closed and not self.delayed and not self.running:
+                    break  # Nothing to add, to retry and no download in progress that could fail
+                # Waits for a new video, for the next retry to be due or for a download to fail
+                self.cond.wait(self.delayed[0][0] - monotonic() if self.delayed else None)
+            self.cond.notify_all()  # Wakes up the other workers, so that they stop too
+            return None
+
+    def done(self, job: Job, attempt: int, error: Optional[Exception] = None, retry=True):
+        """
+        Marks a download as finished, either successfully (no error) or not. A failed video
+        is scheduled again after a backoff, unless 'retry' is False or it ran out of attempts.
+
+        Args:
+            job (Job): The folder and the YouTube id of the video
+            attempt (int): The attempt number of this download
+            error (Exception): The error that made the download fail, if any
+            retry (bool): Flag to retry the video if it failed
+        """
+        with self.cond:
+            self.running -= 1
+            if error is None:
+                self.failed.pop(job, None)
+            else:
+                self.errors += retry  # Only the transient errors count against the budget
+                self.failed[job] = (attempt, error)
+                if retry and attempt < self.attempts:
+                    backoff = min(RETRY_BACKOFF * 2 ** (attempt - 1), RETRY_MAX_BACKOFF)
+                    ready = monotonic() + backoff * uniform(0.5, 1.5)
+                    heappush(self.delayed, (ready, next(self.order), job, attempt + 1))
+            self.cond.notify_all()
+
+    def report(self, label: Callable[[Job], str] = str):
+        """
+        Prints the videos that couldn't be downloaded, including the ones never attempted.
+
+        Args:
+            label (Callable): Returns the name of a video (e.g. its URL) given its job
+        """
+        pending = [job for job, _ in self.fresh] + [entry[2] for entry in sorted(self.delayed)]
+
+        if self.exhausted:
+            console.print(f"[red]Stopped after {self.errors} errors (error budget reached)[/red]")
+        for job, (attempt, error) in self.failed.items():
+            if job not in pending:
+                message = f"Failed to download {label(job)} ({attempt} attempts): {error}"
+                console.print(f"[red]{message}[/red]")
+        for job in pending:
+            console.print(f"[yellow]Not downloaded {label(job)}, retry later on[/yellow]")
+
+
+def download_range(
+    url: str, fd: int, start: int, end: int, journal: Journal, task: Optional[TaskID] = None
+) -> int:
+    """
+    Downloads the byte range [start, end] of 'url' writing it, with 'pwrite', at the same
+    offset of the (already opened) file descriptor 'fd'. Many ranges of the same file
+    can then be downloaded at the same time without sharing any file position.
+    The progress is recorded on the journal every JOURNAL_STEP bytes and when the range
+    ends (even abruptly), so that an interrupted download loses almost nothing. Each block
+    goes through the bandwidth limiter and advances the progress bar of the stream.
+
+    Args:
+        url (str): The URL of the stream to be downloaded
+        fd (int): The file descriptor of the destination file
+        start (int): The offset of the first byte of the range
+        end (int): The offset of the last byte of the range (included)
+        journal (Journal): The journal of the destination file
+        task (TaskID): The progress bar of the stream, if any
+
+    Returns:
+        int: The number of bytes written
+
+    Raises:
+        URLError: The connection has been dropped before the end of the range
+    """
+    offset = marked = start  # Position where the next block will be written/recorded
+    range_url = f"{url}&range={start}-{end}"
+
+    try:
+        with host_slot(url), session.get(range_url, stream=True, timeout=HTTP_TIMEOUT) as res:
+            res.raise_for_status()
+            for block in res.iter_content(BLOCK_SIZE):
+                # 'pwrite' may write less than requested, so loops until the block is written
+                view = memoryview(block)[: end - offset + 1]
+                bandwidth.consume(len(view))
+                if task is not None:
+                    progress.advance(task, len(view))
+                while view:
+                    written = pwrite(fd, view, offset)
+                    view, offset = view[written:], offset + written
+                if offset - marked >= JOURNAL_STEP:
+                    journal.mark(fd, marked, offset - 1)
+                    marked = offset
+    # The connection errors are handled (and retried) as the urllib ones
+    except RequestException as error:
+        raise URLError(error) from error
+    finally:
+        if offset > marked:
+            journal.mark(fd, marked, offset - 1)
+
+    # A range that is shorter than requested would leave a hole in the file
+    if offset != end + 1:
+        raise URLError(f"Range {start}-{end} of {urlparse(url).hostname} ended at {offset}")
+    return offset - start
+
+
+def download_stream(
+    stream: Stream,
+    out: PathLike,
+    overwrite: bool = False,
+    segments: int = SEGMENT_JOBS,
+    filename: Optional[str] = None,
+) -> str:
+    """
+    Downloads a stream splitting it in (up to) 'segments' byte ranges fetched in parallel,
+    since YouTube throttles each connection well below line rate. The ranges are written
+    in a preallocated '.part' file, renamed to the final name only once complete, while a
+    journal keeps track of the ranges already downloaded so that a re-run resumes them.
+    Streams of unknown size fall back to the default (single connection) pytube download.
+
+    Args:
+        stream (Stream): The pytube stream to be downloaded
+        out (PathLike): The relative or absolute destination folder
+        overwrite (bool): Flag to overwrite the previously existent file
+        segments (int): The number of connections used at the same time
+        filename (str): The name of the downloaded file, the stream default one if None
+
+    Returns:
+        str: The path of the downloaded file
+
+    Raises:
+        URLError: A range failed to download or the final file is truncated
+    """
+    file_path, size = stream.get_file_path(filename, out), stream.filesize
+    part_path = f"{file_path}{PART_SUFFIX}"
+
+    # Only complete files are ever named as the video, the truncated ones are still '.part'
+    if not overwrite and stream.exists_at_path(file_path):
+        return file_path
+    if not size:
+        return stream.download(out, filename, skip_existing=not overwrite)
+
+    journal = Journal(f"{part_path}{JOURNAL_SUFFIX}", stream.itag, size)
+    # Without its '.part' file the journal is meaningless, so everything is downloaded again
+    if not exists(part_path):
+        journal.done = []
+    missing = journal.missing()
+
+    # Splits the missing bytes in (about) equally sized ranges, none smaller than SEGMENT_SIZE
+    step = max(-(-sum(end - start + 1 for start, end in missing) // segments), SEGMENT_SIZE)
+    ranges = [
+        (offset, min(offset + step, end + 1) - 1)
+        for start, end in missing
+        for offset in range(start, end + 1, step)
+    ]
+
+    resumed, started = size - sum(end - start + 1 for start, end in missing), monotonic()
+    task = progress.add_task(basename(file_path), total=size, completed=resumed)
+
+    fd = os_open(part_path, O_WRONLY | O_CREAT, 0o644)
+    try:
+        # Preallocates the file, so that the ranges can be written at any offset right away
+        ftruncate(fd, size)
+        with ThreadPoolExecutor(max_workers=max(min(segments, len(ranges)), 1)) as pool:
+            futures = [
+                pool.submit(download_range, stream.url, fd, *r, journal, task) for r in ranges
+            ]
+            for future in futures:
+                future.result()  # Propagates the first error that occurred in any range
+    finally:
+        close(fd)
+        progress.remove_task(task)
+
+    # Verifies that every byte of the preallocated file has actually been downloaded
+    if journal.missing() or getsize(part_path) != size:
+        raise URLError(f"{part_path} is still missing {journal.missing()} byte ranges")
+
+    replace(part_path, file_path)
+    journal.remove()
+
+    # Reports the throughput of the download, the resumed bytes don't count
+    elapsed, downloaded = monotonic() - started, (size - resumed) / 1024**2
+    console.print(
+        f"[cyan]{basename(file_path)}: {downloaded:.1f} MiB in {elapsed:.1f}s "
+        f"({downloaded / max(elapsed, 1e-3):.2f} MiB/s)[/cyan]"
+    )
+    return file_path
+
+
+def start_workers(
+    scheduler: RetryScheduler,
+    destinations: dict[Job, tuple[str, Manifest]],
+    overwrite: bool,
+    policy: StreamPolicy,
+    jobs: int,
+    store: Optional[Store] = None,
+) -> list[Thread]:
+    """
+    Starts a pool of 'jobs' workers downloading the videos handed out by the scheduler, each
+    one in the folder of its job (and recorded in the manifest) with the URL that
+    'destinations' maps the job to. The same video may be scheduled for many folders.
+    The workers stop once the scheduler is closed and has nothing left to do.
+
+    Args:
+        scheduler (RetryScheduler): The scheduler of the videos to be downloaded
+        destinations (dict): The URL and the manifest of the folder of each job
+        overwrite (bool): Flag to overwrite the previously existent files
+        policy (StreamPolicy): The policy used to select the stream(s) of each video
+        jobs (int): The number of videos downloaded at the same time
+        store (Store): The store where the videos are downloaded before being linked, if any
+    """
+
+    def worker():
+        # Until the scheduler has videos to download (or to retry) keeps going
+        while (item := scheduler.get()) is not None:
+            (out_folder, yt_id), attempt = item
+            url2download, manifest = destinations[(out_folder, yt_id)]
+            try:
+                stream, file_path, checksum = fetch_video(
+                    url2download, out_folder, overwrite, policy, store=store
+                )
+                manifest.record(yt_id, stream, file_path, checksum)
+                console.print(f"[green]Downloaded {url2download} successfully![/green]")
+                scheduler.done((out_folder, yt_id), attempt)
+            # YouTube videos that fails to be downloaded are scheduled again, after the others.
+            # This choice has been made in order to avoid the user interaction whenever a
+            # download fails based on minor network error (DNS Resolve, YouTube's Internal
+            # Server Errors, ...). The retry resumes from where the download stopped, thanks
+            # to its '.part' file and journal.
+            except URLError as error:
+                console.print(f"[red]Failed to download {url2download}, retrying later...[/red]")
+                scheduler.done((out_folder, yt_id), attempt, error)
+            # Any other error affects only the current video, the others are downloaded anyway
+            except Exception as error:  # pylint: disable=broad-except
+                console.print(f"[red]Failed to download {url2download}: {error}[/red]")
+                scheduler.done((out_folder, yt_id), attempt, error, retry=False)
+
+    workers = [Thread(target=worker, daemon=True) for _ in range(max(jobs, 1))]
+    for thread in workers:
+        thread.start()
+    return workers
+
+
+def download_playlist(
+    playlist_url: str,
+    out: PathLike = ".",
+    overwrite: bool = False,
+    jobs: int = PLAYLIST_JOBS,
+    incremental: bool = False,
+    retries: int = RETRY_ATTEMPTS,
+    error_budget: int = ERROR_BUDGET,
+    resolution: Optional[int] = None,
+    codec: Optional[str] = None,
+    audio_only: bool = False,
+    max_size: Optional[int] = None,
+    adaptive: bool = False,
+    limit: Optional[str] = None,
+    store: PathLike = STORE_NAME,
+):
     """
     Downloads a whole playlist given her YouTube URL. Eventually is possible to
     specify a resolution (default is 1080p). The downloaded files will all be saved
     in a folder in the "out" directory named as the playlist. Via the overwrite flag
     is possible to determine the behavior in case of existing files conflict: either
     the dest file can be overwritten or the download can be skipped.
+    The videos are downloaded concurrently by a pool of 'jobs' workers sharing the same queue
+    and recorded in the manifest of the folder, with the incremental flag the videos already
+    in the manifest are skipped without even resolving them. The failed downloads are retried
+    with a backoff (up to 'retries' times), and the ones still failed are reported at the end.
+    The videos are downloaded once in a store shared by all the playlists, and then linked.
 
     Args:
         playlist_url (str): The youTube URL for the given playlist
         out (PathLike): The relative or absolute destination folder
         overwrite (bool): Flag to overwrite the previously existent folder/file
+        jobs (int): The number of videos downloaded at the same time
+        incremental (bool): Flag to skip the videos already recorded in the manifest
+        retries (int): The max number of attempts for each video
+        error_budget (int): The max number of network errors before giving up on the playlist
+        resolution (int): The max vertical resolution (e.g. 1080), None for no limit
+        codec (str): The preferred codec (e.g. "avc1", "vp9", "av01", "opus", "mp4a")
+        audio_only (bool): Flag to download only the audio of the videos
+        max_size (int): The max size (in MiB) of the stream(s) of a video, None for no limit
+        adaptive (bool): Flag to allow adaptive streams (video and audio muxed with ffmpeg)
+        limit (str): The bandwidth limit, e.g. "2M" or "09:00-18:00=500K,2M" (in bytes/s)
+        store (PathLike): The folder (relative to "out") where the videos are downloaded once
 
     Raises:
         NotADirectoryError: The given path doesn't exist or isn't a directory
+        MissingMuxerError: Adaptive streams are allowed but ffmpeg is not installed
+        ValueError: The bandwidth limit doesn't respect the format
     """
     if not isdir(abspath(out)):
         raise NotADirectoryError(f"{abspath(out)} is not a directory")
 
+    # The same selection policy (and bandwidth limit) is applied to each video of the playlist
+    policy = StreamPolicy(resolution, codec, audio_only, max_size, adaptive)
+    bandwidth.configure(limit)
     yt_playlist = Playlist(playlist_url)  # Gets a reference to the playlist object
     # The out folder will be named as the playlist and be inside "out" path
     out_folder = join(abspath(out), yt_playlist.title)
@@ -62,27 +1048,294 @@ def download_playlist(playlist_url: str, out: PathLike = ".", overwrite: bool =
     if not exists(out_folder):
         mkdir(out_folder)
 
-    # The list/queue keep tracks of the video downloaded for the first time
-    # as well as the ones that failed before (this is needed in order to
-    # determine the behaviour of the 'download_video' function)
-    pl_videos_urls = list([(v, False) for v in yt_playlist.video_urls])
+    manifest = Manifest(out_folder)  # Keeps track of the videos already downloaded
 
-    # Until the queue of video to download is not empty keeps going
-    while len(pl_videos_urls) != 0:
-        url2download, has_failed = pl_videos_urls.pop()
+    # The scheduler keep tracks of the video still to be downloaded, it's shared by all the workers
+    scheduler, destinations = RetryScheduler(retries, error_budget), {}
+    for video_url in yt_playlist.video_urls:
+        job = (out_folder, video_id(video_url))
+        if not (incremental and not overwrite and manifest.has(job[1])):
+            destinations[job] = (video_url, manifest)
+            scheduler.put(job)
+    scheduler.close()
 
-        try:
-            download_video(url2download, out_folder, has_failed or overwrite)
-            console.print(f"[green]Downloaded {url2download} successfully![/green]")
-        # YouTube videos that fails to be downloaded are put back in the queue for later.
-        # This choice has been made in order to avoid the user interaction whenever a download
-        # fails based on minor network error (DNS Resolve, YouTube's Internal Server Errors, ...).
-        except URLError:
-            console.print(f"[red]Failed to download {url2download}, retrying later...[/red]")
-            pl_videos_urls.append((url2download, True))
+    if not scheduler.fresh:
+        console.print(f"[green]{yt_playlist.title} is already up to date![/green]")
+        return
+
+    jobs, video_store = min(jobs, len(scheduler.fresh)), Store(join(abspath(out), store))
+    with progress:
+        for thread in start_workers(scheduler, destinations, overwrite, policy, jobs, video_store):
+            thread.join()
+    scheduler.report(lambda job: destinations[job][0])
 
 
-def download_video(video_url: str, out: PathLike = ".", overwrite: bool = False):
+def sync_playlist(
+    playlist_url: str,
+    out: PathLike = ".",
+    jobs: int = PLAYLIST_JOBS,
+    retries: int = RETRY_ATTEMPTS,
+    error_budget: int = ERROR_BUDGET,
+    resolution: Optional[int] = None,
+    codec: Optional[str] = None,
+    audio_only: bool = False,
+    max_size: Optional[int] = None,
+    adaptive: bool = False,
+    limit: Optional[str] = None,
+    store: PathLike = STORE_NAME,
+):
+    """
+    Downloads only the videos of a playlist that aren't in the manifest of its folder, i.e.
+    the ones added to the playlist since the last run (or whose file has been removed since).
+    Only the video ids of the playlist are scraped, the known videos are never resolved.
+
+    Args:
+        playlist_url (str): The youTube URL for the given playlist
+        out (PathLike): The relative or absolute destination folder
+        jobs (int): The number of videos downloaded at the same time
+        retries (int): The max number of attempts for each video
+        error_budget (int): The max number of network errors before giving up on the playlist
+        resolution (int): The max vertical resolution (e.g. 1080), None for no limit
+        codec (str): The preferred codec (e.g. "avc1", "vp9", "av01", "opus", "mp4a")
+        audio_only (bool): Flag to download only the audio of the videos
+        max_size (int): The max size (in MiB) of the stream(s) of a video, None for no limit
+        adaptive (bool): Flag to allow adaptive streams (video and audio muxed with ffmpeg)
+        limit (str): The bandwidth limit, e.g. "2M" or "09:00-18:00=500K,2M" (in bytes/s)
+        store (PathLike): The folder (relative to "out") where the videos are downloaded once
+
+    Raises:
+        NotADirectoryError: The given path doesn't exist or isn't a directory
+        MissingMuxerError: Adaptive streams are allowed but ffmpeg is not installed
+        ValueError: The bandwidth limit doesn't respect the format
+    """
+    download_playlist(
+        playlist_url,
+        out,
+        jobs=jobs,
+        incremental=True,
+        retries=retries,
+        error_budget=error_budget,
+        resolution=resolution,
+        codec=codec,
+        audio_only=audio_only,
+        max_size=max_size,
+        adaptive=adaptive,
+        limit=limit,
+        store=store,
+    )
+
+
+def download_batch(
+    urls: Optional[PathLike] = None,
+    out: PathLike = ".",
+    overwrite: bool = False,
+    jobs: int = PLAYLIST_JOBS,
+    incremental: bool = False,
+    retries: int = RETRY_ATTEMPTS,
+    error_budget: int = ERROR_BUDGET,
+    resolution: Optional[int] = None,
+    codec: Optional[str] = None,
+    audio_only: bool = False,
+    max_size: Optional[int] = None,
+    adaptive: bool = False,
+    limit: Optional[str] = None,
+    store: PathLike = STORE_NAME,
+):
+    """
+    Downloads all the videos and playlists listed (one URL per line) in a file or in the
+    standard input, in a single process. The URLs are read while the videos are already
+    being downloaded by a shared pool of workers. A video that appears in many playlists is
+    downloaded only once (in the store) and then linked in the folder of each playlist.
+    Videos are saved in the "out" directory, while the videos of a playlist in a folder named
+    as the playlist (as the playlist command does).
+    Empty lines and the ones starting with '#' are ignored.
+
+    Args:
+        urls (PathLike): The file with the URLs, None to read them from the standard input
+        out (PathLike): The relative or absolute destination folder
+        overwrite (bool): Flag to overwrite the previously existent folder/file
+        jobs (int): The number of videos downloaded at the same time
+        incremental (bool): Flag to skip the videos already recorded in the manifests
+        retries (int): The max number of attempts for each video
+        error_budget (int): The max number of network errors before giving up on the batch
+        resolution (int): The max vertical resolution (e.g. 1080), None for no limit
+        codec (str): The preferred codec (e.g. "avc1", "vp9", "av01", "opus", "mp4a")
+        audio_only (bool): Flag to download only the audio of the videos
+        max_size (int): The max size (in MiB) of the stream(s) of a video, None for no limit
+        adaptive (bool): Flag to allow adaptive streams (video and audio muxed with ffmpeg)
+        limit (str): The bandwidth limit, e.g. "2M" or "09:00-18:00=500K,2M" (in bytes/s)
+        store (PathLike): The folder (relative to "out") where the videos are downloaded once
+
+    Raises:
+        NotADirectoryError: The given path doesn't exist or isn't a directory
+        MissingMuxerError: Adaptive streams are allowed but ffmpeg is not installed
+        ValueError: The bandwidth limit doesn't respect the format
+    """
+    if not isdir(abspath(out)):
+        raise NotADirectoryError(f"{abspath(out)} is not a directory")
+
+    policy = StreamPolicy(resolution, codec, audio_only, max_size, adaptive)
+    bandwidth.configure(limit)
+    scheduler, destinations = RetryScheduler(retries, error_budget), {}
+    manifests = {}  # Manifest of each folder
+    video_store = Store(join(abspath(out), store))
+    workers = start_workers(scheduler, destinations, overwrite, policy, jobs, video_store)
+    with progress:
+        # (Fire takes a lone '-' as its own separator, so stdin is read when no file is given)
+        source = 0 if urls is None else urls
+        with open(source, "r", encoding="utf-8", closefd=urls is not None) as file:
+            for line in file:
+                url = line.strip()
+                # Skips comments and empty lines, and stops reading once no download will be done
+                if not url or url.startswith("#"):
+                    continue
+                if scheduler.exhausted:
+                    break
+
+                try:
+                    # Playlist URLs (the ones with a 'list' parameter) are expanded in their videos
+                    if "list" in parse_qs(urlparse(url).query):
+                        yt_playlist = Playlist(url)
+                        folder = join(abspath(out), yt_playlist.title)
+                        video_urls = yt_playlist.video_urls
+                    else:
+                        folder, video_urls = abspath(out), [url]
+
+                    if not exists(folder):
+                        mkdir(folder)
+                    if folder not in manifests:
+                        manifests[folder] = Manifest(folder)
+
+                    # The store downloads a video once, whatever the folders it's scheduled for
+                    for video_url in video_urls:
+                        job = (folder, video_id(video_url))
+                        if job in destinations:
+                            continue
+                        if not (incremental and not overwrite and manifests[folder].has(job[1])):
+                            destinations[job] = (video_url, manifests[folder])
+                            scheduler.put(job)
+                # A wrong or unavailable URL shouldn't stop the whole batch
+                except Exception as error:  # pylint: disable=broad-except
+                    console.print(f"[red]Failed to resolve {url}: {error}[/red]")
+
+        scheduler.close()
+        for thread in workers:
+            thread.join()
+    scheduler.report(lambda job: f"{destinations[job][0]} ({basename(job[0])})")
+
+
+def download_selected(
+    selected: tuple[Stream, ...],
+    out: PathLike,
+    overwrite: bool = False,
+    segments: int = SEGMENT_JOBS,
+    filename: Optional[str] = None,
+) -> str:
+    """
+    Downloads the stream(s) selected by a policy for a video. When they're adaptive streams,
+    video and audio are downloaded in parallel and then muxed in a single file.
+
+    Args:
+        selected (tuple[Stream, ...]): The stream(s) selected for the video
+        out (PathLike): The relative or absolute destination folder
+        overwrite (bool): Flag to overwrite the previously existent file
+        segments (int): The number of connections used to download each stream
+        filename (str): The name of the downloaded file, the stream default one if None
+
+    Returns:
+        str: The path of the downloaded file
+    """
+    if len(selected) == 1:
+        return download_stream(selected[0], out, overwrite, segments, filename)
+
+    # The muxed file only exists once complete, the single streams are saved aside until then
+    file_path = selected[0].get_file_path(filename, out)
+    if not overwrite and isfile(file_path):
+        return file_path
+
+    stem = splitext(basename(file_path))[0]
+    with ThreadPoolExecutor(max_workers=len(selected)) as pool:
+        names = [f"{stem}.{stream.type}.{stream.subtype}" for stream in selected]
+        futures = [
+            pool.submit(download_stream, stream, out, overwrite, segments, name)
+            for stream, name in zip(selected, names)
+        ]
+        video_path, audio_path = [future.result() for future in futures]
+
+    mux_streams(video_path, audio_path, file_path)
+    return file_path
+
+
+def fetch_video(
+    video_url: str,
+    out: PathLike,
+    overwrite: bool = False,
+    policy: Optional[StreamPolicy] = None,
+    segments: int = SEGMENT_JOBS,
+    store: Optional[Store] = None,
+) -> tuple[Stream, str, Optional[str]]:
+    """
+    Resolves the stream(s) of a video and downloads them, as 'download_video' does, but returns
+    the (video) stream downloaded and the path of its file so that they can be recorded.
+    With a store, the video is downloaded (only once) in the store and then linked in 'out'.
+
+    Args:
+        video_url (str): The youTube URL for the given video
+        out (PathLike): The relative or absolute destination folder
+        overwrite (bool): Flag to overwrite the previously existent file
+        policy (StreamPolicy): The policy used to select the stream(s), the default one if None
+        segments (int): The number of connections used to download each stream
+        store (Store): The store shared by the destination folders, if any
+
+    Returns:
+        tuple: The (video) stream, the path of its file and its MD5 checksum (if known)
+
+    Raises:
+        VideoUnavailable: The given URL points to a non existent/unavailable video
+        LookupError: None of the streams of the video satisfies the policy
+    """
+    yt_video = Video(video_url)  # Gets a reference the the YouTube video object
+    # Filters out the desired stream(s) chosen by the user
+    selected = (policy or StreamPolicy()).select(yt_video.streams)
+
+    # And downloads it in the requested directory, eventually overwriting the previous
+    if store is None:
+        return selected[0], download_selected(selected, out, overwrite, segments), None
+
+    # The same video (with the same streams) is downloaded only once, whatever the folder
+    key = f"{yt_video.video_id}.{'+'.join(str(stream.itag) for stream in selected)}"
+    file_path = selected[0].get_file_path(output_path=out)
+
+    with store.locked(key):
+        if overwrite or not store.has(key):
+            name = f"{key}.{selected[0].subtype}"
+            # A video already in 'out' (e.g. downloaded before the store) is moved to the store
+            if len(selected) > 1:
+                complete = isfile(file_path)
+            else:
+                complete = selected[0].exists_at_path(file_path)
+            if not overwrite and complete:
+                link_file(file_path, join(store.folder, name))
+            # (that's then found complete in the store, instead of being downloaded again)
+            stored = download_selected(selected, store.folder, overwrite, segments, name)
+            store.record(key, selected[0], stored)
+        store.link(key, file_path)
+
+    return selected[0], file_path, store.videos[key]["md5"]
+
+
+def download_video(
+    video_url: str,
+    out: PathLike = ".",
+    overwrite: bool = False,
+    segments: int = SEGMENT_JOBS,
+    resolution: Optional[int] = None,
+    codec: Optional[str] = None,
+    audio_only: bool = False,
+    max_size: Optional[int] = None,
+    adaptive: bool = False,
+    limit: Optional[str] = None,
+):
     """
     Downloads a whole video from YouTube given its URL. Eventually is possible to
     specify a resolution (default is 1080p). The downloaded file(s) will be saved in
@@ -94,24 +1347,40 @@ def download_video(video_url: str, out: PathLike = ".", overwrite: bool = False)
         video_url (str): The youTube URL for the given video
         out (PathLike): The relative or absolute destination folder
         overwrite (bool): Flag to overwrite the previously existent folder/file
+        segments (int): The number of connections used to download the video
+        resolution (int): The max vertical resolution (e.g. 1080), None for no limit
+        codec (str): The preferred codec (e.g. "avc1", "vp9", "av01", "opus", "mp4a")
+        audio_only (bool): Flag to download only the audio of the videos
+        max_size (int): The max size (in MiB) of the stream(s) of a video, None for no limit
+        adaptive (bool): Flag to allow adaptive streams (video and audio muxed with ffmpeg)
+        limit (str): The bandwidth limit, e.g. "2M" or "09:00-18:00=500K,2M" (in bytes/s)
 
     Raises:
         NotADirectoryError: The given path doesn't exist or isn't a directory
         VideoUnavailable: The given URL points to a non existent/unavailable video
+        MissingMuxerError: Adaptive streams are allowed but ffmpeg is not installed
+        ValueError: The bandwidth limit doesn't respect the format
+        LookupError: None of the streams of the video satisfies the policy
     """
     if not isdir(abspath(out)):
         raise NotADirectoryError(f"{abspath(out)} is not a directory")
 
-    yt_video = Video(video_url)  # Gets a reference the the YouTube video object
-    # Filters out the desired stream chosen by the user
-    stream = yt_video.streams.get_highest_resolution()
-    # And downloads it in the requested directory, eventually overwriting the previous
-    stream.download(out, skip_existing=not overwrite)
+    policy = StreamPolicy(resolution, codec, audio_only, max_size, adaptive)
+    bandwidth.configure(limit)
+    with progress:
+        fetch_video(video_url, out, overwrite, policy, segments)
 
 
 if __name__ == "__main__":
     try:
-        Fire({"playlist": download_playlist, "video": download_video})
+        Fire(
+            {
+                "playlist": download_playlist,
+                "sync": sync_playlist,
+                "batch": download_batch,
+                "video": download_video,
+            }
+        )
     except KeyboardInterrupt:
         console.print("[yellow]Interrupt received, closing now...[/yellow]")
     except Exception:
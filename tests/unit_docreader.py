@@ -1,4 +1,5 @@
 """PyTest module with test suite implementation for the GitPuller.py script"""
+from os import utime
 from os.path import exists, isdir, isfile, join
 from posixpath import basename
 from random import random
@@ -7,7 +8,10 @@ from tempfile import TemporaryDirectory as TmpDir
 
 from pytest import raises
 from requests import get
-from scripts.DocReader import FileTypeError, MissingPlayerError, export, stream
+from scripts.DocReader import (
+    AudioCache, FileTypeError, MissingPlayerError, export, page_range, play_audio, split_pages,
+    split_text, stream
+)
 
 
 class TestDocReader:
@@ -128,3 +132,95 @@ class TestDocReader:
         # upon completion (the default behavior is to remain open) and in this case the
         # suite will never complete
         stream(tmp_pdf_file.name, player="nvlc", player_flags="--play-and-exit")
+
+    def test_play_audio(self, capfd):
+        """Plays the audio with a dummy player (cat) reading it from stdin and from a FIFO"""
+        frames = [b"ID3", b"first chunk ", b"second chunk"]
+
+        # cat prints what it reads, either from stdin (given "-") or from the FIFO
+        for fifo in (False, True):
+            play_audio((chunk for chunk in frames), "cat", "", fifo=fifo)
+            output = capfd.readouterr().out
+            assert output == b"".join(frames).decode(), f"(play_audio): Wrong audio, fifo={fifo}"
+
+    def test_split_text(self):
+        """Splits a long text in chunks and checks that no sentence (or word) is lost or broken"""
+        # Generates a long text made of short sentences and a single very long one
+        sentences = [f"This is the sentence number {i}." for i in range(200)]
+        long_sentence = " ".join(["word"] * 500) + "."
+        text = " ".join(sentences[:100] + [long_sentence] + sentences[100:])
+
+        chunks = split_text(text, size=300)
+
+        # Each chunk fits the size and the text is the same, in the same order
+        assert all(len(chunk) <= 300 for chunk in chunks), "(split_text): Chunk too long"
+        assert " ".join(chunks).split() == text.split(), "(split_text): Text has been changed"
+        # The short sentences are never split between two chunks
+        for sentence in sentences:
+            assert any(sentence in chunk for chunk in chunks), "(split_text): Sentence broken"
+
+    def test_page_range(self):
+        """Parses the ranges of pages selected by the user, rejecting the ones out of the pdf"""
+        # Closed, open ended and single page ranges (spaces are ignored)
+        assert page_range("10-40", 50) == range(10, 41), "(page_range): Wrong closed range"
+        assert page_range("10-", 50) == range(10, 51), "(page_range): Wrong range until the end"
+        assert page_range("-40", 50) == range(1, 41), "(page_range): Wrong range from the start"
+        assert page_range("7", 50) == range(7, 8), "(page_range): Wrong single page"
+        assert page_range(" 3 - 5 ", 50) == range(3, 6), "(page_range): Spaces not ignored"
+        assert page_range(None, 50) == range(1, 51), "(page_range): Not all the pages"
+
+        # Ranges not respecting the format or out of the document are rejected
+        for pages in ("", "-", "a-b", "1-2-3", "0", "0-5", "51", "40-60", "-60", "40-10"):
+            with raises(ValueError):
+                page_range(pages, 50)
+
+    def test_split_pages(self):
+        """Splits the text of many pages, carrying the unfinished sentences to the next page"""
+        pages = [
+            "First page. This sentence goes",
+            "on in the second page. Short one.",
+            "Last page without a full stop",
+        ]
+        chunks = list(split_pages(pages, size=1000, first_size=15))
+
+        # The first chunk is short, the rest of the text is the same, in the same order
+        assert len(chunks[0]) <= 15, "(split_pages): First chunk too long"
+        assert " ".join(chunks).split() == " ".join(pages).split(), "(split_pages): Text changed"
+        # The sentence across the two pages isn't broken, the one left at the end isn't lost
+        sentence = "This sentence goes on in the second page."
+        assert any(sentence in chunk for chunk in chunks), "(split_pages): Sentence broken"
+        assert chunks[-1].endswith("Last page without a full stop"), "(split_pages): Tail lost"
+
+        # A page is read only once the chunks of the previous one have been consumed
+        read = []
+        lazy_pages = (read.append(page) or page for page in ["One. Two.", "Three. Four."])
+        lazy_chunks = split_pages(lazy_pages, size=5, first_size=5)
+        assert next(lazy_chunks) == "One." and read == ["One. Two."], "(split_pages): Not lazy"
+
+    def test_cache_keys(self):
+        """Checks that the key of a chunk changes with its text and voice, not with its layout"""
+        key = AudioCache.key("Hello world.", "en", False)
+        assert key == AudioCache.key("  Hello\n world. ", "en", False), "(cache): Layout in key"
+        assert key != AudioCache.key("Hello world!", "en", False), "(cache): Same key, new text"
+        assert key != AudioCache.key("Hello world.", "it", False), "(cache): Same key, new lang"
+        assert key != AudioCache.key("Hello world.", "en", True), "(cache): Same key, new speed"
+
+    def test_cache_eviction(self):
+        """Checks the cache hits and misses, and that the least recently used chunks go first"""
+        tmp_dir = TmpDir()
+        cache = AudioCache(tmp_dir.name, max_size=300)
+        assert cache.get("first") is None, "(cache): Hit on an empty cache"
+
+        # Three chunks filling the cache, used (in order) at a known time
+        for mtime, key in enumerate(["first", "second", "third"], start=1):
+            cache.put(key, key.encode().ljust(100, b"-"))
+            utime(join(tmp_dir.name, f"{key}.mp3"), (mtime, mtime))
+        assert cache.get("first") == b"first".ljust(100, b"-"), "(cache): Wrong audio on hit"
+
+        # Going over the size evicts the least recently used chunks, down to 90% of the size
+        cache.put("fourth", b"fourth".ljust(100, b"-"))
+        assert cache.get("second") is None, "(cache): Least recently used chunk not evicted"
+        assert cache.get("third") is None, "(cache): Cache not brought under 90% of its size"
+        assert cache.get("first") is not None, "(cache): Recently used chunk evicted"
+        assert cache.get("fourth") is not None, "(cache): New chunk evicted"
+        assert cache.size == 200, "(cache): Wrong size after the eviction"
@@ -1,20 +1,22 @@
 """PyTest module with test suite implementation for the DriveDiffMerger.py script"""
-from os import listdir
-from os.path import getmtime
+from os import listdir, makedirs, symlink, utime
+from os.path import basename, getmtime, join
 from random import randint
 from tempfile import NamedTemporaryFile as TmpFile
 from tempfile import TemporaryDirectory as TmpDir
 
 from pydrive.auth import GoogleAuth
 from pydrive.drive import GoogleDrive
-from pytest import fixture
+from pydrive.files import GoogleDriveFile
+from pytest import fixture, mark
 from scripts.DriveDiffMerger import (
-    gd_exists, gd_getmtime, gd_isdir, gd_isfile, gd_join, gd_listdir, gd_mkdir, gd_upload,
-    push_to_drive
+    GD_FOLDER_MIMETYPE, IGNORE_FILE_NAME, PART_SUFFIX, filters_load, gd_download_ranged, gd_exists,
+    gd_getmtime, gd_index, gd_isdir, gd_isfile, gd_join, gd_listdir, gd_mkdir, gd_upload,
+    local_scan, plan_pull, plan_push, push_to_drive
 )
 
 
-@fixture(autouse=True)
+@fixture
 def setup_gdrive_test_dir():
     """
     Initializes the base test directory for other test cases on Google Drive
@@ -30,6 +32,7 @@ def setup_gdrive_test_dir():
         gd_mkdir(gd_join(drive_root, "test"))
 
 
+@mark.usefixtures("setup_gdrive_test_dir")
 class TestDriveDiffMerger:
     """Test suite for the BackUpLoader script"""
     # Authenticates and initializes the Google Drive proxy
@@ -75,6 +78,29 @@ class TestDriveDiffMerger:
         n_remote, n_local = len(gd_listdir(remote_dir)), len(listdir(tmp_dir.name))
         assert n_remote == n_local, "Children mismatch between remote and local dir"
 
+    def test_remote_index(self):
+        """Creates a nested directory and checks that the remote snapshot matches the live tree"""
+        tmp_dir = TmpDir()  # Creates a temporary directory
+        nested_dir = TmpDir(dir=tmp_dir.name)  # And a nested one inside of it
+        # Populates both directories with a random number of files
+        [TmpFile(dir=tmp_dir.name) for _ in range(randint(3, 10))]
+        [TmpFile(dir=nested_dir.name) for _ in range(randint(3, 10))]
+        # Gets a reference to the test foolder in Google Drive
+        test_folder = gd_join(self.gdrive.CreateFile({"id": "root"}), "test")
+
+        # Creates the directory on Google Drive and uploads its content
+        gd_mkdir(gd_join(test_folder, tmp_dir.name))
+        remote_dir = gd_join(test_folder, tmp_dir.name)
+        push_to_drive(tmp_dir.name, remote_dir)
+
+        # Checks that the snapshot resolves the same children as the live queries do
+        index = gd_index(remote_dir)
+        remote_nested = gd_join(remote_dir, basename(nested_dir.name))
+        for r_dir in (remote_dir, remote_nested):
+            live_titles = sorted(r_entry["title"] for r_entry in gd_listdir(r_dir))
+            index_titles = sorted(r_entry["title"] for r_entry in gd_listdir(r_dir, index))
+            assert live_titles == index_titles, "Children mismatch between snapshot and Drive"
+
     def test_file_download(self):
         """Creates a file on Google Drive and downloads it"""
         assert False, "Test case not implemented"
@@ -82,3 +108,197 @@ class TestDriveDiffMerger:
     def test_dir_download(self):
         """Creates a folder on Google Drive and test recursive download"""
         assert False, "Test case not implemented"
+
+
+class TestFilters:
+    """Test suite for the exclusion rules, runs offline (without Google Drive)"""
+
+    def test_ignore_rules(self):
+        """Checks the .gitignore style rules of a .driveignore file"""
+        tmp_dir = TmpDir()  # Creates a temporary directory, the root of the synced tree
+        with open(join(tmp_dir.name, IGNORE_FILE_NAME), "w", encoding="utf-8") as ignore_file:
+            ignore_file.write("# Comment\n*.log\n!keep.log\nbuild/\n/top.txt\ndocs/**/*.tmp\n")
+        filters = filters_load(tmp_dir.name)
+
+        # Unanchored rules match at any depth, the last matching rule wins
+        assert filters.excludes("a.log", False), "Unanchored rule not applied"
+        assert filters.excludes("deep/nested/a.log", False), "Unanchored rule not applied deep"
+        assert not filters.excludes("deep/keep.log", False), "Negated rule not re-including"
+        # Directory only rules don't match files
+        assert filters.excludes("src/build", True), "Directory only rule not applied"
+        assert not filters.excludes("src/build", False), "Directory only rule matching a file"
+        # Anchored rules match from the root only
+        assert filters.excludes("top.txt", False), "Anchored rule not applied"
+        assert not filters.excludes("sub/top.txt", False), "Anchored rule matching deep"
+        # '**' matches any number of directories, even none
+        assert filters.excludes("docs/a.tmp", False), "'**' not matching zero directories"
+        assert filters.excludes("docs/a/b/c.tmp", False), "'**' not matching many directories"
+        assert not filters.excludes("other/a.tmp", False), "'**' matching outside its prefix"
+        assert not filters.excludes("# Comment", False), "Comment parsed as a rule"
+
+    def test_excluded_counterpart_pull(self):
+        """A local file excluded for its size isn't overwritten by its (older) remote copy"""
+        tmp_dir = TmpDir()  # Creates a temporary directory, the root of the synced tree
+        l_path = join(tmp_dir.name, "big.bin")
+        with open(l_path, "wb") as l_file:
+            l_file.write(b"x" * 2 * 1024**2)
+        utime(l_path, (2e9, 2e9))
+
+        # The remote copy is small (so it's not excluded) and newer than the local one
+        r_root = GoogleDriveFile(
+            metadata={"id": "root-id", "title": "root", "mimeType": GD_FOLDER_MIMETYPE},
+            uploaded=True
+        )
+        r_file = GoogleDriveFile(
+            metadata={
+                "id": "file-id", "title": "big.bin", "mimeType": "application/octet-stream",
+                "fileSize": "10", "modifiedDate": "2040-01-01T00:00:00.000Z"
+            },
+            uploaded=True
+        )
+        index, filters = {"root-id": {"big.bin": r_file}}, filters_load(tmp_dir.name, max_size=1)
+
+        plan = plan_pull(tmp_dir.name, r_root, index, filters=filters)
+        assert plan == [], "The excluded local file has been planned for download"
+        plan = plan_pull(tmp_dir.name, r_root, index, dry_run=True, filters=filters)
+        assert [(t.action, t.reason) for t in plan] == [("skip", "excluded")], "Wrong dry run"
+
+
+class TestPlanPull:
+    """Test suite for the pull planning on local trees, runs offline (without Google Drive)"""
+
+    def test_symlinked_dir(self):
+        """The content of a symlinked directory is followed and compared, not seen as missing"""
+        tmp_dir, target_dir = TmpDir(), TmpDir()  # The synced root and the symlink target
+        makedirs(join(target_dir.name, "nested"))
+        l_path = join(target_dir.name, "nested", "notes.txt")
+        with open(l_path, "w", encoding="utf-8") as l_file:
+            l_file.write("local")
+        utime(l_path, (2e9, 2e9))
+        symlink(target_dir.name, join(tmp_dir.name, "linked"))
+
+        # The remote tree has the same folders, with an older copy of the file
+        r_root = GoogleDriveFile(
+            metadata={"id": "root-id", "title": "root", "mimeType": GD_FOLDER_MIMETYPE},
+            uploaded=True
+        )
+        r_dirs = [
+            GoogleDriveFile(
+                metadata={"id": f"{name}-id", "title": name, "mimeType": GD_FOLDER_MIMETYPE},
+                uploaded=True
+            ) for name in ("linked", "nested")
+        ]
+        r_file = GoogleDriveFile(
+            metadata={
+                "id": "file-id", "title": "notes.txt", "mimeType": "text/plain",
+                "fileSize": "6", "modifiedDate": "2001-01-01T00:00:00.000Z"
+            },
+            uploaded=True
+        )
+        index = {
+            "root-id": {"linked": r_dirs[0]},
+            "linked-id": {"nested": r_dirs[1]},
+            "nested-id": {"notes.txt": r_file},
+        }
+
+        plan = plan_pull(tmp_dir.name, r_root, index, dry_run=True)
+        actions = [(basename(t.l_path), t.action, t.reason) for t in plan]
+        assert actions == [("notes.txt", "skip", "up-to-date")], "Symlinked dir not followed"
+
+
+class TestLocalScan:
+    """Test suite for the scan of local trees, runs offline (without Google Drive)"""
+
+    def test_symlinked_dir_pushed(self):
+        """The content of a symlinked directory is scanned and pushed, as a regular one"""
+        tmp_dir, target_dir = TmpDir(), TmpDir()  # The synced root and the symlink target
+        l_path = join(target_dir.name, "notes.txt")
+        with open(l_path, "w", encoding="utf-8") as l_file:
+            l_file.write("local")
+        utime(l_path, (2e9, 2e9))
+        symlink(target_dir.name, join(tmp_dir.name, "linked"))
+
+        scanned = [entry.path for entry in local_scan(tmp_dir.name)]
+        expected = [join(tmp_dir.name, "linked"), join(tmp_dir.name, "linked", "notes.txt")]
+        assert scanned == expected, "Symlinked directory not followed"
+
+        # The remote tree has the same folder, with an older copy of the file
+        r_root = GoogleDriveFile(
+            metadata={"id": "root-id", "title": "root", "mimeType": GD_FOLDER_MIMETYPE},
+            uploaded=True
+        )
+        r_dir = GoogleDriveFile(
+            metadata={"id": "linked-id", "title": "linked", "mimeType": GD_FOLDER_MIMETYPE},
+            uploaded=True
+        )
+        r_file = GoogleDriveFile(
+            metadata={
+                "id": "file-id", "title": "notes.txt", "mimeType": "text/plain",
+                "fileSize": "6", "modifiedDate": "2001-01-01T00:00:00.000Z"
+            },
+            uploaded=True
+        )
+        index = {"root-id": {"linked": r_dir}, "linked-id": {"notes.txt": r_file}}
+
+        plan = plan_push(tmp_dir.name, r_root, index, dry_run=True)
+        actions = [(basename(t.l_path), t.action, t.reason) for t in plan]
+        assert actions == [("notes.txt", "upload", "newer")], "Symlinked dir content not pushed"
+
+    def test_symlink_cycle(self):
+        """A symlink to an ancestor directory is skipped instead of being scanned forever"""
+        tmp_dir = TmpDir()  # The root of the synced tree
+        makedirs(join(tmp_dir.name, "sub"))
+        with open(join(tmp_dir.name, "sub", "file.txt"), "w", encoding="utf-8") as l_file:
+            l_file.write("content")
+        symlink(tmp_dir.name, join(tmp_dir.name, "sub", "to-root"))
+        symlink(join(tmp_dir.name, "sub"), join(tmp_dir.name, "sub", "to-self"))
+
+        scanned = sorted(entry.path for entry in local_scan(tmp_dir.name))
+        expected = [join(tmp_dir.name, "sub"), join(tmp_dir.name, "sub", "file.txt")]
+        assert scanned == expected, "Symlinks to the ancestors not skipped"
+
+
+class FakeRangeHttp:
+    """Stand-in for the HTTP client of Google Drive, serving the Range requests of 'content'"""
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+    def request(self, _url, headers):
+        """Returns the requested range of the content, as a (response, content) pair"""
+        first, last = (int(byte) for byte in headers["Range"][len("bytes="):].split("-"))
+        response = type("Response", (), {"status": 206 if first < len(self.content) else 416})
+        return response, self.content[first:last + 1]
+
+
+class TestRangedDownload:
+    """Test suite for the resumable downloads, runs offline (without Google Drive)"""
+
+    def test_stale_partial_files(self):
+        """The partial files of other remote versions are removed, an oversized one restarts"""
+        tmp_dir, content = TmpDir(), bytes(range(256)) * 40
+        dest = join(tmp_dir.name, "file.bin")
+        r_file = GoogleDriveFile(
+            metadata={
+                "id": "file-id", "title": "file.bin", "fileSize": str(len(content)),
+                "downloadUrl": "https://drive/file-id", "md5Checksum": "abcd1234abcd1234"
+            },
+            uploaded=True
+        )
+        # A partial file of an old version, one bigger than the current version (with the
+        # same checksum prefix) and one of another file, which has to be kept
+        partial_files = {
+            f"file.bin.deadbeef{PART_SUFFIX}": b"old",
+            f"file.bin.abcd1234{PART_SUFFIX}": b"x" * (len(content) + 1),
+            f"file.bin.other.12345678{PART_SUFFIX}": b"other",
+        }
+        for name, partial_content in partial_files.items():
+            with open(join(tmp_dir.name, name), "wb") as part_file:
+                part_file.write(partial_content)
+
+        gd_download_ranged(r_file, dest, FakeRangeHttp(content), chunk_size=1000)
+
+        with open(dest, "rb") as l_file:
+            assert l_file.read() == content, "Wrong downloaded content"
+        expected = sorted(["file.bin", f"file.bin.other.12345678{PART_SUFFIX}"])
+        assert sorted(listdir(tmp_dir.name)) == expected, "Stale partial files not removed"
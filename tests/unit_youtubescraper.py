@@ -1,14 +1,21 @@
 """PyTest module with test suite implementation for the YouTubeScraper.py script"""
+from datetime import datetime
+from math import inf
 from os import getcwd, listdir
 from os.path import exists, getmtime, isdir, isfile, join
 from tempfile import NamedTemporaryFile as TmpFile
 from tempfile import TemporaryDirectory as TmpDir
+from time import monotonic
 
 from pytest import raises
-from pytube import Playlist
+from pytube import Playlist, Stream, StreamQuery
 from pytube import YouTube as Video
 from pytube.exceptions import VideoUnavailable
-from scripts.YouTubeScraper import download_playlist, download_video
+from pytube.monostate import Monostate
+from scripts.YouTubeScraper import (
+    RETRY_BACKOFF, RETRY_MAX_BACKOFF, Journal, MissingMuxerError, RetryScheduler, StreamPolicy,
+    TokenBucket, download_playlist, download_video
+)
 
 
 class TestYouTubeScrapers:
@@ -95,9 +102,13 @@ class TestYouTubeScrapers:
         assert exists(expected_out_dir), "Playlist directory hasn't been created"
         assert isdir(expected_out_dir), "Playlist directory isn't a directory"
 
-        # Extracts the names of the videos in the playlist
+        # Extracts the names of the videos in the playlist (ignoring hidden files, the manifest)
         yt_playlist_videos = [Video(v_url) for v_url in yt_playlist.video_urls]
-        yt_video_downloaded = [join(expected_out_dir, entry) for entry in listdir(expected_out_dir)]
+        yt_video_downloaded = [
+            join(expected_out_dir, entry)
+            for entry in listdir(expected_out_dir)
+            if not entry.startswith(".")
+        ]
 
         # Checks that the number of videos in the playlist are in the same number as the file
         # inside the playlist folder. This is a sufficient approximation because some character
@@ -152,3 +163,243 @@ class TestYouTubeScrapers:
 
         # Since the file shouldn't have been touched the m_time should be the same
         assert new_m_time == m_time, "File has been overwritten"
+
+
+class TestJournal:
+    """Test suite for the journal of the resumable downloads, runs offline (without YouTube)"""
+
+    def test_missing_ranges(self):
+        """Checks that the ranges marked are merged and the holes between them are missing"""
+        tmp_dir, part_file = TmpDir(), TmpFile()
+        journal_path = join(tmp_dir.name, "video.mp4.part.journal")
+        journal = Journal(journal_path, itag=22, size=100)
+        assert journal.missing() == [(0, 99)], "An empty journal isn't missing the whole stream"
+
+        # Ranges marked out of order, leaving holes at the start, middle and end of the stream
+        journal.mark(part_file.fileno(), 50, 59)
+        journal.mark(part_file.fileno(), 10, 19)
+        assert journal.done == [(10, 19), (50, 59)], "Disjoint ranges not kept sorted"
+        assert journal.missing() == [(0, 9), (20, 49), (60, 99)], "Wrong holes"
+
+        # Adjacent and overlapping ranges are merged into a single one
+        journal.mark(part_file.fileno(), 20, 29)
+        journal.mark(part_file.fileno(), 25, 54)
+        assert journal.done == [(10, 59)], "Adjacent or overlapping ranges not merged"
+        assert journal.missing() == [(0, 9), (60, 99)], "Wrong holes after the merge"
+
+        # Once all the holes are filled nothing is missing anymore
+        journal.mark(part_file.fileno(), 0, 9)
+        journal.mark(part_file.fileno(), 60, 99)
+        assert journal.done == [(0, 99)], "The whole stream isn't a single range"
+        assert journal.missing() == [], "A complete stream is still missing ranges"
+
+    def test_reload(self):
+        """Checks that a journal is reloaded from disk, unless the stream has changed"""
+        tmp_dir, part_file = TmpDir(), TmpFile()
+        journal_path = join(tmp_dir.name, "video.mp4.part.journal")
+        Journal(journal_path, itag=22, size=100).mark(part_file.fileno(), 0, 49)
+
+        # The same stream resumes from the journal, a different one (itag or size) restarts
+        assert Journal(journal_path, itag=22, size=100).missing() == [(50, 99)], "Not resumed"
+        assert Journal(journal_path, itag=18, size=100).missing() == [(0, 99)], "Stale itag"
+        assert Journal(journal_path, itag=22, size=200).missing() == [(0, 199)], "Stale size"
+
+        # A corrupted journal is discarded as well
+        with open(journal_path, "w", encoding="utf-8") as journal_file:
+            journal_file.write("{not json")
+        assert Journal(journal_path, itag=22, size=100).missing() == [(0, 99)], "Corrupted"
+
+
+class TestRetryScheduler:
+    """Test suite for the retries of the failed downloads, runs offline (without YouTube)"""
+
+    def test_order(self, monkeypatch):
+        """Checks that the failed videos are retried only after the ones never attempted"""
+        monkeypatch.setattr("scripts.YouTubeScraper.RETRY_BACKOFF", 0.0)  # Retries due at once
+        scheduler = RetryScheduler(attempts=3, budget=10)
+        scheduler.put(("out", "first"))
+        scheduler.put(("out", "second"))
+
+        job, attempt = scheduler.get()
+        assert (job, attempt) == (("out", "first"), 1), "Videos not handed out in order"
+        scheduler.done(job, attempt, OSError("Connection reset"))
+        scheduler.put(("out", "third"))
+
+        # The retry is due, but the fresh videos (even the ones added later) go first
+        handed_out = [scheduler.get() for _ in range(3)]
+        assert handed_out == [
+            (("out", "second"), 1), (("out", "third"), 1), (("out", "first"), 2)
+        ], "Retry handed out before the videos never attempted"
+
+        for job, attempt in handed_out:
+            scheduler.done(job, attempt)
+        scheduler.close()
+        assert scheduler.get() is None, "Scheduler not stopping once everything is done"
+        assert not scheduler.failed, "A video retried successfully is still failed"
+
+    def test_backoff(self, monkeypatch):
+        """Checks that the backoff doubles at each attempt, up to its max"""
+        monkeypatch.setattr("scripts.YouTubeScraper.uniform", lambda low, high: 1.0)  # No jitter
+        scheduler = RetryScheduler(attempts=20, budget=20)
+        for name, attempt in (("late", 3), ("early", 1), ("capped", 15)):
+            scheduler.put(("out", name))
+            scheduler.get()
+            scheduler.done(("out", name), attempt, OSError("Connection reset"))
+
+        # The delayed retries are sorted by when they're due, not by when they failed
+        now = monotonic()
+        delays = {entry[2][1]: entry[0] - now for entry in sorted(scheduler.delayed)}
+        assert list(delays) == ["early", "late", "capped"], "Retries not sorted by backoff"
+        assert abs(delays["early"] - RETRY_BACKOFF) < 1, "Wrong backoff of the first retry"
+        assert abs(delays["late"] - RETRY_BACKOFF * 4) < 1, "Backoff not doubling"
+        assert abs(delays["capped"] - RETRY_MAX_BACKOFF) < 1, "Backoff not capped"
+
+    def test_attempts_limit(self, monkeypatch):
+        """Checks that a video is given up after the max number of attempts"""
+        monkeypatch.setattr("scripts.YouTubeScraper.RETRY_BACKOFF", 0.0)
+        scheduler = RetryScheduler(attempts=2, budget=10)
+        scheduler.put(("out", "video"))
+        scheduler.close()
+
+        for expected_attempt in (1, 2):
+            job, attempt = scheduler.get()
+            assert attempt == expected_attempt, "Wrong attempt number"
+            scheduler.done(job, attempt, OSError("Connection reset"))
+
+        assert scheduler.get() is None, "Video retried more than the max number of attempts"
+        assert scheduler.failed[("out", "video")][0] == 2, "Failure not recorded"
+
+    def test_error_budget(self):
+        """Checks that no video is handed out once the error budget is exhausted"""
+        scheduler = RetryScheduler(attempts=5, budget=2)
+        for name in ("unavailable", "first", "second", "never"):
+            scheduler.put(("out", name))
+
+        # Permanent errors (not retried) don't count against the budget
+        scheduler.done(*scheduler.get(), KeyError("Video unavailable"), retry=False)
+        assert not scheduler.exhausted and not scheduler.delayed, "Permanent error retried"
+
+        scheduler.done(*scheduler.get(), OSError("Connection reset"))
+        scheduler.done(*scheduler.get(), OSError("Connection reset"))
+        assert scheduler.exhausted, "Error budget not exhausted"
+        assert scheduler.get() is None, "Video handed out after the error budget is exhausted"
+        assert [job for job, _ in scheduler.fresh] == [("out", "never")], "Pending video lost"
+
+
+def fake_clock(hour: int, minute: int = 0) -> type:
+    """Returns a datetime class whose now() is always the given time of the day"""
+    class FakeDatetime(datetime):
+        """Stand-in for datetime, frozen at hour:minute"""
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2022, 1, 1, hour, minute, tzinfo=tz)
+
+    return FakeDatetime
+
+
+class TestTokenBucket:
+    """Test suite for the bandwidth limit, runs offline (without YouTube)"""
+
+    def test_rates(self, monkeypatch):
+        """Checks the rate chosen at different times of the day, windows crossing midnight too"""
+        bucket = TokenBucket()
+        assert bucket.rate() == inf, "Not configured bucket limiting the bandwidth"
+        # The default rate is written first, but the windows are still checked before it
+        bucket.configure("2M, 09:00-18:00=500K, 22:00-06:00=0")
+
+        expected = {
+            (12, 0): 500 * 1024,  # Inside the daily window
+            (9, 0): 500 * 1024,  # The start of a window is included...
+            (18, 0): 2 * 1024**2,  # ...while its end isn't
+            (20, 0): 2 * 1024**2,  # Outside of all windows
+            (23, 30): inf,  # Inside the window crossing midnight, before midnight (no limit)
+            (0, 0): inf,  # Midnight
+            (5, 59): inf,  # Inside the window crossing midnight, after midnight
+            (6, 0): 2 * 1024**2,  # The end of the window crossing midnight isn't included
+        }
+        for (hour, minute), rate in expected.items():
+            monkeypatch.setattr("scripts.YouTubeScraper.datetime", fake_clock(hour, minute))
+            assert bucket.rate() == rate, f"Wrong rate at {hour:02}:{minute:02}"
+
+        # Without a default rate there's no limit outside of the windows
+        bucket.configure("22:00-06:00=1M")
+        monkeypatch.setattr("scripts.YouTubeScraper.datetime", fake_clock(12))
+        assert bucket.rate() == inf, "Limited outside of all the windows"
+        monkeypatch.setattr("scripts.YouTubeScraper.datetime", fake_clock(1))
+        assert bucket.rate() == 1024**2, "Window crossing midnight not applied"
+
+    def test_bad_limit(self):
+        """Checks that a limit not respecting the format is rejected, keeping the previous one"""
+        bucket = TokenBucket()
+        bucket.configure("1.5K")
+        assert bucket.rate() == 1.5 * 1024, "Fractional rate not parsed"
+
+        for limit in ("fast", "2T", "09:00=2M", "9-18=2M", "09:00-18:00", "25:00-06:00=1M"):
+            with raises(ValueError):
+                bucket.configure(limit)
+            assert bucket.rate() == 1.5 * 1024, f"Rejected limit {limit!r} changed the rate"
+
+
+def fake_stream(itag: int, mime_type: str, size_mib: int = 1) -> Stream:
+    """Returns a stream with the given itag, mimetype (and codecs) and size, without YouTube"""
+    stream = {
+        "url": f"https://youtube/videoplayback?itag={itag}", "itag": itag, "mimeType": mime_type,
+        "bitrate": 1, "is_otf": False, "contentLength": size_mib * 1024 * 1024,
+    }
+    return Stream(stream, Monostate(on_progress=None, on_complete=None, title="Video"))
+
+
+class TestStreamPolicy:
+    """Test suite for the selection of the streams to download, runs offline (without YouTube)"""
+
+    # Progressive streams (360p and 720p), video only and audio only ones in mp4 and webm
+    streams = StreamQuery([
+        fake_stream(18, 'video/mp4; codecs="avc1.42001E, mp4a.40.2"', 5),
+        fake_stream(22, 'video/mp4; codecs="avc1.64001F, mp4a.40.2"', 10),
+        fake_stream(137, 'video/mp4; codecs="avc1.640028"', 40),
+        fake_stream(248, 'video/webm; codecs="vp9"', 30),
+        fake_stream(136, 'video/mp4; codecs="avc1.4d401f"', 8),
+        fake_stream(140, 'audio/mp4; codecs="mp4a.40.2"', 2),
+        fake_stream(251, 'audio/webm; codecs="opus"', 2),
+    ])
+
+    def select(self, **policy) -> list[int]:
+        """Returns the itags of the streams selected by the given policy"""
+        return [stream.itag for stream in StreamPolicy(**policy).select(self.streams)]
+
+    def test_resolution(self):
+        """Checks that the best progressive stream below the max resolution is selected"""
+        assert self.select() == [22], "Best progressive stream not selected"
+        assert self.select(resolution=480) == [18], "Max resolution not respected"
+        with raises(LookupError):
+            self.select(resolution=240)
+
+    def test_adaptive_fallback(self, monkeypatch):
+        """Checks that adaptive streams are paired, but progressive ones are preferred if equal"""
+        monkeypatch.setattr("scripts.YouTubeScraper.which", lambda program: f"/usr/bin/{program}")
+
+        assert self.select(adaptive=True) == [137, 140], "Adaptive streams not paired"
+        # At the same resolution the progressive stream wins, it doesn't need to be muxed
+        assert self.select(adaptive=True, resolution=720) == [22], "Progressive not preferred"
+        # The 1080p pairs are over the size limit, so it falls back to the progressive 720p
+        assert self.select(adaptive=True, max_size=20) == [22], "Size limit not respected"
+
+        # The muxer is required only for adaptive streams, not for the audio only ones
+        monkeypatch.setattr("scripts.YouTubeScraper.which", lambda program: None)
+        with raises(MissingMuxerError):
+            StreamPolicy(adaptive=True)
+        assert self.select(adaptive=True, audio_only=True) == [251], "Muxer required for audio"
+
+    def test_codec_preference(self, monkeypatch):
+        """Checks that the preferred codec wins at the same resolution, for video and audio"""
+        monkeypatch.setattr("scripts.YouTubeScraper.which", lambda program: f"/usr/bin/{program}")
+
+        # The video codec picks the pair, whose audio is then in the same container
+        assert self.select(adaptive=True, codec="vp9") == [248, 251], "Video codec not preferred"
+        assert self.select(adaptive=True, codec="avc1") == [137, 140], "Video codec not preferred"
+        # A codec is only preferred, the streams in other codecs are still selected
+        assert self.select(codec="vp9") == [22], "Streams in other codecs excluded"
+
+        # The best audio (by bitrate) is selected, unless another codec is preferred
+        assert self.select(audio_only=True) == [251], "Best audio stream not selected"
+        assert self.select(audio_only=True, codec="mp4a") == [140], "Audio codec not preferred"